@@ -1,7 +1,16 @@
-from fastapi import HTTPException, Depends, status
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import httpx
 import firebase_admin
-from firebase_admin import credentials, auth
+from firebase_admin import auth, credentials
+from google.auth import jwt as google_jwt
 from .config import settings
 
 security = HTTPBearer()
@@ -74,20 +83,195 @@ def ensure_firebase_initialized() -> None:
             detail=f"Server misconfiguration: could not initialize Firebase Admin ({e})"
         )
 
-async def verify_firebase_token(auth_credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already-verified Firebase ID tokens -> decoded claims, so a token
+    the client reuses across requests pays for RSA signature verification once, not
+    on every call. Keyed by the token's SHA-256 (the raw bearer token is never held
+    as a key), and each entry is dropped at the token's own `exp` - a cached token is
+    never accepted after verify_id_token itself would have rejected it as expired.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        decoded, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return decoded
+
+    def put(self, token: str, decoded: Dict[str, Any]) -> None:
+        expires_at = decoded.get("exp")
+        if not expires_at or self.max_entries <= 0:
+            return
+        key = self._key(token)
+        self._entries[key] = (decoded, float(expires_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+verified_tokens = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_ENTRIES)
+
+# Where Google publishes the X.509 certs that sign Firebase ID tokens, and the issuer
+# prefix (+ project id) those tokens carry.
+FIREBASE_ID_TOKEN_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_ID_TOKEN_ISSUER = "https://securetoken.google.com/"
+
+class SigningKeyManager:
+    """
+    Local copy of Google's Firebase ID-token signing certificates, so token
+    verification never waits on a network fetch.
+
+    start() (called from main.py's startup event) prefetches the certs and runs a
+    background loop that refetches them once REFRESH_FRACTION of the response's
+    Cache-Control max-age has elapsed - before they expire - retrying every
+    RETRY_SECONDS on failure while the previous set stays in use (Google publishes new
+    keys well ahead of signing with them). A request only fetches inline if there are no
+    keys at all yet (startup hooks didn't run, e.g. a cold serverless invocation), or its
+    token names a key id we've never seen - at most once per RETRY_SECONDS.
+    """
+
+    REFRESH_FRACTION = 0.8
+    RETRY_SECONDS = 30
+    DEFAULT_MAX_AGE_SECONDS = 3600
+
+    def __init__(self, certs_url: str):
+        self.certs_url = certs_url
+        self._certs: Dict[str, str] = {}
+        self._refresh_due_at = 0.0
+        self._last_inline_fetch = 0.0
+        self._fetch_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _max_age(cache_control: str) -> int:
+        match = re.search(r"max-age=(\d+)", cache_control or "")
+        return int(match.group(1)) if match else SigningKeyManager.DEFAULT_MAX_AGE_SECONDS
+
+    async def fetch(self) -> None:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(self.certs_url)
+            response.raise_for_status()
+        self._certs = response.json()
+        max_age = self._max_age(response.headers.get("cache-control"))
+        self._refresh_due_at = time.monotonic() + max_age * self.REFRESH_FRACTION
+
+    async def start(self) -> None:
+        try:
+            await self.fetch()
+        except Exception as e:
+            print(f"Signing key prefetch error: {e}")
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.RETRY_SECONDS, self._refresh_due_at - time.monotonic()))
+            try:
+                await self.fetch()
+            except Exception as e:
+                print(f"Signing key refresh error: {e}")
+                self._refresh_due_at = time.monotonic() + self.RETRY_SECONDS
+
+    async def certs_for(self, kid: str) -> Dict[str, str]:
+        """The current certs, fetching inline only in the two cases described above."""
+        if kid in self._certs:
+            return self._certs
+        async with self._fetch_lock:
+            now = time.monotonic()
+            if kid not in self._certs and (not self._certs or now - self._last_inline_fetch > self.RETRY_SECONDS):
+                self._last_inline_fetch = now
+                await self.fetch()
+        return self._certs
+
+
+signing_keys = SigningKeyManager(FIREBASE_ID_TOKEN_CERTS_URL)
+
+async def _verify_id_token_locally(token: str) -> Dict[str, Any]:
+    """
+    The checks firebase_admin.auth.verify_id_token makes - RS256 signature by one of
+    Google's current keys, exp/iat, aud == project id, iss, non-empty sub - against
+    signing_keys' local certs. Raises ValueError on any invalid token.
+
+    Against the Auth emulator (FIREBASE_AUTH_EMULATOR_HOST set) tokens are unsigned,
+    so those go to verify_id_token itself, which knows how to accept them.
+    """
+    ensure_firebase_initialized()
+    if os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+        return auth.verify_id_token(token)
+    project_id = _clean_env_value(settings.FIREBASE_PROJECT_ID)
+
+    header = google_jwt.decode_header(token)
+    if header.get("alg") != "RS256" or not header.get("kid"):
+        raise ValueError("Firebase ID token must be RS256-signed with a kid")
+
+    certs = await signing_keys.certs_for(header["kid"])
+    claims = google_jwt.decode(token, certs=certs, audience=project_id)
+
+    if claims.get("iss") != FIREBASE_ID_TOKEN_ISSUER + project_id:
+        raise ValueError("Firebase ID token has an incorrect issuer")
+    subject = claims.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Firebase ID token has an invalid subject")
+    claims["uid"] = subject
+    return claims
+
+async def verify_id_token_cached(token: str) -> Dict[str, Any]:
+    """
+    Verified claims for this ID token - from verified_tokens when it was already
+    verified and hasn't expired, otherwise verified against the local signing keys.
+    Raises on an invalid token.
+    """
+    decoded = verified_tokens.get(token)
+    if decoded is None:
+        decoded = await _verify_id_token_locally(token)
+        verified_tokens.put(token, decoded)
+    return decoded
+
+async def verify_firebase_token(request: Request, auth_credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """
     Verify a Firebase ID token (sent as `Authorization: Bearer <token>`) and return
     the caller's uid. The frontend must fetch a fresh token per request - see
     apps/web/src/integrations/api.ts.
+
+    Most routes depend on this twice (router-level in main.py, plus as an endpoint
+    parameter), so the uid is memoized on request.state: at most one verification per
+    request, and none at all for a token already in verified_tokens.
     """
-    ensure_firebase_initialized()
+    uid = getattr(request.state, "firebase_uid", None)
+    if uid is not None:
+        return uid
 
     try:
-        decoded_token = auth.verify_id_token(auth_credentials.credentials)
-        return decoded_token['uid']
+        decoded_token = await verify_id_token_cached(auth_credentials.credentials)
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    request.state.firebase_uid = decoded_token['uid']
+    return decoded_token['uid']
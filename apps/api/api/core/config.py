@@ -85,4 +85,52 @@ class Settings(BaseSettings):
     # with this bearer token rather than a user's Firebase ID token.
     CRON_SECRET: str = os.getenv("CRON_SECRET", "")
 
+    # How stale the in-process leaderboard index (services/leaderboard_index.py) may get
+    # before it's reseeded from `profiles`. Score changes made by this process apply
+    # immediately; this only bounds how long other workers'/instances' changes take to
+    # show up here.
+    LEADERBOARD_INDEX_MAX_STALENESS_SECONDS: int = int(os.getenv("LEADERBOARD_INDEX_MAX_STALENESS_SECONDS", "300"))
+
+    # Max verified Firebase ID tokens cached in-process (core/auth.py), so repeat
+    # requests with the same token skip signature verification. Entries expire at the
+    # token's own `exp`; 0 disables the cache.
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+    # Max messages buffered per open notifications WebSocket (routes/notifications.py).
+    # A client that falls this far behind is disconnected rather than buffered forever.
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+
+    # Pub/sub broker for live notification delivery across workers/instances
+    # (services/notification_bus.py), e.g. redis://localhost:6379/0. Leave empty for a
+    # single-worker deployment - notifications are then delivered in-process.
+    NOTIFICATION_BUS_URL: str = os.getenv("NOTIFICATION_BUS_URL", "")
+
+    # Recent notifications remembered per user (routes/notifications.py), so a client
+    # reconnecting with a `since` cursor is caught up from memory instead of Firestore.
+    NOTIFICATION_REPLAY_BUFFER_SIZE: int = int(os.getenv("NOTIFICATION_REPLAY_BUFFER_SIZE", "50"))
+
+    # Users processed concurrently by each scheduled per-user sweep (streak-risk, task
+    # digest, weekly summary - services/scheduler_service.py). Bounds in-flight
+    # Firestore/email work per sweep.
+    SCHEDULER_CONCURRENCY: int = int(os.getenv("SCHEDULER_CONCURRENCY", "20"))
+
+    # Users one /api/cron/* sweep call processes before returning a next_cursor to
+    # resume from - sized so a batch finishes well inside the serverless timeout.
+    CRON_SWEEP_BATCH_SIZE: int = int(os.getenv("CRON_SWEEP_BATCH_SIZE", "200"))
+
+    # Only one process runs the in-process APScheduler (services/scheduler_lease.py):
+    # whichever holds the scheduler lease, renewed every third of SCHEDULER_LEASE_SECONDS
+    # and taken over by another process once it lapses. "firestore" elects across
+    # every instance; "local" is a lock file electing among the workers of one host.
+    SCHEDULER_LEASE_BACKEND: str = os.getenv("SCHEDULER_LEASE_BACKEND", "firestore")
+    SCHEDULER_LEASE_SECONDS: int = int(os.getenv("SCHEDULER_LEASE_SECONDS", "60"))
+
+    # Longest a scheduled job (or one /api/cron/* call) may run before it's cancelled
+    # and recorded as timed out - see scheduler_service.run_job.
+    SCHEDULER_JOB_DEADLINE_SECONDS: int = int(os.getenv("SCHEDULER_JOB_DEADLINE_SECONDS", "600"))
+
+    # How far ahead open-ended task lists (GET /tasks/, a plant's schedule) expand
+    # recurring care rules into occurrences - see services/recurring_task_service.py.
+    RECURRING_TASKS_HORIZON_DAYS: int = int(os.getenv("RECURRING_TASKS_HORIZON_DAYS", "90"))
+
 settings = Settings()
\ No newline at end of file
@@ -1,7 +1,12 @@
-from firebase_admin import firestore
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+import asyncio
+import heapq
+from firebase_admin import firestore, firestore_async
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable, Tuple
 import uuid
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import _helpers
+from google.cloud.firestore_v1.field_path import FieldPath
 
 from ..core.config import settings
 
@@ -15,21 +20,77 @@ def get_db():
     be provisioned in a mode (e.g. Enterprise edition with the classic Firestore API
     access disabled) that this Admin SDK client can't reach at all, in which case a
     separate named database with standard Firestore access is required.
+
+    This is the AsyncClient, not firestore.client(): every FirestoreDB method is
+    `async` and runs on uvicorn's event loop, and the synchronous client's
+    .get()/.stream()/.set() block that loop for the full network round-trip - one
+    slow query stalled every other in-flight request, WebSocket pings included.
+    With the async client, concurrent requests overlap their Firestore I/O instead.
+    firestore.SERVER_TIMESTAMP / firestore.Query are shared by both clients and are
+    still taken from the sync `firestore` module imported above.
     """
     global _db
     if _db is None:
-        _db = firestore.client(database_id=settings.FIRESTORE_DATABASE_ID)
+        _db = firestore_async.client(database_id=settings.FIRESTORE_DATABASE_ID)
     return _db
 
 # Collection names
 PROFILES_COLLECTION = "profiles"
 PLANTS_COLLECTION = "plants"
 TASKS_COLLECTION = "care_tasks"
+CARE_RULES_COLLECTION = "care_rules"
 NOTIFICATIONS_COLLECTION = "notifications"
 HEALTH_CHECKS_COLLECTION = "health_checks"
 RECOMMENDATIONS_COLLECTION = "recommendations"
 EMAIL_LOGS_COLLECTION = "email_logs"
 MAIL_COLLECTION = "mail"
+SCORE_EVENTS_COLLECTION = "score_events"
+SCORE_AWARDS_COLLECTION = "score_awards"
+LEADERBOARDS_COLLECTION = "leaderboards"
+OUTBOX_COLLECTION = "outbox"
+SWEEP_CHECKPOINTS_COLLECTION = "sweep_checkpoints"
+LEASES_COLLECTION = "leases"
+JOB_RUNS_COLLECTION = "job_runs"
+
+# Firestore's hard cap on writes in a single batch commit
+MAX_BATCH_WRITES = 500
+# ...and on the values in one `in` filter
+MAX_IN_VALUES = 30
+
+# Profiles created without a timezone (and legacy ones that never set it) are treated
+# as UTC by the timezone-bucketed scheduled sends
+DEFAULT_TIMEZONE = "UTC"
+
+# Profile fields backing the unread-notification badge (see get_unread_count)
+UNREAD_COUNT_FIELDS = ["unread_count", "unread_count_synced"]
+
+# Field transforms whose post-write values a WriteResult reports (see _transform_results)
+TRANSFORM_TYPES = (firestore.Increment, firestore.Maximum, firestore.Minimum, firestore.ArrayUnion, firestore.ArrayRemove)
+
+# care_tasks fields stored as native Firestore Timestamps (not ISO strings), so they
+# can be range-filtered and ordered server-side - see get_user_tasks_in_range.
+TASK_TIMESTAMP_FIELDS = ("due_date", "completed_at")
+
+def to_timestamp(value: Any) -> Optional[datetime]:
+    """
+    Coerce a due_date/completed_at value - an ISO string from a client or a legacy
+    document, a date, or a datetime - into a timezone-aware datetime, which the
+    Firestore client stores as a native Timestamp. Naive values are taken as server
+    local time, matching the datetime.now() the rest of the API uses. Raises
+    ValueError for a string that isn't ISO-8601.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif not isinstance(value, datetime) and isinstance(value, date):
+        value = datetime.combine(value, time.min)
+    return value if value.tzinfo else value.astimezone()
+
+def day_bounds(day: date) -> tuple:
+    """[start, end) of a server-local calendar day as aware datetimes, for range queries."""
+    start = datetime.combine(day, time.min).astimezone()
+    return start, datetime.combine(day + timedelta(days=1), time.min).astimezone()
 
 class FirestoreDB:
     """Firestore database operations"""
@@ -40,18 +101,53 @@ class FirestoreDB:
         return str(uuid.uuid4())
 
     @staticmethod
-    def _read_back(collection: str, doc_id: str) -> Dict:
+    def _normalize_task_dates(task_data: Dict) -> Dict:
+        """Store TASK_TIMESTAMP_FIELDS as Timestamps whatever shape the caller passed."""
+        for field in TASK_TIMESTAMP_FIELDS:
+            if field in task_data:
+                task_data[field] = to_timestamp(task_data[field])
+        return task_data
+
+    @staticmethod
+    def _resolve_server_timestamps(data: Dict, update_time: Any) -> Dict:
         """
-        Re-fetch a just-written document instead of returning the dict that was passed
-        to .set(). Any field written as firestore.SERVER_TIMESTAMP stays an unresolved
-        Sentinel object in that local dict - Firestore only resolves it server-side -
-        so returning it directly hands FastAPI (or a WebSocket send_json) something it
-        can't serialize. Every create_* method below reads back through this instead.
+        Swap any firestore.SERVER_TIMESTAMP sentinel in a just-written dict (nested
+        maps included) for the commit's WriteResult.update_time. Left in place, that
+        Sentinel is something FastAPI (or a WebSocket send_json) can't serialize -
+        Firestore only resolves it server-side. A SERVER_TIMESTAMP transform resolves
+        to the commit time, which is exactly update_time, so this yields the same value
+        re-reading the document would, without paying a second round-trip for it.
         """
-        doc = get_db().collection(collection).document(doc_id).get()
-        data = doc.to_dict() or {}
-        data['id'] = doc_id
-        return data
+        resolved = {}
+        for key, value in data.items():
+            if value is firestore.SERVER_TIMESTAMP:
+                resolved[key] = update_time
+            elif isinstance(value, dict):
+                resolved[key] = FirestoreDB._resolve_server_timestamps(value, update_time)
+            else:
+                resolved[key] = value
+        return resolved
+
+    @staticmethod
+    async def _set_resolved(collection: str, doc_id: str, data: Dict) -> Dict:
+        """
+        .set() a new document and return it as Firestore now stores it - SERVER_TIMESTAMP
+        fields filled from the write's update_time and 'id' attached - without the
+        read-after-write get() every create_* method below used to pay for.
+        """
+        result = await get_db().collection(collection).document(doc_id).set(data)
+        written = FirestoreDB._resolve_server_timestamps(data, result.update_time)
+        written['id'] = doc_id
+        return written
+
+    @staticmethod
+    async def _count(query, transaction=None) -> int:
+        """
+        Server-side COUNT() aggregation: billed and transferred as a single aggregation
+        read, rather than streaming every matching document just to len() them.
+        """
+        results = await query.count(alias="count").get(transaction=transaction)
+        return int(results[0][0].value) if results and results[0] else 0
 
     # ============ PROFILES ============
     
@@ -59,7 +155,7 @@ class FirestoreDB:
     async def get_profile(user_id: str) -> Optional[Dict]:
         """Get user profile"""
         try:
-            doc = get_db().collection(PROFILES_COLLECTION).document(user_id).get()
+            doc = await get_db().collection(PROFILES_COLLECTION).document(user_id).get()
             if doc.exists:
                 data = doc.to_dict()
                 data['id'] = doc.id
@@ -76,7 +172,8 @@ class FirestoreDB:
         display_name: str = "",
         photo_url: str = "",
         full_name: str = "",
-        phone_number: str = ""
+        phone_number: str = "",
+        timezone: str = DEFAULT_TIMEZONE
     ) -> Dict:
         """Create user profile (onboarding). Privacy defaults to fully private."""
         try:
@@ -87,12 +184,16 @@ class FirestoreDB:
                 "display_name": display_name,
                 "photo_url": photo_url,
                 "bio": "",
+                "timezone": timezone,
                 "total_score": 0,
                 "level": 1,
                 "tasks_completed": 0,
                 "streak_days": 0,
                 "last_activity": None,
+                "streak_expires_at": None,
                 "achievements": [],
+                "unread_count": 0,
+                "unread_count_synced": True,
                 "privacy": {
                     "public_profile_enabled": False,
                     "show_email": False,
@@ -114,8 +215,7 @@ class FirestoreDB:
                 "created_at": firestore.SERVER_TIMESTAMP,
                 "updated_at": firestore.SERVER_TIMESTAMP
             }
-            get_db().collection(PROFILES_COLLECTION).document(user_id).set(profile_data)
-            return FirestoreDB._read_back(PROFILES_COLLECTION, user_id)
+            return await FirestoreDB._set_resolved(PROFILES_COLLECTION, user_id, profile_data)
         except Exception as e:
             print(f"Error creating profile for {user_id}: {e}")
             raise
@@ -124,19 +224,136 @@ class FirestoreDB:
     async def update_profile(user_id: str, updates: Dict) -> None:
         """Update user profile"""
         updates['updated_at'] = firestore.SERVER_TIMESTAMP
-        get_db().collection(PROFILES_COLLECTION).document(user_id).update(updates)
+        await get_db().collection(PROFILES_COLLECTION).document(user_id).update(updates)
 
     @staticmethod
-    async def get_all_profiles() -> List[Dict]:
-        """Get every user profile - used by SchedulerService's per-user sweeps"""
-        docs = get_db().collection(PROFILES_COLLECTION).stream()
+    async def get_all_profiles(fields: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Get every user profile - used to seed the leaderboard index. `fields` projects
+        the read down to just those fields.
+        """
+        query = get_db().collection(PROFILES_COLLECTION)
+        if fields:
+            query = query.select(fields)
+        docs = query.stream()
         profiles = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             profiles.append(data)
         return profiles
     
+    @staticmethod
+    def _after_profile(query, after: str):
+        profile_ref = get_db().collection(PROFILES_COLLECTION).document(after)
+        return query.where(FieldPath.document_id(), '>', profile_ref).order_by(FieldPath.document_id())
+
+    @staticmethod
+    def _timezone_queries(timezones: List[str], after: Optional[str]) -> List[Any]:
+        """One id-ordered profiles query per MAX_IN_VALUES-sized chunk of timezones"""
+        queries = []
+        for i in range(0, len(timezones), MAX_IN_VALUES):
+            query = get_db().collection(PROFILES_COLLECTION).where('timezone', 'in', timezones[i:i + MAX_IN_VALUES])
+            if after is not None:
+                query = FirestoreDB._after_profile(query, after)
+            else:
+                query = query.order_by(FieldPath.document_id())
+            queries.append(query)
+        return queries
+
+    @staticmethod
+    async def _stream_docs(query) -> AsyncIterator[Dict]:
+        async for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id
+            yield data
+
+    @staticmethod
+    async def _merge_by_id(streams: List[AsyncIterator[Dict]]) -> AsyncIterator[Dict]:
+        """Merge id-ordered streams into one id-ordered stream"""
+        heads = []
+        for i, stream in enumerate(streams):
+            first = await anext(stream, None)
+            if first is not None:
+                heapq.heappush(heads, (first['id'], i, first))
+        while heads:
+            _, i, item = heapq.heappop(heads)
+            yield item
+            following = await anext(streams[i], None)
+            if following is not None:
+                heapq.heappush(heads, (following['id'], i, following))
+
+    @staticmethod
+    async def stream_profiles_in_timezones(
+        timezones: List[str],
+        fields: Optional[List[str]] = None,
+        after: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Profiles whose timezone is one of `timezones`, in document-id order (starting
+        after `after`, if given) - one local-time bucket of users for the
+        timezone-bucketed scheduled sends. Served by the single-field timezone index.
+        """
+        queries = FirestoreDB._timezone_queries(timezones, after)
+        if fields:
+            queries = [query.select(fields) for query in queries]
+        async for data in FirestoreDB._merge_by_id([FirestoreDB._stream_docs(query) for query in queries]):
+            yield data
+
+    @staticmethod
+    async def count_profiles_in_timezones(timezones: List[str], after: Optional[str] = None) -> int:
+        """Size of a timezone bucket (after this user id, if given) - one aggregation read per chunk"""
+        counts = await asyncio.gather(*(
+            FirestoreDB._count(query) for query in FirestoreDB._timezone_queries(timezones, after)
+        ))
+        return sum(counts)
+
+    @staticmethod
+    async def stream_profiles_streak_expiring(
+        start: datetime,
+        end: datetime,
+        fields: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Profiles whose streak_expires_at falls in [start, end) - a single-field range
+        query, so the hourly streak-risk sweep reads only the users actually at risk.
+        """
+        query = (
+            get_db().collection(PROFILES_COLLECTION)
+            .where('streak_expires_at', '>=', start)
+            .where('streak_expires_at', '<', end)
+        )
+        if fields:
+            query = query.select(fields)
+        async for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id
+            yield data
+
+    @staticmethod
+    async def claim_streak_warning(user_id: str, day: str, expires_before: datetime) -> bool:
+        """
+        Mark the user as warned about their streak on `day`, in a transaction. False if
+        they were already warned that day, or their streak_expires_at has since moved
+        past expires_before (a task was completed after the sweep's query) - so
+        overlapping or repeated sweeps notify each user at most once a day.
+        """
+        profile_ref = get_db().collection(PROFILES_COLLECTION).document(user_id)
+
+        @firestore.async_transactional
+        async def _claim(transaction) -> bool:
+            snapshot = await profile_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            profile = snapshot.to_dict()
+            expires_at = profile.get("streak_expires_at")
+            if profile.get("streak_risk_warned_on") == day or expires_at is None or expires_at >= expires_before:
+                return False
+            transaction.update(profile_ref, {"streak_risk_warned_on": day})
+            return True
+
+        return await _claim(get_db().transaction())
+
     # ============ PLANTS ============
     
     @staticmethod
@@ -149,13 +366,12 @@ class FirestoreDB:
             "created_at": firestore.SERVER_TIMESTAMP,
             "updated_at": firestore.SERVER_TIMESTAMP
         })
-        get_db().collection(PLANTS_COLLECTION).document(plant_id).set(plant_data)
-        return FirestoreDB._read_back(PLANTS_COLLECTION, plant_id)
+        return await FirestoreDB._set_resolved(PLANTS_COLLECTION, plant_id, plant_data)
     
     @staticmethod
     async def get_plant(plant_id: str, user_id: str) -> Optional[Dict]:
         """Get a single plant"""
-        doc = get_db().collection(PLANTS_COLLECTION).document(plant_id).get()
+        doc = await get_db().collection(PLANTS_COLLECTION).document(plant_id).get()
         if doc.exists:
             data = doc.to_dict()
             if data.get('user_id') == user_id:
@@ -169,7 +385,7 @@ class FirestoreDB:
         plants_ref = get_db().collection(PLANTS_COLLECTION).where('user_id', '==', user_id)
         docs = plants_ref.stream()
         plants = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             plants.append(data)
@@ -179,12 +395,17 @@ class FirestoreDB:
     async def update_plant(plant_id: str, updates: Dict) -> None:
         """Update a plant"""
         updates['updated_at'] = firestore.SERVER_TIMESTAMP
-        get_db().collection(PLANTS_COLLECTION).document(plant_id).update(updates)
+        await get_db().collection(PLANTS_COLLECTION).document(plant_id).update(updates)
     
     @staticmethod
     async def delete_plant(plant_id: str) -> None:
-        """Delete a plant"""
-        get_db().collection(PLANTS_COLLECTION).document(plant_id).delete()
+        """Delete a plant, and its care rules - so no more occurrences are expanded for it"""
+        batch = get_db().batch()
+        batch.delete(get_db().collection(PLANTS_COLLECTION).document(plant_id))
+        rules = get_db().collection(CARE_RULES_COLLECTION).where('plant_id', '==', plant_id).select([])
+        async for doc in rules.stream():
+            batch.delete(doc.reference)
+        await batch.commit()
     
     # ============ CARE TASKS ============
     
@@ -192,17 +413,17 @@ class FirestoreDB:
     async def create_task(task_data: Dict) -> Dict:
         """Create a care task"""
         task_id = FirestoreDB.generate_id()
+        FirestoreDB._normalize_task_dates(task_data)
         task_data.update({
             "id": task_id,
             "created_at": firestore.SERVER_TIMESTAMP
         })
-        get_db().collection(TASKS_COLLECTION).document(task_id).set(task_data)
-        return FirestoreDB._read_back(TASKS_COLLECTION, task_id)
-    
+        return await FirestoreDB._set_resolved(TASKS_COLLECTION, task_id, task_data)
+
     @staticmethod
     async def get_task(task_id: str) -> Optional[Dict]:
         """Get a single task"""
-        doc = get_db().collection(TASKS_COLLECTION).document(task_id).get()
+        doc = await get_db().collection(TASKS_COLLECTION).document(task_id).get()
         if doc.exists:
             data = doc.to_dict()
             data['id'] = doc.id
@@ -220,19 +441,84 @@ class FirestoreDB:
             query = query.where('completed', '==', completed)
         docs = query.stream()
         tasks = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             tasks.append(data)
         return tasks
     
+    @staticmethod
+    async def get_user_tasks_in_range(
+        user_id: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        completed: Optional[bool] = None
+    ) -> List[Dict]:
+        """
+        A user's tasks with start <= due_date < end (either bound may be None for an
+        open range), ordered by due_date. Filtered server-side so /tasks/today and the
+        dashboard read only the rows they return, instead of streaming every task the
+        user has ever had. Backed by the care_tasks (user_id, due_date) and (user_id,
+        completed, due_date) composite indexes in firestore.indexes.json. Only matches
+        Timestamp due_dates - legacy ISO-string documents need migrating first.
+        """
+        query = get_db().collection(TASKS_COLLECTION).where('user_id', '==', user_id)
+        if completed is not None:
+            query = query.where('completed', '==', completed)
+        if start is not None:
+            query = query.where('due_date', '>=', start)
+        if end is not None:
+            query = query.where('due_date', '<', end)
+        docs = query.order_by('due_date').stream()
+        tasks = []
+        async for doc in docs:
+            data = doc.to_dict()
+            data['id'] = doc.id
+            tasks.append(data)
+        return tasks
+
+    @staticmethod
+    async def stream_tasks_due(
+        start: datetime,
+        end: datetime,
+        user_ids: List[str],
+        completed: bool = False,
+        fields: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        These users' tasks with start <= due_date < end: one `user_id in` query per
+        MAX_IN_VALUES users instead of one query per user, on the care_tasks (user_id,
+        completed, due_date) composite index. Like get_user_tasks_in_range, only
+        matches Timestamp due_dates.
+        """
+        for i in range(0, len(user_ids), MAX_IN_VALUES):
+            query = (
+                get_db().collection(TASKS_COLLECTION)
+                .where('user_id', 'in', user_ids[i:i + MAX_IN_VALUES])
+                .where('completed', '==', completed)
+                .where('due_date', '>=', start)
+                .where('due_date', '<', end)
+            )
+            if fields:
+                query = query.select(fields)
+            async for data in FirestoreDB._stream_docs(query.order_by('due_date')):
+                yield data
+
+    @staticmethod
+    async def count_user_tasks(user_id: str, completed: Optional[bool] = None) -> int:
+        """Count a user's tasks (optionally by completion status) as one aggregation read"""
+        query = get_db().collection(TASKS_COLLECTION).where('user_id', '==', user_id)
+        if completed is not None:
+            query = query.where('completed', '==', completed)
+        return await FirestoreDB._count(query)
+
     @staticmethod
     async def get_plant_tasks(plant_id: str) -> List[Dict]:
         """Get all tasks for a specific plant"""
         tasks_ref = get_db().collection(TASKS_COLLECTION).where('plant_id', '==', plant_id)
         docs = tasks_ref.stream()
         tasks = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             tasks.append(data)
@@ -241,25 +527,132 @@ class FirestoreDB:
     @staticmethod
     async def update_task(task_id: str, updates: Dict) -> None:
         """Update a task"""
-        get_db().collection(TASKS_COLLECTION).document(task_id).update(updates)
+        FirestoreDB._normalize_task_dates(updates)
+        await get_db().collection(TASKS_COLLECTION).document(task_id).update(updates)
     
     @staticmethod
     async def delete_task(task_id: str) -> None:
         """Delete a task"""
-        get_db().collection(TASKS_COLLECTION).document(task_id).delete()
+        await get_db().collection(TASKS_COLLECTION).document(task_id).delete()
     
+    # ============ CARE RULES ============
+
+    @staticmethod
+    async def save_care_rules(rules: List[Dict]) -> List[Dict]:
+        """
+        Create or replace recurring care rules (see services/recurring_task_service.py)
+        in one WriteBatch commit. Each rule carries its own id, "{plant_id}_{task_type}",
+        so there is at most one rule per plant and task type.
+        """
+        batch = get_db().batch()
+        for rule in rules:
+            rule["created_at"] = firestore.SERVER_TIMESTAMP
+            batch.set(get_db().collection(CARE_RULES_COLLECTION).document(rule["id"]), rule)
+        write_results = await batch.commit()
+        return [
+            FirestoreDB._resolve_server_timestamps(rule, result.update_time)
+            for rule, result in zip(rules, write_results)
+        ]
+
+    @staticmethod
+    async def get_care_rule(rule_id: str) -> Optional[Dict]:
+        """Get a single care rule"""
+        doc = await get_db().collection(CARE_RULES_COLLECTION).document(rule_id).get()
+        if doc.exists:
+            data = doc.to_dict()
+            data['id'] = doc.id
+            return data
+        return None
+
+    @staticmethod
+    async def get_user_care_rules(user_id: str) -> List[Dict]:
+        """All of a user's care rules - one per plant and task type, so a handful per plant"""
+        query = get_db().collection(CARE_RULES_COLLECTION).where('user_id', '==', user_id)
+        return [data async for data in FirestoreDB._stream_docs(query)]
+
+    @staticmethod
+    async def get_plant_care_rules(plant_id: str) -> List[Dict]:
+        """A plant's care rules"""
+        query = get_db().collection(CARE_RULES_COLLECTION).where('plant_id', '==', plant_id)
+        return [data async for data in FirestoreDB._stream_docs(query)]
+
+    @staticmethod
+    async def stream_care_rules(user_ids: List[str], fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """These users' care rules, one `user_id in` query per MAX_IN_VALUES users"""
+        for i in range(0, len(user_ids), MAX_IN_VALUES):
+            query = get_db().collection(CARE_RULES_COLLECTION).where('user_id', 'in', user_ids[i:i + MAX_IN_VALUES])
+            if fields:
+                query = query.select(fields)
+            async for data in FirestoreDB._stream_docs(query):
+                yield data
+
+    @staticmethod
+    async def write_occurrence(
+        task_id: str,
+        rule_id: str,
+        day: str,
+        task_data: Optional[Dict],
+        stale_exceptions: List[str],
+        effects: List[Dict]
+    ) -> List[str]:
+        """
+        Persist what happened to one occurrence of a care rule, in one commit: the
+        occurrence as a care_tasks document under task_id, its occurrence id (task_data;
+        None when the occurrence is just skipped), `day` added to the rule's exceptions so it
+        is no longer expanded, exceptions no expansion can reach any more removed, and
+        the change's outbox entries. Returns the outbox entry ids.
+        """
+        rule_ref = get_db().collection(CARE_RULES_COLLECTION).document(rule_id)
+        batch = get_db().batch()
+        if task_data is not None:
+            FirestoreDB._normalize_task_dates(task_data)
+            task_data["id"] = task_id
+            task_data["created_at"] = firestore.SERVER_TIMESTAMP
+            batch.set(get_db().collection(TASKS_COLLECTION).document(task_id), task_data)
+        # Separate writes: one write can't apply two transforms to the same field
+        if stale_exceptions:
+            batch.update(rule_ref, {"exceptions": firestore.ArrayRemove(stale_exceptions)})
+        batch.update(rule_ref, {"exceptions": firestore.ArrayUnion([day])})
+        entry_ids = FirestoreDB._add_outbox_entries(batch, effects)
+        await batch.commit()
+        return entry_ids
+
     # ============ NOTIFICATIONS ============
     
     @staticmethod
-    async def create_notification(notification_data: Dict) -> Dict:
-        """Create a notification"""
-        notif_id = FirestoreDB.generate_id()
+    async def create_notification(notification_data: Dict, notif_id: Optional[str] = None) -> Tuple[Dict, Optional[int]]:
+        """
+        Create a notification and, for an unread one, bump the recipient's
+        profiles.unread_count in the same commit. Returns the notification and the new
+        unread_count - None if unchanged, or the user has no profile (the notification
+        is still written).
+
+        With a caller-chosen notif_id the write is idempotent: if that notification
+        already exists (a retried outbox entry), it's returned as stored and the
+        counter isn't bumped again.
+        """
+        notif_id = notif_id or FirestoreDB.generate_id()
         notification_data.update({
             "id": notif_id,
             "created_at": firestore.SERVER_TIMESTAMP
         })
-        get_db().collection(NOTIFICATIONS_COLLECTION).document(notif_id).set(notification_data)
-        return FirestoreDB._read_back(NOTIFICATIONS_COLLECTION, notif_id)
+        if notification_data.get("read"):
+            return await FirestoreDB._set_resolved(NOTIFICATIONS_COLLECTION, notif_id, notification_data), None
+
+        notif_ref = get_db().collection(NOTIFICATIONS_COLLECTION).document(notif_id)
+        counter = {"unread_count": firestore.Increment(1)}
+        batch = get_db().batch()
+        batch.create(notif_ref, notification_data)
+        batch.update(get_db().collection(PROFILES_COLLECTION).document(notification_data["user_id"]), counter)
+        try:
+            notif_result, profile_result = await batch.commit()
+        except AlreadyExists:
+            existing = await notif_ref.get()
+            return {**existing.to_dict(), "id": notif_id}, None
+        except NotFound:
+            return await FirestoreDB._set_resolved(NOTIFICATIONS_COLLECTION, notif_id, notification_data), None
+        unread_count = FirestoreDB._transform_results(counter, profile_result)["unread_count"]
+        return FirestoreDB._resolve_server_timestamps(notification_data, notif_result.update_time), unread_count
     
     @staticmethod
     async def get_user_notifications(user_id: str, unread_only: bool = False, limit: int = 50) -> List[Dict]:
@@ -270,28 +663,174 @@ class FirestoreDB:
         query = query.order_by('created_at', direction=firestore.Query.DESCENDING).limit(limit)
         docs = query.stream()
         notifications = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             notifications.append(data)
         return notifications
     
     @staticmethod
-    async def update_notification(notif_id: str, updates: Dict) -> None:
-        """Update a notification"""
-        get_db().collection(NOTIFICATIONS_COLLECTION).document(notif_id).update(updates)
-    
+    async def get_notification(notif_id: str, user_id: str) -> Optional[Dict]:
+        """Get a single notification, if it belongs to this user"""
+        doc = await get_db().collection(NOTIFICATIONS_COLLECTION).document(notif_id).get()
+        if doc.exists:
+            data = doc.to_dict()
+            if data.get('user_id') == user_id:
+                data['id'] = doc.id
+                return data
+        return None
+
     @staticmethod
-    async def delete_notification(notif_id: str) -> None:
-        """Delete a notification"""
-        get_db().collection(NOTIFICATIONS_COLLECTION).document(notif_id).delete()
+    async def get_notifications_since(user_id: str, since: datetime, limit: int = 50) -> List[Dict]:
+        """
+        Notifications created after `since`, oldest first - the newest `limit` of them
+        if more were missed. Queried newest-first so it's served by the same
+        (user_id, created_at DESC) index as get_user_notifications.
+        """
+        query = (get_db().collection(NOTIFICATIONS_COLLECTION)
+                 .where('user_id', '==', user_id)
+                 .where('created_at', '>', since)
+                 .order_by('created_at', direction=firestore.Query.DESCENDING)
+                 .limit(limit))
+        notifications = []
+        async for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id
+            notifications.append(data)
+        notifications.reverse()
+        return notifications
+
+    @staticmethod
+    async def count_unread_notifications(user_id: str, transaction=None) -> int:
+        """Unread-notification badge count, as one aggregation read"""
+        query = get_db().collection(NOTIFICATIONS_COLLECTION).where('user_id', '==', user_id).where('read', '==', False)
+        return await FirestoreDB._count(query, transaction=transaction)
+
+    @staticmethod
+    async def get_unread_count(user_id: str) -> int:
+        """
+        Unread-notification badge count from the profile's maintained unread_count - one
+        document read. Profiles that predate the counter (no unread_count_synced flag)
+        are seeded from a count aggregation on first call.
+        """
+        profile_ref = get_db().collection(PROFILES_COLLECTION).document(user_id)
+        profile = await profile_ref.get(field_paths=UNREAD_COUNT_FIELDS)
+        if not profile.exists:
+            return await FirestoreDB.count_unread_notifications(user_id)
+        data = profile.to_dict() or {}
+        if data.get("unread_count_synced"):
+            return max(0, data.get("unread_count") or 0)
+        return await FirestoreDB._seed_unread_count(user_id, profile_ref)
+
+    @staticmethod
+    async def _seed_unread_count(user_id: str, profile_ref) -> int:
+        """
+        Count a legacy profile's unread notifications and store the counter in one
+        transaction, so a create_notification increment can't land between the count
+        and the write and be overwritten.
+        """
+        @firestore.async_transactional
+        async def _seed(transaction) -> int:
+            profile = await profile_ref.get(field_paths=UNREAD_COUNT_FIELDS, transaction=transaction)
+            data = profile.to_dict() or {}
+            if data.get("unread_count_synced"):  # seeded by a concurrent call
+                return max(0, data.get("unread_count") or 0)
+            count = await FirestoreDB.count_unread_notifications(user_id, transaction=transaction)
+            transaction.update(profile_ref, {"unread_count": count, "unread_count_synced": True})
+            return count
+
+        return await _seed(get_db().transaction())
+
+    @staticmethod
+    def _decrement_unread(transaction, profile_ref, profile) -> Optional[int]:
+        """Within a transaction: one fewer unread notification, if the counter is in use."""
+        data = (profile.to_dict() or {}) if profile.exists else {}
+        if not data.get("unread_count_synced"):
+            return None
+        unread_count = max(0, (data.get("unread_count") or 0) - 1)
+        transaction.update(profile_ref, {"unread_count": unread_count})
+        return unread_count
+
+    @staticmethod
+    async def _change_own_notification(notif_id: str, user_id: str, delete: bool) -> Optional[int]:
+        """
+        Mark read (or delete) one of this user's notifications, decrementing
+        unread_count in the same transaction if it was unread. Returns the new count,
+        or None if nothing about it changed.
+        """
+        notif_ref = get_db().collection(NOTIFICATIONS_COLLECTION).document(notif_id)
+        profile_ref = get_db().collection(PROFILES_COLLECTION).document(user_id)
+
+        @firestore.async_transactional
+        async def _change(transaction) -> Optional[int]:
+            notification = await notif_ref.get(transaction=transaction)
+            data = notification.to_dict() if notification.exists else None
+            if not data or data.get("user_id") != user_id:
+                return None
+            was_unread = not data.get("read")
+            profile = await profile_ref.get(field_paths=UNREAD_COUNT_FIELDS, transaction=transaction) if was_unread else None
+            if delete:
+                transaction.delete(notif_ref)
+            elif was_unread:
+                transaction.update(notif_ref, {"read": True})
+            return FirestoreDB._decrement_unread(transaction, profile_ref, profile) if was_unread else None
+
+        return await _change(get_db().transaction())
+
+    @staticmethod
+    async def mark_notification_read(notif_id: str, user_id: str) -> Optional[int]:
+        """Mark one of the user's notifications read; returns the new unread_count if it changed"""
+        return await FirestoreDB._change_own_notification(notif_id, user_id, delete=False)
+
+    @staticmethod
+    async def delete_notification(notif_id: str, user_id: str) -> Optional[int]:
+        """Delete one of the user's notifications; returns the new unread_count if it changed"""
+        return await FirestoreDB._change_own_notification(notif_id, user_id, delete=True)
     
     @staticmethod
-    async def mark_all_notifications_read(user_id: str) -> None:
-        """Mark all user notifications as read"""
-        notifications = get_db().collection(NOTIFICATIONS_COLLECTION).where('user_id', '==', user_id).where('read', '==', False).stream()
-        for doc in notifications:
-            doc.reference.update({'read': True})
+    async def mark_all_notifications_read(user_id: str) -> int:
+        """
+        Mark all user notifications as read, taking exactly that many off unread_count.
+        Only the unread documents' references are fetched, and they're marked in
+        transactions of up to MAX_BATCH_WRITES - 1 (leaving room for the profile write)
+        instead of one round-trip per notification. Returns how many were marked.
+        """
+        query = (get_db().collection(NOTIFICATIONS_COLLECTION)
+                 .where('user_id', '==', user_id)
+                 .where('read', '==', False)
+                 .select([FieldPath.document_id()]))
+        refs = [doc.reference async for doc in query.stream()]
+        profile_ref = get_db().collection(PROFILES_COLLECTION).document(user_id)
+
+        marked = 0
+        for start in range(0, len(refs), MAX_BATCH_WRITES - 1):
+            marked += await FirestoreDB._mark_read(refs[start:start + MAX_BATCH_WRITES - 1], profile_ref)
+        return marked
+
+    @staticmethod
+    async def _mark_read(refs: List[Any], profile_ref) -> int:
+        """
+        In one transaction: mark whichever of these notifications are still unread as
+        read, and decrement unread_count by that many - rather than resetting it to 0,
+        which would drop a create_notification increment landing in between, or
+        double-count one a concurrent mark-read already took off.
+        """
+        @firestore.async_transactional
+        async def _mark(transaction) -> int:
+            unread = [
+                snapshot.reference
+                async for snapshot in get_db().get_all(refs, field_paths=["read"], transaction=transaction)
+                if snapshot.exists and not (snapshot.to_dict() or {}).get("read")
+            ]
+            profile = await profile_ref.get(field_paths=UNREAD_COUNT_FIELDS, transaction=transaction)
+            for ref in unread:
+                transaction.update(ref, {"read": True})
+            data = (profile.to_dict() or {}) if profile.exists else {}
+            if unread and data.get("unread_count_synced"):
+                transaction.update(profile_ref, {"unread_count": max(0, (data.get("unread_count") or 0) - len(unread))})
+            return len(unread)
+
+        return await _mark(get_db().transaction())
     
     # ============ HEALTH CHECKS ============
     
@@ -303,8 +842,7 @@ class FirestoreDB:
             "id": check_id,
             "checked_at": firestore.SERVER_TIMESTAMP
         })
-        get_db().collection(HEALTH_CHECKS_COLLECTION).document(check_id).set(health_data)
-        return FirestoreDB._read_back(HEALTH_CHECKS_COLLECTION, check_id)
+        return await FirestoreDB._set_resolved(HEALTH_CHECKS_COLLECTION, check_id, health_data)
     
     @staticmethod
     async def get_plant_health_checks(plant_id: str) -> List[Dict]:
@@ -312,7 +850,7 @@ class FirestoreDB:
         checks_ref = get_db().collection(HEALTH_CHECKS_COLLECTION).where('plant_id', '==', plant_id)
         docs = checks_ref.order_by('checked_at', direction=firestore.Query.DESCENDING).stream()
         checks = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             checks.append(data)
@@ -329,13 +867,12 @@ class FirestoreDB:
             "status": rec_data.get("status", "pending"),
             "created_at": firestore.SERVER_TIMESTAMP
         })
-        get_db().collection(RECOMMENDATIONS_COLLECTION).document(rec_id).set(rec_data)
-        return FirestoreDB._read_back(RECOMMENDATIONS_COLLECTION, rec_id)
+        return await FirestoreDB._set_resolved(RECOMMENDATIONS_COLLECTION, rec_id, rec_data)
 
     @staticmethod
     async def get_recommendation(rec_id: str) -> Optional[Dict]:
         """Get a single recommendation"""
-        doc = get_db().collection(RECOMMENDATIONS_COLLECTION).document(rec_id).get()
+        doc = await get_db().collection(RECOMMENDATIONS_COLLECTION).document(rec_id).get()
         if doc.exists:
             data = doc.to_dict()
             data['id'] = doc.id
@@ -348,7 +885,7 @@ class FirestoreDB:
         query = get_db().collection(RECOMMENDATIONS_COLLECTION).where('user_id', '==', user_id)
         docs = query.stream()
         recommendations = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             if status is None or data.get('status') == status:
@@ -358,7 +895,7 @@ class FirestoreDB:
     @staticmethod
     async def update_recommendation(rec_id: str, updates: Dict) -> None:
         """Update a recommendation"""
-        get_db().collection(RECOMMENDATIONS_COLLECTION).document(rec_id).update(updates)
+        await get_db().collection(RECOMMENDATIONS_COLLECTION).document(rec_id).update(updates)
 
     # ============ EMAIL (mail + email_logs) ============
 
@@ -367,7 +904,8 @@ class FirestoreDB:
         """
         Write a document to the `mail` collection (consumed by the Firebase Trigger
         Email extension) and a paired `email_logs` entry, per
-        docs/04-Rules-of-Engagement.md Rule 13.
+        docs/04-Rules-of-Engagement.md Rule 13. Both go in one batch commit - a single
+        round-trip, and a `mail` doc can never exist without its log entry.
         """
         mail_id = FirestoreDB.generate_id()
         mail_data = {
@@ -375,7 +913,6 @@ class FirestoreDB:
             "to": [to_email],
             "message": {"subject": subject, "html": html}
         }
-        get_db().collection(MAIL_COLLECTION).document(mail_id).set(mail_data)
 
         log_id = FirestoreDB.generate_id()
         log_data = {
@@ -387,8 +924,12 @@ class FirestoreDB:
             "mail_ref": mail_id,
             "sent_at": firestore.SERVER_TIMESTAMP
         }
-        get_db().collection(EMAIL_LOGS_COLLECTION).document(log_id).set(log_data)
-        return FirestoreDB._read_back(EMAIL_LOGS_COLLECTION, log_id)
+
+        batch = get_db().batch()
+        batch.set(get_db().collection(MAIL_COLLECTION).document(mail_id), mail_data)
+        batch.set(get_db().collection(EMAIL_LOGS_COLLECTION).document(log_id), log_data)
+        _, log_result = await batch.commit()
+        return FirestoreDB._resolve_server_timestamps(log_data, log_result.update_time)
 
     @staticmethod
     async def get_user_email_logs(user_id: str, limit: int = 50) -> List[Dict]:
@@ -397,7 +938,7 @@ class FirestoreDB:
         query = query.order_by('sent_at', direction=firestore.Query.DESCENDING).limit(limit)
         docs = query.stream()
         logs = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
             logs.append(data)
@@ -406,25 +947,337 @@ class FirestoreDB:
     # ============ LEADERBOARD ============
     
     @staticmethod
-    async def get_leaderboard(limit: int = 100) -> List[Dict]:
-        """Get leaderboard sorted by score"""
-        profiles_ref = get_db().collection(PROFILES_COLLECTION).order_by('total_score', direction=firestore.Query.DESCENDING).limit(limit)
-        docs = profiles_ref.stream()
-        leaderboard = []
-        for doc in docs:
+    def _score_bucket_write(user_id: str, points: int, day: date) -> Tuple[Any, Dict]:
+        """
+        The (ref, data) merge-set appending points to this user's daily score bucket
+        (`score_events/{user_id}_{day}`). Increment transforms, so concurrent completions
+        on the same day accumulate instead of overwriting each other. These buckets are
+        what the weekly/monthly leaderboard rollup sums over.
+        """
+        ref = get_db().collection(SCORE_EVENTS_COLLECTION).document(f"{user_id}_{day.isoformat()}")
+        return ref, {
+            "user_id": user_id,
+            "day": day.isoformat(),
+            "points": firestore.Increment(points),
+            "events": firestore.Increment(1),
+            "updated_at": firestore.SERVER_TIMESTAMP
+        }
+
+    @staticmethod
+    def _transform_results(updates: Dict, write_result: Any) -> Dict[str, Any]:
+        """
+        Map a WriteResult's transform_results (the post-transform value of each
+        Increment/Maximum/SERVER_TIMESTAMP field) back to field names. The client emits a
+        write's field transforms sorted by field path and Firestore answers in that order.
+        """
+        transform_paths = sorted(
+            (path for path, value in updates.items() if value is firestore.SERVER_TIMESTAMP or isinstance(value, TRANSFORM_TYPES)),
+            key=FieldPath.from_string
+        )
+        return {
+            path: _helpers.decode_value(value, None)
+            for path, value in zip(transform_paths, write_result.transform_results)
+        }
+
+    @staticmethod
+    async def award_points(
+        user_id: str,
+        points: int,
+        last_activity: str,
+        build_updates: Optional[Callable[[Dict], Dict]] = None,
+        streak_expires_at: Optional[datetime] = None,
+        award_id: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Atomically add `points` to a profile's total_score and 1 to tasks_completed, set
+        last_activity (and streak_expires_at, if given), and append the points to
+        today's score_events bucket. Score and
+        count use Increment transforms, so concurrent completions never lose an update.
+
+        Without build_updates this is one read-free batch commit; the post-increment
+        total_score / tasks_completed come back in the commit's transform results. With
+        build_updates, the same writes run inside a transaction that first reads the
+        profile and passes it to build_updates - for the streak/level logic that needs
+        the previous values - and the fields it returns are written alongside the
+        increments. An "achievements" key there lists achievements to *add* (written
+        as ArrayUnion). Returns the resulting values plus whatever build_updates set, or
+        None if the profile doesn't exist.
+
+        With an award_id (the outbox entry awarding the points) a `score_awards/{award_id}`
+        marker is created in the same commit, so re-running an award that already
+        landed fails as a whole - nothing is applied twice - and also returns None.
+        """
+        profile_ref = get_db().collection(PROFILES_COLLECTION).document(user_id)
+        bucket_ref, bucket_data = FirestoreDB._score_bucket_write(user_id, points, date.today())
+        increments = {
+            "total_score": firestore.Increment(points),
+            "tasks_completed": firestore.Increment(1),
+            "last_activity": last_activity,
+            "updated_at": firestore.SERVER_TIMESTAMP
+        }
+        if streak_expires_at is not None:
+            increments["streak_expires_at"] = streak_expires_at
+        award_ref = get_db().collection(SCORE_AWARDS_COLLECTION).document(award_id) if award_id else None
+        award_data = {"user_id": user_id, "points": points, "created_at": firestore.SERVER_TIMESTAMP}
+
+        if build_updates is None:
+            batch = get_db().batch()
+            batch.update(profile_ref, increments)
+            batch.set(bucket_ref, bucket_data, merge=True)
+            if award_ref is not None:
+                batch.create(award_ref, award_data)
+            try:
+                write_results = await batch.commit()
+            except (NotFound, AlreadyExists):
+                return None
+            values = FirestoreDB._transform_results(increments, write_results[0])
+            return {"total_score": values["total_score"], "tasks_completed": values["tasks_completed"]}
+
+        @firestore.async_transactional
+        async def _award(transaction) -> Optional[Dict]:
+            snapshot = await profile_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            profile = snapshot.to_dict()
+            profile['id'] = user_id
+            extra = build_updates(profile)
+            updates = {**increments, **extra}
+            if "achievements" in extra:
+                updates["achievements"] = firestore.ArrayUnion(extra["achievements"])
+            transaction.update(profile_ref, updates)
+            transaction.set(bucket_ref, bucket_data, merge=True)
+            if award_ref is not None:
+                transaction.create(award_ref, award_data)
+            return {
+                "total_score": (profile.get("total_score") or 0) + points,
+                "tasks_completed": (profile.get("tasks_completed") or 0) + 1,
+                **extra
+            }
+
+        try:
+            return await _award(get_db().transaction())
+        except AlreadyExists:
+            return None
+
+    @staticmethod
+    async def grant_achievements(user_id: str, achievements: List[str], level: Optional[int] = None) -> None:
+        """
+        Add achievements (ArrayUnion - no read, idempotent) and, if given, raise level
+        (Maximum - never lowers it if a concurrent completion already went higher).
+        """
+        updates: Dict[str, Any] = {"achievements": firestore.ArrayUnion(achievements)}
+        if level is not None:
+            updates["level"] = firestore.Maximum(level)
+        await get_db().collection(PROFILES_COLLECTION).document(user_id).update(updates)
+
+    @staticmethod
+    async def get_score_buckets_since(start_day: date) -> List[Dict]:
+        """Every user's daily score buckets from start_day (inclusive) onward"""
+        docs = get_db().collection(SCORE_EVENTS_COLLECTION).where('day', '>=', start_day.isoformat()).stream()
+        buckets = []
+        async for doc in docs:
             data = doc.to_dict()
             data['id'] = doc.id
-            leaderboard.append(data)
-        return leaderboard
-    
+            buckets.append(data)
+        return buckets
+
+    @staticmethod
+    async def save_period_leaderboard(period: str, window_start: date, entries: List[Dict]) -> None:
+        """Overwrite the materialized `leaderboards/{period}` document"""
+        await get_db().collection(LEADERBOARDS_COLLECTION).document(period).set({
+            "period": period,
+            "window_start": window_start.isoformat(),
+            "entries": entries,
+            "generated_at": firestore.SERVER_TIMESTAMP
+        })
+
+    @staticmethod
+    async def get_period_leaderboard(period: str) -> Optional[Dict]:
+        """The last materialized leaderboard for a period (weekly/monthly), if any"""
+        doc = await get_db().collection(LEADERBOARDS_COLLECTION).document(period).get()
+        if doc.exists:
+            data = doc.to_dict()
+            data['id'] = doc.id
+            return data
+        return None
+
+    @staticmethod
+    async def get_user_rank(user_id: str, score: Optional[int] = None) -> int:
+        """
+        Get user's rank on leaderboard - 1 + the number of users with a higher score,
+        counted with an aggregation query instead of streaming those profiles. Callers
+        that already hold the user's profile can pass its total_score to skip re-reading it.
+        """
+        if score is None:
+            profile = await FirestoreDB.get_profile(user_id)
+            if not profile:
+                return 0
+            score = profile.get('total_score', 0)
+
+        higher_scores = get_db().collection(PROFILES_COLLECTION).where('total_score', '>', score)
+        return await FirestoreDB._count(higher_scores) + 1
+
+    # ============ OUTBOX ============
+
+    @staticmethod
+    async def update_task_with_outbox(task_id: str, updates: Dict, effects: List[Dict]) -> List[str]:
+        """
+        Apply a task update and enqueue its side effects - each {"kind", "payload"}, run
+        later by OutboxService (services/outbox_service.py) - in one atomic commit, so
+        neither can happen without the other. Returns the new outbox entry ids.
+        """
+        FirestoreDB._normalize_task_dates(updates)
+        batch = get_db().batch()
+        batch.update(get_db().collection(TASKS_COLLECTION).document(task_id), updates)
+        entry_ids = FirestoreDB._add_outbox_entries(batch, effects)
+        await batch.commit()
+        return entry_ids
+
+    @staticmethod
+    def _add_outbox_entries(batch, effects: List[Dict]) -> List[str]:
+        """Add a pending outbox entry per effect to a batch that has yet to commit"""
+        now = datetime.now(timezone.utc)
+        entry_ids = []
+        for effect in effects:
+            entry_id = FirestoreDB.generate_id()
+            batch.set(get_db().collection(OUTBOX_COLLECTION).document(entry_id), {
+                "kind": effect["kind"],
+                "payload": effect["payload"],
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": firestore.SERVER_TIMESTAMP
+            })
+            entry_ids.append(entry_id)
+        return entry_ids
+
+    @staticmethod
+    async def get_due_outbox_ids(limit: int = 100) -> List[str]:
+        """Pending outbox entries whose next attempt is due, oldest first (ids only)"""
+        query = (get_db().collection(OUTBOX_COLLECTION)
+                 .where('status', '==', 'pending')
+                 .where('next_attempt_at', '<=', datetime.now(timezone.utc))
+                 .order_by('next_attempt_at')
+                 .limit(limit)
+                 .select([FieldPath.document_id()]))
+        return [doc.id async for doc in query.stream()]
+
+    @staticmethod
+    async def claim_outbox_entry(entry_id: str, lease_seconds: int) -> Optional[Dict]:
+        """
+        Take an outbox entry for one attempt: if it's pending and due, push its
+        next_attempt_at out by lease_seconds (so no other worker picks it up meanwhile -
+        and a crashed worker's entry becomes due again once the lease lapses) and count
+        the attempt. Returns the entry, or None if it isn't available.
+        """
+        ref = get_db().collection(OUTBOX_COLLECTION).document(entry_id)
+
+        @firestore.async_transactional
+        async def _claim(transaction) -> Optional[Dict]:
+            snapshot = await ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            entry = snapshot.to_dict()
+            now = datetime.now(timezone.utc)
+            if entry.get("status") != "pending" or entry.get("next_attempt_at") > now:
+                return None
+            entry["attempts"] = (entry.get("attempts") or 0) + 1
+            transaction.update(ref, {
+                "attempts": entry["attempts"],
+                "next_attempt_at": now + timedelta(seconds=lease_seconds)
+            })
+            entry['id'] = entry_id
+            return entry
+
+        return await _claim(get_db().transaction())
+
+    @staticmethod
+    async def complete_outbox_entry(entry_id: str) -> None:
+        """Done - remove it from the outbox"""
+        await get_db().collection(OUTBOX_COLLECTION).document(entry_id).delete()
+
+    @staticmethod
+    async def retry_outbox_entry(entry_id: str, error: str, retry_at: Optional[datetime]) -> None:
+        """Record a failed attempt: due again at retry_at, or parked as 'failed' if None"""
+        updates: Dict[str, Any] = {"last_error": error}
+        if retry_at is None:
+            updates["status"] = "failed"
+        else:
+            updates["next_attempt_at"] = retry_at
+        await get_db().collection(OUTBOX_COLLECTION).document(entry_id).update(updates)
+
+    # ============ SWEEP CHECKPOINTS ============
+
+    @staticmethod
+    async def get_sweep_checkpoint(key: str) -> Optional[Dict]:
+        """Where a sharded cron sweep run got to (see scheduler_service.run_sweep_batch)"""
+        doc = await get_db().collection(SWEEP_CHECKPOINTS_COLLECTION).document(key).get()
+        return doc.to_dict() if doc.exists else None
+
+    @staticmethod
+    async def save_sweep_checkpoint(key: str, checkpoint: Dict) -> None:
+        await get_db().collection(SWEEP_CHECKPOINTS_COLLECTION).document(key).set({
+            **checkpoint,
+            "updated_at": firestore.SERVER_TIMESTAMP
+        })
+
+    # ============ LEASES ============
+
     @staticmethod
-    async def get_user_rank(user_id: str) -> int:
-        """Get user's rank on leaderboard"""
-        profile = await FirestoreDB.get_profile(user_id)
-        if not profile:
-            return 0
-        
-        # Count users with higher score
-        higher_scores = get_db().collection(PROFILES_COLLECTION).where('total_score', '>', profile.get('total_score', 0)).stream()
-        rank = len(list(higher_scores)) + 1
-        return rank
+    async def acquire_lease(name: str, holder: str, lease_seconds: int) -> bool:
+        """
+        Take or renew the named lease for `holder`, in a transaction: granted if it's
+        free, expired, or already theirs, and then held for lease_seconds from now.
+        False while another holder's lease is still live.
+        """
+        ref = get_db().collection(LEASES_COLLECTION).document(name)
+
+        @firestore.async_transactional
+        async def _acquire(transaction) -> bool:
+            snapshot = await ref.get(transaction=transaction)
+            now = datetime.now(timezone.utc)
+            lease = snapshot.to_dict() if snapshot.exists else {}
+            if lease.get("holder") not in (None, holder) and lease.get("expires_at") and lease["expires_at"] > now:
+                return False
+            transaction.set(ref, {
+                "holder": holder,
+                "expires_at": now + timedelta(seconds=lease_seconds),
+                "renewed_at": now
+            })
+            return True
+
+        return await _acquire(get_db().transaction())
+
+    @staticmethod
+    async def release_lease(name: str, holder: str) -> None:
+        """Give the lease up early (if `holder` still has it), so another process needn't wait out the expiry"""
+        ref = get_db().collection(LEASES_COLLECTION).document(name)
+
+        @firestore.async_transactional
+        async def _release(transaction) -> None:
+            snapshot = await ref.get(transaction=transaction)
+            if snapshot.exists and snapshot.to_dict().get("holder") == holder:
+                transaction.delete(ref)
+
+        await _release(get_db().transaction())
+
+    # ============ JOB RUNS ============
+
+    @staticmethod
+    async def record_job_run(run: Dict) -> None:
+        """One scheduled-job run's metrics (scheduler_service.run_job)"""
+        await get_db().collection(JOB_RUNS_COLLECTION).document(str(uuid.uuid4())).set(run)
+
+    @staticmethod
+    async def get_job_runs(limit: int, job: Optional[str] = None) -> List[Dict]:
+        """The most recent job runs, newest first - optionally just one job's"""
+        query = get_db().collection(JOB_RUNS_COLLECTION)
+        if job:
+            query = query.where('job', '==', job)
+        docs = query.order_by('started_at', direction=firestore.Query.DESCENDING).limit(limit).stream()
+        runs = []
+        async for doc in docs:
+            data = doc.to_dict()
+            data['id'] = doc.id
+            runs.append(data)
+        return runs
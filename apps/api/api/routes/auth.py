@@ -1,17 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional
-from ..db.firestore import FirestoreDB
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from ..db.firestore import DEFAULT_TIMEZONE, FirestoreDB
 from ..core.auth import verify_firebase_token
+from ..services.leaderboard_index import leaderboard_index
 
 router = APIRouter()
 
+def _known_timezone(value: Optional[str]) -> Optional[str]:
+    """IANA name (e.g. "Europe/Berlin") - drives when scheduled digests reach the user"""
+    if value is not None:
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {value}")
+    return value
+
 class ProfileCreate(BaseModel):
     email: str
     display_name: str = ""
     photo_url: str = ""
     full_name: Optional[str] = None
     phone_number: Optional[str] = None
+    timezone: Optional[str] = None
+
+    _check_timezone = field_validator('timezone')(_known_timezone)
 
 class ProfileUpdate(BaseModel):
     full_name: Optional[str] = None
@@ -19,6 +33,9 @@ class ProfileUpdate(BaseModel):
     display_name: Optional[str] = None
     photo_url: Optional[str] = None
     bio: Optional[str] = None
+    timezone: Optional[str] = None
+
+    _check_timezone = field_validator('timezone')(_known_timezone)
 
 class PrivacyUpdate(BaseModel):
     public_profile_enabled: Optional[bool] = None
@@ -56,8 +73,10 @@ async def create_or_get_profile(
         display_name=profile_data.display_name,
         photo_url=profile_data.photo_url,
         full_name=profile_data.full_name,
-        phone_number=profile_data.phone_number
+        phone_number=profile_data.phone_number,
+        timezone=profile_data.timezone or DEFAULT_TIMEZONE
     )
+    leaderboard_index.upsert(profile)
     return profile
 
 @router.get("/profile")
@@ -81,7 +100,9 @@ async def update_profile(
     changes = {k: v for k, v in updates.dict().items() if v is not None}
     if changes:
         await FirestoreDB.update_profile(user_id, changes)
-    return await FirestoreDB.get_profile(user_id)
+    updated = await FirestoreDB.get_profile(user_id)
+    leaderboard_index.upsert(updated)
+    return updated
 
 @router.patch("/profile/privacy")
 async def update_privacy(
@@ -99,7 +120,9 @@ async def update_privacy(
             privacy[key] = value
 
     await FirestoreDB.update_profile(user_id, {"privacy": privacy})
-    return await FirestoreDB.get_profile(user_id)
+    updated = await FirestoreDB.get_profile(user_id)
+    leaderboard_index.upsert(updated)
+    return updated
 
 @router.patch("/profile/notification-preferences")
 async def update_notification_preferences(
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Header, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Query, status
 from typing import Optional
 
 from ..core.config import settings
+from ..db.firestore import FirestoreDB
 from ..services.scheduler_service import (
+    run_job,
     run_streak_risk_sweep,
     run_task_due_digest,
     run_weekly_summary,
+    run_period_leaderboard_rollup,
+    run_outbox_drain,
 )
 
 router = APIRouter()
@@ -26,22 +30,101 @@ def _require_cron_secret(authorization: Optional[str]) -> None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid cron secret")
 
 
+def _check_run(record: dict) -> dict:
+    """Surface a run_job record that didn't succeed as an HTTP error"""
+    if record["status"] == "skipped":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{record['job']} is already running")
+    if record["status"] != "ok":
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail=f"Failed to run {record['job']}: {record['error']}")
+    return record["stats"]
+
+
+async def _run_sweep_batch(job: str, run_sweep, shard: int, of: int, cursor: Optional[str], limit: int) -> dict:
+    """
+    One batch of a sharded, resumable sweep (see scheduler_service.run_sweep_batch).
+    The caller repeats the call - passing back next_cursor, or nothing to resume from
+    the stored checkpoint - until next_cursor is null, so no single invocation has to
+    fit the whole sweep inside the serverless function timeout. Calls for different
+    shards (shard=0..of-1) can run in parallel.
+    """
+    if shard >= of:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="shard must be less than of")
+    stats = _check_run(await run_job(job, run_sweep, trigger="cron", shard=shard, of=of, cursor=cursor, limit=limit))
+    return {
+        "status": "ok",
+        "job": job,
+        "processed": stats["processed"],
+        "remaining": stats["remaining"],
+        "next_cursor": stats["next_cursor"],
+        "stats": stats,
+    }
+
+
 @router.post("/streak-risk-sweep")
-async def streak_risk_sweep(authorization: Optional[str] = Header(None)):
+async def streak_risk_sweep(
+    authorization: Optional[str] = Header(None),
+    shard: int = Query(0, ge=0),
+    of: int = Query(1, ge=1),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.CRON_SWEEP_BATCH_SIZE, ge=1)
+):
     _require_cron_secret(authorization)
-    await run_streak_risk_sweep()
-    return {"status": "ok", "job": "streak_risk_sweep"}
+    return await _run_sweep_batch("streak_risk_sweep", run_streak_risk_sweep, shard, of, cursor, limit)
 
 
 @router.post("/task-due-digest")
-async def task_due_digest(authorization: Optional[str] = Header(None)):
+async def task_due_digest(
+    authorization: Optional[str] = Header(None),
+    shard: int = Query(0, ge=0),
+    of: int = Query(1, ge=1),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.CRON_SWEEP_BATCH_SIZE, ge=1)
+):
     _require_cron_secret(authorization)
-    await run_task_due_digest()
-    return {"status": "ok", "job": "task_due_digest"}
+    return await _run_sweep_batch("task_due_digest", run_task_due_digest, shard, of, cursor, limit)
 
 
 @router.post("/weekly-summary")
-async def weekly_summary(authorization: Optional[str] = Header(None)):
+async def weekly_summary(
+    authorization: Optional[str] = Header(None),
+    shard: int = Query(0, ge=0),
+    of: int = Query(1, ge=1),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.CRON_SWEEP_BATCH_SIZE, ge=1)
+):
+    _require_cron_secret(authorization)
+    return await _run_sweep_batch("weekly_summary", run_weekly_summary, shard, of, cursor, limit)
+
+
+@router.post("/period-leaderboards")
+async def period_leaderboards(authorization: Optional[str] = Header(None)):
+    _require_cron_secret(authorization)
+    stats = _check_run(await run_job("period_leaderboard_rollup", run_period_leaderboard_rollup, trigger="cron"))
+    return {"status": "ok", "job": "period_leaderboard_rollup", "stats": stats}
+
+
+@router.post("/outbox")
+async def outbox(authorization: Optional[str] = Header(None)):
+    _require_cron_secret(authorization)
+    stats = _check_run(await run_job("outbox_drain", run_outbox_drain, trigger="cron"))
+    return {"status": "ok", "job": "outbox_drain", "stats": stats}
+
+
+@router.get("/runs")
+async def job_runs(
+    authorization: Optional[str] = Header(None),
+    job: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    The last `limit` scheduled-job runs (optionally one job's), newest first - status,
+    duration, users processed, errors and each job's stats, from whichever process ran
+    them. Same shared-secret auth as the job triggers.
+    """
     _require_cron_secret(authorization)
-    await run_weekly_summary()
-    return {"status": "ok", "job": "weekly_summary"}
+    try:
+        runs = await FirestoreDB.get_job_runs(limit, job=job)
+        return {"runs": runs}
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to fetch job runs: {str(e)}")
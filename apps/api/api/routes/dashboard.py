@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
-from datetime import datetime, date
+from datetime import date
 from ..core.auth import verify_firebase_token
-from ..db.firestore import FirestoreDB
+from ..db.firestore import FirestoreDB, day_bounds
+from ..services.recurring_task_service import RecurringTaskService
 
 router = APIRouter()
 
@@ -12,21 +13,10 @@ async def get_dashboard(user_id: str = Depends(verify_firebase_token)):
         # Get user plants
         plants = await FirestoreDB.get_user_plants(user_id)
         
-        # Get today's tasks
-        today = date.today()
-        all_tasks = await FirestoreDB.get_user_tasks(user_id, completed=False)
-        today_tasks = []
-        
-        for task in all_tasks:
-            due_date = task.get("due_date")
-            if due_date:
-                if isinstance(due_date, str):
-                    task_date = datetime.fromisoformat(due_date.replace('Z', '+00:00')).date()
-                else:
-                    task_date = due_date.date() if hasattr(due_date, 'date') else due_date
-                
-                if task_date <= today:
-                    today_tasks.append(task)
+        # Get today's (and overdue) incomplete tasks - due_date < tomorrow, filtered
+        # server-side so completed history is never read, plus recurring occurrences.
+        _, end_of_today = day_bounds(date.today())
+        today_tasks = await RecurringTaskService.tasks_in_range(user_id, None, end_of_today, completed=False)
         
         # Get user stats
         profile = await FirestoreDB.get_profile(user_id)
@@ -1,10 +1,14 @@
+import asyncio
+from collections import OrderedDict
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Dict
-from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime, timedelta
 from ..db.firestore import FirestoreDB
 from ..core.auth import verify_firebase_token
 from ..services.email_service import EmailService
 from ..services.notification_service import NotificationService
+from ..services.leaderboard_index import leaderboard_index
+from ..services.scheduler_service import PERIOD_WINDOW_DAYS, STREAK_EXPIRY_HOURS
 
 router = APIRouter()
 
@@ -12,29 +16,51 @@ def calculate_level(score: int) -> int:
     """Calculate user level based on score (1000 points per level)"""
     return max(1, score // 1000 + 1)
 
-async def update_user_score(user_id: str, points: int):
-    """Update user's score and gamification stats"""
-    try:
-        profile = await FirestoreDB.get_profile(user_id)
-        if not profile:
-            return
-        
-        # Update score and level
-        new_score = profile.get("total_score", 0) + points
-        new_level = calculate_level(new_score)
-        tasks_completed = profile.get("tasks_completed", 0) + 1
-        
-        # Update streak
+# user_id -> the day (ISO date) this process last credited that user's activity. A hit
+# means today's streak/first-task/streak-7 logic already ran for them, so further
+# completions today skip the profile read entirely (see apply_score_update).
+ACTIVITY_MEMO_SIZE = 10000
+_activity_credited: "OrderedDict[str, str]" = OrderedDict()
+
+def _remember_activity(user_id: str, day: str) -> None:
+    _activity_credited[user_id] = day
+    _activity_credited.move_to_end(user_id)
+    while len(_activity_credited) > ACTIVITY_MEMO_SIZE:
+        _activity_credited.popitem(last=False)
+
+def _achievement_message(achievement: str) -> Tuple[str, str]:
+    if achievement.startswith("level_"):
+        return "Level Up!", f"You've reached Level {achievement[len('level_'):]}!"
+    if achievement == "streak_7":
+        return "Achievement Unlocked!", "Week Warrior - Maintained a 7 day streak!"
+    return "Achievement Unlocked!", "First Steps - Completed your first task!"
+
+async def _announce_achievements(user_id: str, achievements: List[str], award_id: Optional[str] = None):
+    for achievement in achievements:
+        title, message = _achievement_message(achievement)
+        # Keyed by the award, so announcing the same award again stores each one once
+        notification_id = f"outbox-{award_id}-{achievement}" if award_id else None
+        await NotificationService.notify(user_id, "achievement", title, message, notification_id=notification_id)
+        await EmailService.send_for_notification(user_id, "achievement", title, message)
+
+def _streak_updates(points: int, today: date):
+    """
+    build_updates for FirestoreDB.award_points: streak, level and newly earned
+    achievements, from the profile as it was before this completion. Pure - the
+    transaction may call it more than once on contention.
+    """
+    def build(profile: Dict) -> Dict:
+        new_level = calculate_level((profile.get("total_score") or 0) + points)
+        tasks_completed = (profile.get("tasks_completed") or 0) + 1
+
         last_activity = profile.get("last_activity")
         streak_days = profile.get("streak_days", 0)
-        today = datetime.now().date()
-        
         if last_activity:
             if isinstance(last_activity, str):
                 last_date = datetime.fromisoformat(last_activity.replace('Z', '+00:00')).date()
             else:
                 last_date = last_activity.date() if hasattr(last_activity, 'date') else last_activity
-            
+
             days_diff = (today - last_date).days
             if days_diff == 1:
                 streak_days += 1
@@ -42,45 +68,78 @@ async def update_user_score(user_id: str, points: int):
                 streak_days = 1
         else:
             streak_days = 1
-        
-        # Check for achievements
-        achievements = profile.get("achievements", [])
-        
-        # Achievement: First task
-        if tasks_completed == 1 and "first_task" not in achievements:
-            achievements.append("first_task")
-            title, message = "Achievement Unlocked!", "First Steps - Completed your first task!"
-            await NotificationService.notify(user_id, "achievement", title, message)
-            await EmailService.send_for_notification(user_id, "achievement", title, message)
 
-        # Achievement: Level up
+        achievements = profile.get("achievements") or []
+        earned = []
+        if tasks_completed == 1 and "first_task" not in achievements:
+            earned.append("first_task")
         if new_level > profile.get("level", 1):
-            achievements.append(f"level_{new_level}")
-            title, message = "Level Up!", f"You've reached Level {new_level}!"
-            await NotificationService.notify(user_id, "achievement", title, message)
-            await EmailService.send_for_notification(user_id, "achievement", title, message)
-
-        # Achievement: 7 day streak
+            earned.append(f"level_{new_level}")
         if streak_days >= 7 and "streak_7" not in achievements:
-            achievements.append("streak_7")
-            title, message = "Achievement Unlocked!", "Week Warrior - Maintained a 7 day streak!"
-            await NotificationService.notify(user_id, "achievement", title, message)
-            await EmailService.send_for_notification(user_id, "achievement", title, message)
-        
-        # Update profile
-        updates = {
-            "total_score": new_score,
-            "level": new_level,
-            "tasks_completed": tasks_completed,
-            "streak_days": streak_days,
-            "last_activity": datetime.now().isoformat(),
-            "achievements": achievements
-        }
-        
-        await FirestoreDB.update_profile(user_id, updates)
-        
+            earned.append("streak_7")
+
+        updates = {"level": new_level, "streak_days": streak_days}
+        if earned:
+            updates["achievements"] = earned
+        return updates
+    return build
+
+async def apply_score_update(user_id: str, points: int, award_id: Optional[str] = None):
+    """
+    Update user's score and gamification stats.
+
+    Score, tasks_completed and achievements are written with Increment/ArrayUnion
+    transforms, so concurrent completions can't overwrite each other. The profile is
+    only read (inside a transaction) on a user's first completion of the day in this
+    process, when the streak logic needs last_activity; every later completion is a
+    single read-free write, with level-ups detected from the returned total_score.
+
+    Raises only if that score write fails - nothing was applied, so the caller (the
+    outbox, services/outbox_service.py) can safely retry. Anything after it (level
+    grant, index, announcements) is logged instead of raised. award_id (the outbox
+    entry id) is recorded in the same commit as the score write, so re-running an
+    award that already landed - a retry after complete_outbox_entry failed, or a
+    second worker once the claim lapsed - applies nothing and announces nothing.
+    """
+    now = datetime.now()
+    today = now.date()
+    last_activity = now.isoformat()
+    streak_expires_at = (now + timedelta(hours=STREAK_EXPIRY_HOURS)).astimezone()
+    fast_path = _activity_credited.get(user_id) == today.isoformat()
+
+    if fast_path:
+        result = await FirestoreDB.award_points(
+            user_id, points, last_activity, streak_expires_at=streak_expires_at, award_id=award_id
+        )
+    else:
+        result = await FirestoreDB.award_points(
+            user_id, points, last_activity, build_updates=_streak_updates(points, today),
+            streak_expires_at=streak_expires_at, award_id=award_id
+        )
+    if result is None:
+        return
+
+    try:
+        if fast_path:
+            new_level = calculate_level(result["total_score"])
+            earned = []
+            if new_level > calculate_level(result["total_score"] - points):
+                earned.append(f"level_{new_level}")
+                await FirestoreDB.grant_achievements(user_id, earned, level=new_level)
+                result["level"] = new_level
+        else:
+            _remember_activity(user_id, today.isoformat())
+            earned = result.pop("achievements", [])
+
+        indexed = leaderboard_index.get(user_id)
+        if indexed is not None:
+            if earned:
+                result["achievements"] = (indexed.get("achievements") or []) + earned
+            leaderboard_index.upsert({**indexed, **result})
+
+        await _announce_achievements(user_id, earned, award_id)
     except Exception as e:
-        print(f"Error updating user score: {e}")
+        print(f"Error finishing score update: {e}")
 
 def _public_leaderboard_entry(entry: Dict, rank: int, viewer_id: str) -> Dict:
     """
@@ -109,6 +168,20 @@ def _public_leaderboard_entry(entry: Dict, rank: int, viewer_id: str) -> Dict:
 
     return row
 
+async def _indexed_profile(user_id: str) -> Optional[Dict]:
+    """
+    This user's leaderboard entry from the in-process index. Falls back to Firestore
+    (and indexes the result) only for a profile created since the last reseed.
+    """
+    await leaderboard_index.ensure_fresh()
+    profile = leaderboard_index.get(user_id)
+    if profile is None:
+        profile = await FirestoreDB.get_profile(user_id)
+        if profile:
+            leaderboard_index.upsert(profile)
+            profile = leaderboard_index.get(user_id)
+    return profile
+
 @router.get("/leaderboard")
 async def get_leaderboard(
     period: str = "all_time",  # all_time, monthly, weekly
@@ -118,24 +191,39 @@ async def get_leaderboard(
     """
     Get leaderboard showing top 100 users by points/tasks completed.
     Privacy-safe by default: contact info is only included for users who opted in.
-    Note: For simplicity, Firebase version shows all-time leaderboard
-    Period filtering requires additional task tracking
+    all_time is served from the in-process leaderboard index
+    (services/leaderboard_index.py), not a Firestore query per request. weekly/monthly
+    are read from the `leaderboards/{period}` document materialized hourly by
+    scheduler_service.run_period_leaderboard_rollup; on those, total_score is the
+    points earned within the period's trailing window.
     """
     try:
-        raw_leaderboard = await FirestoreDB.get_leaderboard(100)
-
-        leaderboard = [
-            _public_leaderboard_entry(entry, i, user_id)
-            for i, entry in enumerate(raw_leaderboard, 1)
-        ]
+        user_profile = await _indexed_profile(user_id)
 
-        # Get current user's stats
-        user_profile = await FirestoreDB.get_profile(user_id)
-        user_rank = await FirestoreDB.get_user_rank(user_id)
+        if period in PERIOD_WINDOW_DAYS:
+            materialized = await FirestoreDB.get_period_leaderboard(period) or {}
+            period_entries = materialized.get("entries", [])
+            leaderboard = [
+                _public_leaderboard_entry(
+                    {**(leaderboard_index.get(entry["id"]) or {"id": entry["id"]}), "total_score": entry["points"]},
+                    i, user_id
+                )
+                for i, entry in enumerate(period_entries[:min(limit, 100)], 1)
+            ]
+            own = next(((i, e) for i, e in enumerate(period_entries, 1) if e["id"] == user_id), None)
+            user_rank, user_score = (own[0], own[1]["points"]) if own else (0, 0)
+        else:
+            period = "all_time"
+            leaderboard = [
+                _public_leaderboard_entry(entry, i, user_id)
+                for i, entry in enumerate(leaderboard_index.top(min(limit, 100)), 1)
+            ]
+            user_rank = leaderboard_index.rank(user_id) or 0
+            user_score = user_profile.get("total_score", 0) if user_profile else 0
 
         user_stats = {
             "rank": user_rank,
-            "total_score": user_profile.get("total_score", 0) if user_profile else 0,
+            "total_score": user_score,
             "level": user_profile.get("level", 1) if user_profile else 1,
             "tasks_completed": user_profile.get("tasks_completed", 0) if user_profile else 0,
             "streak_days": user_profile.get("streak_days", 0) if user_profile else 0
@@ -153,11 +241,10 @@ async def get_leaderboard(
 async def get_my_leaderboard_entry(user_id: str = Depends(verify_firebase_token)):
     """Current user's own rank + full stats (always includes their own contact info)"""
     try:
-        profile = await FirestoreDB.get_profile(user_id)
+        profile = await _indexed_profile(user_id)
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
 
-        rank = await FirestoreDB.get_user_rank(user_id)
         return {
             "id": user_id,
             "display_name": profile.get("display_name"),
@@ -168,18 +255,42 @@ async def get_my_leaderboard_entry(user_id: str = Depends(verify_firebase_token)
             "level": profile.get("level", 1),
             "streak_days": profile.get("streak_days", 0),
             "achievements": profile.get("achievements", []),
-            "rank": rank
+            "rank": leaderboard_index.rank(user_id)
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get leaderboard entry: {str(e)}")
 
+@router.get("/leaderboard/around-me")
+async def get_leaderboard_around_me(
+    radius: int = 5,
+    user_id: str = Depends(verify_firebase_token)
+):
+    """The users ranked just above and below the current user (privacy-safe rows)"""
+    try:
+        profile = await _indexed_profile(user_id)
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
+
+        radius = max(0, min(radius, 50))
+        return {
+            "leaderboard": [
+                _public_leaderboard_entry(entry, position, user_id)
+                for position, entry in leaderboard_index.around(user_id, radius)
+            ],
+            "rank": leaderboard_index.rank(user_id)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get leaderboard: {str(e)}")
+
 @router.get("/stats")
 async def get_user_stats(user_id: str = Depends(verify_firebase_token)):
     """Get detailed stats for current user"""
     try:
-        profile = await FirestoreDB.get_profile(user_id)
+        profile = await _indexed_profile(user_id)
         if not profile:
             return {
                 "total_score": 0,
@@ -190,12 +301,12 @@ async def get_user_stats(user_id: str = Depends(verify_firebase_token)):
                 "rank": 0
             }
         
-        rank = await FirestoreDB.get_user_rank(user_id)
-        
-        # Get completion rate
-        all_tasks = await FirestoreDB.get_user_tasks(user_id)
-        completed_tasks = [t for t in all_tasks if t.get("completed")]
-        completion_rate = (len(completed_tasks) / len(all_tasks) * 100) if all_tasks else 0
+        # Get completion rate - two count aggregations rather than a full task scan
+        total_tasks, completed_tasks = await asyncio.gather(
+            FirestoreDB.count_user_tasks(user_id),
+            FirestoreDB.count_user_tasks(user_id, completed=True),
+        )
+        completion_rate = (completed_tasks / total_tasks * 100) if total_tasks else 0
         
         return {
             "total_score": profile.get("total_score", 0),
@@ -203,7 +314,7 @@ async def get_user_stats(user_id: str = Depends(verify_firebase_token)):
             "tasks_completed": profile.get("tasks_completed", 0),
             "streak_days": profile.get("streak_days", 0),
             "achievements": profile.get("achievements", []),
-            "rank": rank,
+            "rank": leaderboard_index.rank(user_id),
             "completion_rate": round(completion_rate, 1)
         }
     except Exception as e:
@@ -1,35 +1,202 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends, HTTPException
-from firebase_admin import auth as firebase_auth
-from typing import Dict
-from ..core.auth import verify_firebase_token, ensure_firebase_initialized
-from ..db.firestore import FirestoreDB
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from typing import AsyncIterator, Dict, List, Optional, Set, Union
+from ..core.config import settings
+from ..core.auth import verify_firebase_token, verify_id_token_cached, ensure_firebase_initialized
+from ..db.firestore import FirestoreDB, to_timestamp
+from ..services.notification_bus import get_notification_bus
+from ..services.notification_service import NotificationService, unread_count_message
 
 router = APIRouter()
 
+class _Connection:
+    """
+    One live client: a bounded outbound queue, drained by its own writer task for a
+    WebSocket, or by the response generator for an SSE stream (websocket=None).
+    """
+
+    def __init__(self, websocket: Optional[WebSocket], max_queue: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+
+    async def drain(self):
+        while True:
+            message = await self.queue.get()
+            if isinstance(message, str):
+                await self.websocket.send_text(message)
+            else:
+                await self.websocket.send_json(message)
+
+class _ReplayBuffer:
+    """
+    The last few notifications pushed to one user, oldest first. Complete for
+    everything created after covered_from - once the deque starts overflowing, that
+    moves up to the newest notification it has dropped.
+    """
+
+    def __init__(self, size: int, covered_from: datetime):
+        self.messages: deque = deque(maxlen=size)
+        self.covered_from = covered_from
+
+    def append(self, created_at: datetime, message: dict):
+        if len(self.messages) == self.messages.maxlen:
+            self.covered_from = self.messages[0][0]
+        self.messages.append((created_at, message))
+
+    def after(self, since: datetime) -> Optional[List[dict]]:
+        if since < self.covered_from:
+            return None
+        return [message for created_at, message in self.messages if created_at > since]
+
+    def created_at_of(self, notification_id: str) -> Optional[datetime]:
+        for created_at, message in self.messages:
+            if message.get("id") == notification_id:
+                return created_at
+        return None
+
 # WebSocket connection manager
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+    """
+    Every open socket per user - one per tab/device - each with its own bounded send
+    queue (WS_SEND_QUEUE_SIZE) and writer task. send_personal_message only enqueues,
+    so the request that triggered a notification never waits on a client's network;
+    a consumer too slow to drain its queue is disconnected instead of buffering
+    without bound (it catches up via replay when it reconnects).
+
+    Every message is also remembered in a small per-user _ReplayBuffer - whether or not
+    the user is connected - so a reconnecting client's `since` cursor can usually be
+    answered from memory. Buffers are kept for the REPLAY_BUFFER_MAX_USERS most
+    recently notified users.
+    """
+
+    REPLAY_BUFFER_MAX_USERS = 10000
+
+    def __init__(self, max_queue: int = settings.WS_SEND_QUEUE_SIZE,
+                 replay_size: int = settings.NOTIFICATION_REPLAY_BUFFER_SIZE):
+        self.max_queue = max_queue
+        self.replay_size = replay_size
+        self.active_connections: Dict[str, Set[_Connection]] = {}
+        self.replay_buffers: "OrderedDict[str, _ReplayBuffer]" = OrderedDict()
+        # A user without a buffer has had no notifications through this process since
+        # this point (process start, or the newest message in an evicted buffer).
+        self._buffers_complete_from = datetime.now(timezone.utc)
 
-    async def connect(self, user_id: str, websocket: WebSocket):
+    async def connect(self, user_id: str, websocket: WebSocket) -> _Connection:
         await websocket.accept()
-        self.active_connections[user_id] = websocket
+        connection = _Connection(websocket, self.max_queue)
+        connection.writer = asyncio.create_task(self._run_writer(user_id, connection))
+        self.active_connections.setdefault(user_id, set()).add(connection)
+        return connection
+
+    def subscribe(self, user_id: str) -> _Connection:
+        """Register a connection whose queue the caller drains itself (the SSE stream)."""
+        connection = _Connection(None, self.max_queue)
+        self.active_connections.setdefault(user_id, set()).add(connection)
+        return connection
+
+    async def _run_writer(self, user_id: str, connection: _Connection):
+        try:
+            await connection.drain()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(user_id, connection)
+
+    def disconnect(self, user_id: str, connection: _Connection):
+        connection.closed = True
+        connections = self.active_connections.get(user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.active_connections[user_id]
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+
+    def send_to(self, user_id: str, connection: _Connection, message: Union[dict, str]):
+        try:
+            connection.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            print(f"Dropping slow notification consumer for {user_id}")
+            self.disconnect(user_id, connection)
+            if connection.websocket is not None:
+                asyncio.create_task(self._close(connection.websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # Try Again Later
+        except Exception:
+            pass
 
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    def _remember(self, user_id: str, message: dict):
+        try:
+            created_at = to_timestamp(message.get("created_at"))
+        except (TypeError, ValueError):
+            return
+        if created_at is None:
+            return  # not a notification (e.g. an unread_count update)
+        buffer = self.replay_buffers.get(user_id)
+        if buffer is None:
+            buffer = self.replay_buffers[user_id] = _ReplayBuffer(self.replay_size, self._buffers_complete_from)
+        self.replay_buffers.move_to_end(user_id)
+        buffer.append(created_at, message)
+        while len(self.replay_buffers) > self.REPLAY_BUFFER_MAX_USERS:
+            _, evicted = self.replay_buffers.popitem(last=False)
+            if evicted.messages:
+                self._buffers_complete_from = max(self._buffers_complete_from, evicted.messages[-1][0])
+
+    def replay(self, user_id: str, since: datetime) -> Optional[List[dict]]:
+        """Notifications created after `since` from memory, or None if memory doesn't reach back that far."""
+        buffer = self.replay_buffers.get(user_id)
+        if buffer is None:
+            return [] if since >= self._buffers_complete_from else None
+        return buffer.after(since)
+
+    def created_at_of(self, user_id: str, notification_id: str) -> Optional[datetime]:
+        buffer = self.replay_buffers.get(user_id)
+        return buffer.created_at_of(notification_id) if buffer else None
 
     async def send_personal_message(self, user_id: str, message: dict):
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_json(message)
-            except:
-                self.disconnect(user_id)
+        message = jsonable_encoder(message)
+        self._remember(user_id, message)
+        for connection in list(self.active_connections.get(user_id, ())):
+            self.send_to(user_id, connection, message)
 
 manager = ConnectionManager()
 
+# Most notifications replayed on one reconnect - the same page size GET / returns
+REPLAY_LIMIT = 50
+
+async def _missed_notifications(user_id: str, since: str) -> List[dict]:
+    """
+    Notifications created after the client's `since` cursor - an ISO timestamp, or the
+    id of the last notification it saw. Served from the manager's replay buffer when
+    that reaches back far enough, otherwise with one Firestore range query.
+    """
+    try:
+        since_at = to_timestamp(since)
+    except ValueError:
+        since_at = manager.created_at_of(user_id, since)
+        if since_at is None:
+            notification = await FirestoreDB.get_notification(since, user_id)
+            if not notification or not notification.get("created_at"):
+                return []
+            since_at = to_timestamp(notification["created_at"])
+
+    missed = manager.replay(user_id, since_at)
+    if missed is None:
+        missed = jsonable_encoder(await FirestoreDB.get_notifications_since(user_id, since_at, REPLAY_LIMIT))
+    return missed[-REPLAY_LIMIT:]
+
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
+async def websocket_endpoint(websocket: WebSocket, token: str = Query(...), since: Optional[str] = Query(None)):
     """
     Real-time notification stream. Browsers can't set an Authorization header on a
     native WebSocket connection, so verify_firebase_token (HTTPBearer-based) can't be
@@ -39,24 +206,101 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
     query param instead and verified directly, and the resulting uid - not a
     client-supplied path parameter - is what determines which user's notifications
     this connection receives.
+
+    On reconnect, pass `since` (the last notification id or created_at the client saw)
+    to have everything missed in between streamed first. A notification arriving while
+    the replay is being looked up may be sent twice - clients dedupe by id.
+
+    Besides notifications, the socket carries {"event": "unread_count", "count": n}
+    whenever the badge count changes, and once right after connecting.
     """
     ensure_firebase_initialized()
     try:
-        decoded = firebase_auth.verify_id_token(token)
+        decoded = await verify_id_token_cached(token)
         user_id = decoded["uid"]
     except Exception:
         await websocket.close(code=4401)
         return
 
-    await manager.connect(user_id, websocket)
+    await get_notification_bus().start()
+    connection = await manager.connect(user_id, websocket)
     try:
+        if since:
+            try:
+                for notification in await _missed_notifications(user_id, since):
+                    manager.send_to(user_id, connection, notification)
+            except Exception as e:
+                print(f"Notification replay error: {e}")
+        manager.send_to(user_id, connection, unread_count_message(await FirestoreDB.get_unread_count(user_id)))
         while True:
-            # Keep connection alive
+            # Keep connection alive - pong goes through the queue so only the writer
+            # task ever sends on this socket
             data = await websocket.receive_text()
             if data == "ping":
-                await websocket.send_text("pong")
+                manager.send_to(user_id, connection, "pong")
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        pass
+    finally:
+        manager.disconnect(user_id, connection)
+
+# An SSE comment line is sent after this many idle seconds, so proxies that close
+# quiet connections see traffic; clients reconnect after SSE_RETRY_MS if dropped.
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 5000
+
+def _sse_event(message: dict) -> str:
+    if "event" in message:
+        # Not a notification (e.g. unread_count) - no id, so it doesn't move the resume cursor
+        return f"event: {message['event']}\ndata: {json.dumps(message)}\n\n"
+    return f"id: {message.get('id', '')}\nevent: notification\ndata: {json.dumps(message)}\n\n"
+
+@router.get("/stream")
+async def notification_stream(request: Request, token: str = Query(...), since: Optional[str] = Query(None)):
+    """
+    Server-Sent Events alternative to /ws, for clients behind proxies that kill idle
+    WebSockets. Fed by the same ConnectionManager fan-out; a `: keepalive` comment
+    goes out every SSE_HEARTBEAT_SECONDS of silence. Each event's id is the
+    notification id, so EventSource's automatic Last-Event-ID header on reconnect
+    (or an explicit `since`, as for /ws) replays what was missed. The token is a query
+    param for the same reason as /ws - EventSource can't set an Authorization header.
+    Badge-count changes arrive as `unread_count` events, as on /ws.
+    """
+    try:
+        user_id = (await verify_id_token_cached(token))["uid"]
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+
+    await get_notification_bus().start()
+    cursor = request.headers.get("last-event-id") or since
+    connection = manager.subscribe(user_id)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            if cursor:
+                try:
+                    for notification in await _missed_notifications(user_id, cursor):
+                        yield _sse_event(notification)
+                except Exception as e:
+                    print(f"Notification replay error: {e}")
+            yield _sse_event(unread_count_message(await FirestoreDB.get_unread_count(user_id)))
+            while not connection.closed:
+                try:
+                    message = await asyncio.wait_for(connection.queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if isinstance(message, dict):
+                    yield _sse_event(message)
+        finally:
+            manager.disconnect(user_id, connection)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # nginx: don't buffer the stream
+    })
 
 @router.get("/")
 async def get_notifications(
@@ -73,10 +317,9 @@ async def get_notifications(
 
 @router.get("/unread-count")
 async def get_unread_count(user_id: str = Depends(verify_firebase_token)):
-    """Get count of unread notifications"""
+    """Get count of unread notifications (the profile's maintained counter)"""
     try:
-        notifications = await FirestoreDB.get_user_notifications(user_id, unread_only=True, limit=100)
-        return {"count": len(notifications)}
+        return {"count": await FirestoreDB.get_unread_count(user_id)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get unread count: {str(e)}")
 
@@ -87,7 +330,9 @@ async def mark_notification_read(
 ):
     """Mark a notification as read"""
     try:
-        await FirestoreDB.update_notification(notification_id, {"read": True})
+        unread_count = await FirestoreDB.mark_notification_read(notification_id, user_id)
+        if unread_count is not None:
+            await NotificationService.push_unread_count(user_id, unread_count)
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to mark notification as read: {str(e)}")
@@ -97,6 +342,8 @@ async def mark_all_notifications_read(user_id: str = Depends(verify_firebase_tok
     """Mark all notifications as read"""
     try:
         await FirestoreDB.mark_all_notifications_read(user_id)
+        # Not necessarily 0: notifications may have arrived since the unread ones were listed
+        await NotificationService.push_unread_count(user_id, await FirestoreDB.get_unread_count(user_id))
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to mark all as read: {str(e)}")
@@ -108,7 +355,9 @@ async def delete_notification(
 ):
     """Delete a notification"""
     try:
-        await FirestoreDB.delete_notification(notification_id)
+        unread_count = await FirestoreDB.delete_notification(notification_id, user_id)
+        if unread_count is not None:
+            await NotificationService.push_unread_count(user_id, unread_count)
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete notification: {str(e)}")
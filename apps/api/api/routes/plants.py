@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 from datetime import datetime
@@ -12,8 +12,8 @@ from ..services.tavily_service import TavilyService
 from ..services.plant_lookup_service import curate_plant_info
 from ..core.auth import verify_firebase_token
 from ..db.firestore import FirestoreDB
-from ..services.notification_service import NotificationService
-from ..routes.leaderboard import update_user_score
+from ..services.outbox_service import OutboxService
+from ..services.recurring_task_service import RecurringTaskService
 
 router = APIRouter()
 
@@ -194,7 +194,7 @@ async def get_plant_tasks(
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
     
-    tasks = await FirestoreDB.get_plant_tasks(plant_id)
+    tasks = await RecurringTaskService.plant_tasks(plant_id)
     return tasks
 
 @router.post("/{plant_id}/health-check")
@@ -220,20 +220,21 @@ async def get_plant_schedule(
     plant_id: str,
     user_id: str = Depends(verify_firebase_token)
 ):
-    """Get this plant's care schedule (its care_tasks)"""
+    """Get this plant's care schedule (its care_tasks and upcoming recurring occurrences)"""
     plant = await FirestoreDB.get_plant(plant_id, user_id)
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
 
-    return await FirestoreDB.get_plant_tasks(plant_id)
+    return await RecurringTaskService.plant_tasks(plant_id)
 
 @router.post("/{plant_id}/schedule/complete")
 async def complete_schedule_item(
     plant_id: str,
     payload: dict,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(verify_firebase_token)
 ):
-    """Complete a care-schedule item (a care_task) for this plant"""
+    """Complete a care-schedule item (a care_task or recurring occurrence) for this plant - side effects go through the outbox, as in /tasks/{id}/complete"""
     plant = await FirestoreDB.get_plant(plant_id, user_id)
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
@@ -242,28 +243,23 @@ async def complete_schedule_item(
     if not schedule_id:
         raise HTTPException(status_code=400, detail="schedule_id is required")
 
-    task = await FirestoreDB.get_task(schedule_id)
+    task = await RecurringTaskService.get_task(schedule_id)
     if not task or task.get("user_id") != user_id or task.get("plant_id") != plant_id:
         raise HTTPException(status_code=404, detail="Schedule item not found")
 
     updates = {
         "completed": True,
-        "completed_at": datetime.now().isoformat()
+        "completed_at": datetime.now()
     }
     notes = payload.get("notes")
     if notes is not None:
         updates["notes"] = notes
-    await FirestoreDB.update_task(schedule_id, updates)
-
-    points = task.get("points", 10)
-    await update_user_score(user_id, points)
-
-    await NotificationService.notify(
-        user_id, "task_completed", "Task Completed!",
-        f"You earned {points} points for completing: {task.get('title')}"
+    entry_ids = await RecurringTaskService.update_task(
+        task, updates, OutboxService.task_completion_effects(user_id, task)
     )
+    background_tasks.add_task(OutboxService.process, entry_ids)
 
-    return {"success": True, "points_earned": points}
+    return {"success": True, "points_earned": task.get("points", 10)}
 
 @router.get("/{plant_id}/health-checks")
 async def get_plant_health_checks(
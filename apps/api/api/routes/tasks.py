@@ -1,13 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from typing import List
 from datetime import datetime, date, timedelta
 from ..models.task import CareTask
 from ..core.auth import verify_firebase_token
-from ..db.firestore import FirestoreDB
+from ..db.firestore import FirestoreDB, to_timestamp, day_bounds
 from ..services.plant_service import PlantService
-from ..services.notification_service import NotificationService
-from ..services.groq_service import GroqService
-from ..routes.leaderboard import update_user_score
+from ..services.outbox_service import OutboxService
+from ..services.recurring_task_service import RecurringTaskService
 
 router = APIRouter()
 
@@ -17,26 +16,20 @@ async def get_today_tasks(user_id: str = Depends(verify_firebase_token)):
     try:
         today = date.today()
 
-        # All of the user's tasks, complete and incomplete - needed for the completion
-        # percentage below, not just the pending list the checklist renders.
-        all_tasks = await FirestoreDB.get_user_tasks(user_id)
+        # Today's tasks, complete and incomplete - needed for the completion percentage
+        # below, not just the pending list the checklist renders. Range-filtered on
+        # due_date server-side rather than streaming the user's whole task history, with
+        # today's recurring occurrences expanded from the user's care rules.
+        start, end = day_bounds(today)
+        due_today = await RecurringTaskService.tasks_in_range(user_id, start, end)
 
         today_tasks = []
         completed_today = 0
-        for task in all_tasks:
-            due_date = task.get("due_date")
-            if due_date:
-                # Handle both datetime objects and ISO strings
-                if isinstance(due_date, str):
-                    task_date = datetime.fromisoformat(due_date.replace('Z', '+00:00')).date()
-                else:
-                    task_date = due_date.date() if hasattr(due_date, 'date') else due_date
-
-                if task_date == today:
-                    if task.get("completed"):
-                        completed_today += 1
-                    else:
-                        today_tasks.append(task)
+        for task in due_today:
+            if task.get("completed"):
+                completed_today += 1
+            else:
+                today_tasks.append(task)
 
         # Sort by priority
         priority_order = {"high": 0, "medium": 1, "low": 2}
@@ -58,13 +51,19 @@ async def get_today_tasks(user_id: str = Depends(verify_firebase_token)):
 @router.post("/{task_id}/complete")
 async def complete_task(
     task_id: str,
+    background_tasks: BackgroundTasks,
     notes: str = None,
     user_id: str = Depends(verify_firebase_token)
 ):
-    """Mark task as completed and award points"""
+    """
+    Mark task as completed and award points. The completion and its side effects
+    (points/streak/achievements, the notification, PlantMind's profile refresh) are
+    one write - outbox entries run right after the response is sent, and retried by
+    the outbox drain if they fail (see services/outbox_service.py).
+    """
     try:
-        # Get task
-        task = await FirestoreDB.get_task(task_id)
+        # Get task (a recurring occurrence is stored by completing it)
+        task = await RecurringTaskService.get_task(task_id)
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
         
@@ -75,24 +74,15 @@ async def complete_task(
         # Update task
         updates = {
             "completed": True,
-            "completed_at": datetime.now().isoformat(),
+            "completed_at": datetime.now(),
             "notes": notes
         }
-        await FirestoreDB.update_task(task_id, updates)
-        
-        # Award points
-        points = task.get("points", 10)
-        await update_user_score(user_id, points)
-
-        # Create notification
-        await NotificationService.notify(
-            user_id, "task_completed", "Task Completed!",
-            f"You earned {points} points for completing: {task.get('title')}"
+        entry_ids = await RecurringTaskService.update_task(
+            task, updates, OutboxService.task_completion_effects(user_id, task)
         )
+        background_tasks.add_task(OutboxService.process, entry_ids)
 
-        # Keep PlantMind's persistent memory of this user's care habits current.
-        await GroqService.update_agent_profile_summary(user_id)
-
+        points = task.get("points", 10)
         return {
             "success": True,
             "task": task,
@@ -109,19 +99,15 @@ async def snooze_task(
 ):
     """Push a task's due date forward without completing it"""
     try:
-        task = await FirestoreDB.get_task(task_id)
+        task = await RecurringTaskService.get_task(task_id)
         if not task or task.get("user_id") != user_id:
             raise HTTPException(status_code=404, detail="Task not found")
 
-        due_date = task.get("due_date")
-        if due_date:
-            base = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-        else:
-            base = datetime.now()
-        new_due_date = (base + timedelta(hours=hours)).isoformat()
+        base = to_timestamp(task.get("due_date")) or to_timestamp(datetime.now())
+        new_due_date = base + timedelta(hours=hours)
 
-        await FirestoreDB.update_task(task_id, {"due_date": new_due_date})
-        return {"success": True, "due_date": new_due_date}
+        await RecurringTaskService.update_task(task, {"due_date": new_due_date})
+        return {"success": True, "due_date": new_due_date.isoformat()}
     except HTTPException:
         raise
     except Exception as e:
@@ -135,12 +121,17 @@ async def reschedule_task(
 ):
     """Set a task's due date explicitly"""
     try:
-        task = await FirestoreDB.get_task(task_id)
+        new_due_date = to_timestamp(due_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="due_date must be an ISO-8601 date/datetime")
+
+    try:
+        task = await RecurringTaskService.get_task(task_id)
         if not task or task.get("user_id") != user_id:
             raise HTTPException(status_code=404, detail="Task not found")
 
-        await FirestoreDB.update_task(task_id, {"due_date": due_date})
-        return {"success": True, "due_date": due_date}
+        await RecurringTaskService.update_task(task, {"due_date": new_due_date})
+        return {"success": True, "due_date": new_due_date.isoformat() if new_due_date else None}
     except HTTPException:
         raise
     except Exception as e:
@@ -157,8 +148,10 @@ async def generate_tasks_for_plant(
         if not plant:
             raise HTTPException(status_code=404, detail="Plant not found")
 
+        # A type is covered by its care rule, or by a pending task stored before rules
         existing_tasks = await FirestoreDB.get_plant_tasks(plant_id)
         existing_types = {t.get("task_type") for t in existing_tasks if not t.get("completed")}
+        existing_types.update(r.get("task_type") for r in await FirestoreDB.get_plant_care_rules(plant_id))
         missing_types = [t for t in ("watering", "fertilizing") if t not in existing_types]
 
         created = await PlantService.create_projected_schedule(user_id, plant, types=missing_types) if missing_types else []
@@ -173,9 +166,9 @@ async def get_user_tasks(
     completed: bool = None,
     user_id: str = Depends(verify_firebase_token)
 ):
-    """Get all tasks for user"""
+    """Get all tasks for user, with recurring occurrences up to RECURRING_TASKS_HORIZON_DAYS ahead"""
     try:
-        tasks = await FirestoreDB.get_user_tasks(user_id, completed=completed)
+        tasks = await RecurringTaskService.user_tasks(user_id, completed=completed)
         return tasks
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -205,11 +198,11 @@ async def update_task(
     """Update a task"""
     try:
         # Verify ownership
-        task = await FirestoreDB.get_task(task_id)
+        task = await RecurringTaskService.get_task(task_id)
         if not task or task.get("user_id") != user_id:
             raise HTTPException(status_code=404, detail="Task not found")
         
-        await FirestoreDB.update_task(task_id, task_updates)
+        await RecurringTaskService.update_task(task, task_updates)
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -219,14 +212,14 @@ async def delete_task(
     task_id: str,
     user_id: str = Depends(verify_firebase_token)
 ):
-    """Delete a task"""
+    """Delete a task - for a recurring occurrence, skip just that one"""
     try:
         # Verify ownership
-        task = await FirestoreDB.get_task(task_id)
+        task = await RecurringTaskService.get_task(task_id)
         if not task or task.get("user_id") != user_id:
             raise HTTPException(status_code=404, detail="Task not found")
         
-        await FirestoreDB.delete_task(task_id)
+        await RecurringTaskService.delete_task(task)
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -15,6 +15,7 @@ from .weather_service import WeatherService
 from .tavily_service import TavilyService
 from .plant_service import PlantService
 from .perenual_service import PerenualService
+from .recurring_task_service import RecurringTaskService
 
 PLANT_MIND_SYSTEM_PROMPT = """You are PlantMind, Flourish's autonomous garden agent. You are proactive,
 knowledgeable, and caring about plant health.
@@ -54,7 +55,7 @@ def _build_tools(user_id: str):
     @tool
     async def get_task_history() -> str:
         """Get the current user's recent care tasks, completed and pending."""
-        tasks = await FirestoreDB.get_user_tasks(user_id)
+        tasks = await RecurringTaskService.user_tasks(user_id)
         return json.dumps(tasks[:20], default=str)
 
     @tool
@@ -480,42 +481,48 @@ class GroqService:
         see docs/06-Phase-Tracker.md Phase 2 known gap.
         """
         try:
-            profile = await FirestoreDB.get_profile(user_id)
-            if not profile:
-                return
+            await GroqService.refresh_agent_profile_summary(user_id)
+        except Exception as e:
+            print(f"agent_profile update error: {e}")
 
-            plants = await FirestoreDB.get_user_plants(user_id)
-            tasks = await FirestoreDB.get_user_tasks(user_id)
+    @staticmethod
+    async def refresh_agent_profile_summary(user_id: str) -> None:
+        """update_agent_profile_summary, raising on failure (for the outbox's retries)."""
+        profile = await FirestoreDB.get_profile(user_id)
+        if not profile:
+            return
 
-            low_light = sum(1 for p in plants if "low" in (p.get("sunlight_requirement") or "").lower())
-            pet_safe = sum(1 for p in plants if (p.get("toxicity") or "").lower() == "non-toxic")
-            outdoor = sum(1 for p in plants if (p.get("plant_type") or "").lower() == "outdoor")
+        plants = await FirestoreDB.get_user_plants(user_id)
+        tasks = await FirestoreDB.get_user_tasks(user_id)
 
-            completed = [t for t in tasks if t.get("completed")]
-            watering_done = [t for t in completed if t.get("task_type") == "watering"]
-            fertilizing_done = [t for t in completed if t.get("task_type") == "fertilizing"]
+        low_light = sum(1 for p in plants if "low" in (p.get("sunlight_requirement") or "").lower())
+        pet_safe = sum(1 for p in plants if (p.get("toxicity") or "").lower() == "non-toxic")
+        outdoor = sum(1 for p in plants if (p.get("plant_type") or "").lower() == "outdoor")
 
-            summary = (
-                f"{len(plants)} plants in the garden ({low_light} low-light, {pet_safe} pet-safe, "
-                f"{outdoor} outdoor). {len(completed)} of {len(tasks)} tasks completed."
-            )
+        completed = [t for t in tasks if t.get("completed")]
+        watering_done = [t for t in completed if t.get("task_type") == "watering"]
+        fertilizing_done = [t for t in completed if t.get("task_type") == "fertilizing"]
 
-            agent_profile = profile.get("agent_profile") or {}
-            agent_profile.update({
-                "summary": summary,
-                "garden_composition": {
-                    "low_light_plants": low_light,
-                    "pet_safe_plants": pet_safe,
-                    "outdoor_plants": outdoor
-                },
-                "care_habits": {
-                    "watering_consistency": "high" if len(watering_done) >= 3 else "developing",
-                    "fertilizing_consistency": "high" if len(fertilizing_done) >= 1 else "developing",
-                    "health_check_frequency": "medium"
-                },
-                "updated_at": datetime.now().isoformat()
-            })
+        summary = (
+            f"{len(plants)} plants in the garden ({low_light} low-light, {pet_safe} pet-safe, "
+            f"{outdoor} outdoor). {len(completed)} of {len(tasks)} tasks completed."
+        )
+
+        agent_profile = profile.get("agent_profile") or {}
+        agent_profile.update({
+            "summary": summary,
+            "garden_composition": {
+                "low_light_plants": low_light,
+                "pet_safe_plants": pet_safe,
+                "outdoor_plants": outdoor
+            },
+            "care_habits": {
+                "watering_consistency": "high" if len(watering_done) >= 3 else "developing",
+                "fertilizing_consistency": "high" if len(fertilizing_done) >= 1 else "developing",
+                "health_check_frequency": "medium"
+            },
+            "updated_at": datetime.now().isoformat()
+        })
+
+        await FirestoreDB.update_profile(user_id, {"agent_profile": agent_profile})
 
-            await FirestoreDB.update_profile(user_id, {"agent_profile": agent_profile})
-        except Exception as e:
-            print(f"agent_profile update error: {e}")
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..db.firestore import FirestoreDB
+
+# The only profile fields the leaderboard routes read - everything the index keeps per
+# user. Contact fields are held so /leaderboard/me can answer from memory, but only
+# ever leave the process through _public_leaderboard_entry's privacy filter.
+INDEXED_FIELDS = [
+    "display_name", "photo_url", "email", "phone_number", "total_score", "level",
+    "tasks_completed", "streak_days", "achievements", "privacy",
+]
+# After a failed (re)seed, reads wait this long before the next attempt rather than
+# each re-scanning every profile.
+RESEED_RETRY_SECONDS = 30
+
+
+class LeaderboardIndex:
+    """
+    In-process order-statistic index over every profile's total_score, so the
+    leaderboard endpoints answer "top N", "rank of user X" and "users around me"
+    without touching Firestore on each request.
+
+    A sorted array of (-score, user_id) keys: rank is a bisect (O(log n)), top N and
+    around-me are slices. A score change is a bisect + list insert/remove - a memmove,
+    which stays well under a millisecond at the user counts this app sees.
+
+    Seeded from `profiles` on first use, and kept current in-process by
+    apply_score_update (routes/leaderboard.py) and the profile-edit routes calling
+    upsert(). Changes made by *other* processes only arrive on the next reseed, so
+    staleness is bounded by LEADERBOARD_INDEX_MAX_STALENESS_SECONDS: once exceeded, the
+    next read kicks off a background reseed and is served from the current snapshot
+    meanwhile - only the very first read ever waits on Firestore. A failed seed is
+    retried after RESEED_RETRY_SECONDS, not on every read.
+    """
+
+    def __init__(self, max_staleness_seconds: float):
+        self.max_staleness_seconds = max_staleness_seconds
+        self._keys: List[Tuple[int, str]] = []
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._seeded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._seed_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Upserts that land while a reseed's Firestore stream is in flight, replayed on
+        # top of the fresh snapshot so they aren't lost to it.
+        self._upserts_during_reseed: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @staticmethod
+    def _key(entry: Dict[str, Any]) -> Tuple[int, str]:
+        return (-int(entry.get("total_score") or 0), entry["id"])
+
+    def is_stale(self) -> bool:
+        return self._seeded_at is None or time.monotonic() - self._seeded_at > self.max_staleness_seconds
+
+    def _backing_off(self) -> bool:
+        return self._failed_at is not None and time.monotonic() - self._failed_at < RESEED_RETRY_SECONDS
+
+    async def ensure_fresh(self) -> None:
+        """Seed on first use; afterwards, refresh in the background once stale."""
+        if self._backing_off():
+            return
+        if self._seeded_at is None:
+            async with self._seed_lock:
+                if self._seeded_at is None and not self._backing_off():
+                    await self.reseed()
+        elif self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self.reseed())
+
+    async def reseed(self) -> None:
+        self._upserts_during_reseed = {}
+        try:
+            profiles = await FirestoreDB.get_all_profiles(fields=INDEXED_FIELDS)
+            self.load(profiles)
+            for entry in self._upserts_during_reseed.values():
+                self.upsert(entry)
+            self._failed_at = None
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            state = "serving the previous snapshot" if self._seeded_at is not None else "leaderboard empty"
+            print(f"Leaderboard index reseed error ({state}, retrying in {RESEED_RETRY_SECONDS}s): {e}")
+        finally:
+            self._upserts_during_reseed = None
+
+    def load(self, profiles: List[Dict[str, Any]]) -> None:
+        """Replace the whole index with this snapshot of profiles."""
+        entries = {p["id"]: self._indexed(p) for p in profiles if p.get("id")}
+        self._entries = entries
+        self._keys = sorted(self._key(entry) for entry in entries.values())
+        self._seeded_at = time.monotonic()
+
+    @staticmethod
+    def _indexed(profile: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {field: profile.get(field) for field in INDEXED_FIELDS}
+        entry["id"] = profile["id"]
+        return entry
+
+    def upsert(self, profile: Dict[str, Any]) -> None:
+        """Insert or re-position one user after their score/profile changed."""
+        entry = self._indexed(profile)
+        if self._upserts_during_reseed is not None:
+            self._upserts_during_reseed[entry["id"]] = entry
+
+        previous = self._entries.get(entry["id"])
+        if previous is not None:
+            old_key = self._key(previous)
+            i = bisect_left(self._keys, old_key)
+            if i < len(self._keys) and self._keys[i] == old_key:
+                del self._keys[i]
+        self._entries[entry["id"]] = entry
+        insort(self._keys, self._key(entry))
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(user_id)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1 + the number of users with a strictly higher score (ties share a rank)."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return bisect_left(self._keys, (-int(entry.get("total_score") or 0), "")) + 1
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        return [self._entries[user_id] for _, user_id in self._keys[:max(0, n)]]
+
+    def around(self, user_id: str, radius: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """(position, entry) for up to `radius` users either side of this user."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return []
+        i = bisect_left(self._keys, self._key(entry))
+        start = max(0, i - radius)
+        return [
+            (position, self._entries[uid])
+            for position, (_, uid) in enumerate(self._keys[start:i + radius + 1], start + 1)
+        ]
+
+
+leaderboard_index = LeaderboardIndex(settings.LEADERBOARD_INDEX_MAX_STALENESS_SECONDS)
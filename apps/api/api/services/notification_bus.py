@@ -0,0 +1,120 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ..core.config import settings
+
+# Hands one message to whatever sockets this process holds for the user - in practice
+# routes/notifications.manager.send_personal_message.
+Deliver = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class NotificationBus(ABC):
+    """
+    Pub/sub between NotificationService.notify and the processes holding users'
+    notification sockets. publish() may run in any worker; every subscribed worker's
+    deliver callback receives the message and pushes it to the sockets it holds (if
+    any). Messages must already be JSON-safe (see NotificationService.notify).
+    """
+
+    async def start(self) -> None:
+        """Begin receiving published messages. Idempotent."""
+
+    @abstractmethod
+    async def publish(self, user_id: str, message: Dict[str, Any]) -> None:
+        """Hand a message for this user to every subscribed worker."""
+
+    async def stop(self) -> None:
+        """Stop receiving and release any connections."""
+
+
+class InProcessNotificationBus(NotificationBus):
+    """Single-process deployments: publishing is just delivering locally."""
+
+    def __init__(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def publish(self, user_id: str, message: Dict[str, Any]) -> None:
+        await self._deliver(user_id, message)
+
+
+class RedisNotificationBus(NotificationBus):
+    """
+    Multi-worker / multi-instance deployments: every notification is published on one
+    Redis channel, and each worker's listener delivers it to whichever sockets that
+    worker holds for the user - so it no longer matters which worker created the
+    notification. The publishing worker also receives its own message back through
+    its subscription, so local sockets are delivered to exactly once.
+    """
+
+    CHANNEL = "flourish:notifications"
+    RECONNECT_SECONDS = 1
+
+    def __init__(self, url: str, deliver: Deliver):
+        self.url = url
+        self._deliver = deliver
+        self._client = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def _redis(self):
+        if self._client is None:
+            # Imported here so the redis client is only needed when NOTIFICATION_BUS_URL is set
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url)
+        return self._client
+
+    async def start(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis().pubsub()
+                await pubsub.subscribe(self.CHANNEL)
+                async for item in pubsub.listen():
+                    if item.get("type") == "message":
+                        await self._handle(item["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Notification bus listener error: {e}")
+                await asyncio.sleep(self.RECONNECT_SECONDS)
+
+    async def _handle(self, data: Any) -> None:
+        try:
+            envelope = json.loads(data)
+            await self._deliver(envelope["user_id"], envelope["message"])
+        except Exception as e:
+            print(f"Notification bus delivery error: {e}")
+
+    async def publish(self, user_id: str, message: Dict[str, Any]) -> None:
+        await self._redis().publish(self.CHANNEL, json.dumps({"user_id": user_id, "message": message}))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_bus: Optional[NotificationBus] = None
+
+def get_notification_bus() -> NotificationBus:
+    """
+    The process-wide bus: Redis-backed when NOTIFICATION_BUS_URL is set, otherwise
+    in-process. Built lazily, like FirestoreDB's client.
+    """
+    global _bus
+    if _bus is None:
+        # Local import: routes/notifications.py owns the ConnectionManager and imports
+        # this module, so the reverse import has to wait until first use.
+        from ..routes.notifications import manager
+        if settings.NOTIFICATION_BUS_URL:
+            _bus = RedisNotificationBus(settings.NOTIFICATION_BUS_URL, manager.send_personal_message)
+        else:
+            _bus = InProcessNotificationBus(manager.send_personal_message)
+    return _bus
@@ -1,33 +1,70 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
 
 from ..db.firestore import FirestoreDB
+from .notification_bus import get_notification_bus
+
+
+def unread_count_message(count: int) -> Dict[str, Any]:
+    """
+    Socket/stream message carrying the unread badge count. Keyed by "event" - a
+    notification's own "type" field is its category (achievement, reminder, ...).
+    """
+    return {"event": "unread_count", "count": count}
 
 
 class NotificationService:
     """
     Single entry point for creating a notification. Persists to Firestore AND pushes it
-    live over the WebSocket connection the client has open (see routes/notifications.py's
-    ConnectionManager) - the real-time "webhook-style" delivery the app promises.
+    live over the WebSocket connections the client has open (see routes/notifications.py's
+    ConnectionManager) - the real-time "webhook-style" delivery the app promises. The push
+    goes through the notification bus (services/notification_bus.py), so it reaches the
+    user's sockets whichever worker holds them.
 
     Every notification-creation call site should go through notify() instead of calling
     FirestoreDB.create_notification() directly - that only persists, it never reaches a
     connected client until their next poll.
+
+    The live push is best-effort: once the notification is stored, a bus failure (e.g.
+    Redis down) is logged rather than raised - the client still gets it on its next
+    poll or reconnect, and the caller (a request, an outbox retry) doesn't fail over it.
     """
 
     @staticmethod
-    async def notify(user_id: str, notification_type: str, title: str, message: str) -> Dict[str, Any]:
-        notification = await FirestoreDB.create_notification({
+    async def notify(
+        user_id: str,
+        notification_type: str,
+        title: str,
+        message: str,
+        notification_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Store and push a notification. Pass a notification_id derived from something
+        unique (e.g. an outbox entry id) to make repeated calls store it only once.
+        """
+        notification, unread_count = await FirestoreDB.create_notification({
             "user_id": user_id,
             "type": notification_type,
             "title": title,
             "message": message,
             "read": False,
-        })
+        }, notif_id=notification_id)
 
-        # Local import: routes/notifications.py owns the ConnectionManager and doesn't
-        # import this module, so there's no real cycle - kept lazy anyway to stay clear
-        # of any FastAPI router import-order fragility at app startup.
-        from ..routes.notifications import manager
-        await manager.send_personal_message(user_id, notification)
+        await NotificationService._publish(user_id, jsonable_encoder(notification))
+        if unread_count is not None:
+            await NotificationService.push_unread_count(user_id, unread_count)
 
         return notification
+
+    @staticmethod
+    async def push_unread_count(user_id: str, count: int) -> None:
+        """Push the user's new unread badge count to their open sockets/streams."""
+        await NotificationService._publish(user_id, unread_count_message(count))
+
+    @staticmethod
+    async def _publish(user_id: str, message: Dict[str, Any]) -> None:
+        try:
+            await get_notification_bus().publish(user_id, message)
+        except Exception as e:
+            print(f"Notification bus publish error for {user_id}: {e}")
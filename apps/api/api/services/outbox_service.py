@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from ..db.firestore import FirestoreDB
+from .notification_service import NotificationService
+
+# How long a claimed entry is hidden from other workers while one attempt runs
+OUTBOX_LEASE_SECONDS = 120
+# Attempts before an entry is parked as status "failed"; retries back off
+# exponentially from OUTBOX_RETRY_BASE_SECONDS, capped at OUTBOX_RETRY_MAX_SECONDS.
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_RETRY_MAX_SECONDS = 3600
+
+
+async def _award_points(entry_id: str, payload: Dict[str, Any]) -> None:
+    # Local import: routes/leaderboard.py owns the scoring logic and imports services
+    from ..routes.leaderboard import apply_score_update
+    # Keyed by the entry, so a retry after the points landed doesn't award them again
+    await apply_score_update(payload["user_id"], payload["points"], award_id=entry_id)
+
+async def _notify(entry_id: str, payload: Dict[str, Any]) -> None:
+    # Keyed by the entry, so a retry after the notification was stored doesn't add another
+    await NotificationService.notify(
+        payload["user_id"], payload["type"], payload["title"], payload["message"],
+        notification_id=f"outbox-{entry_id}"
+    )
+
+async def _refresh_agent_profile(entry_id: str, payload: Dict[str, Any]) -> None:
+    from .groq_service import GroqService
+    await GroqService.refresh_agent_profile_summary(payload["user_id"])
+
+# outbox entry "kind" -> the side effect it runs, given the entry's id and payload. A
+# handler raising means "retry later", so it may run again after partly succeeding.
+HANDLERS: Dict[str, Callable[[str, Dict[str, Any]], Awaitable[None]]] = {
+    "award_points": _award_points,
+    "notify": _notify,
+    "refresh_agent_profile": _refresh_agent_profile,
+}
+
+
+class OutboxService:
+    """
+    Side effects of a user action, made durable: they're written to the `outbox`
+    collection in the same commit as the action itself (FirestoreDB.update_task_with_outbox)
+    and run afterwards - right after the response is sent, for the entries that request
+    created, and by the periodic drain() for anything that failed or was never picked
+    up. Delivery is at-least-once, with exponential backoff between attempts.
+    """
+
+    @staticmethod
+    def task_completion_effects(user_id: str, task: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """What completing a care task sets off: points/streak/achievements, the
+        "Task Completed!" notification, and PlantMind's profile summary refresh."""
+        points = task.get("points", 10)
+        return [
+            {"kind": "award_points", "payload": {"user_id": user_id, "points": points}},
+            {"kind": "notify", "payload": {
+                "user_id": user_id,
+                "type": "task_completed",
+                "title": "Task Completed!",
+                "message": f"You earned {points} points for completing: {task.get('title')}"
+            }},
+            {"kind": "refresh_agent_profile", "payload": {"user_id": user_id}},
+        ]
+
+    @staticmethod
+    def _retry_at(attempts: int) -> datetime:
+        delay = min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+        return datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+    @staticmethod
+    async def process_entry(entry_id: str) -> bool:
+        """Claim and run one entry. True if it ran successfully."""
+        entry = await FirestoreDB.claim_outbox_entry(entry_id, OUTBOX_LEASE_SECONDS)
+        if entry is None:
+            return False  # already done, or another worker holds it
+
+        handler = HANDLERS.get(entry.get("kind"))
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown outbox entry kind: {entry.get('kind')}")
+            await handler(entry_id, entry.get("payload") or {})
+        except Exception as e:
+            attempts = entry["attempts"]
+            retry_at = OutboxService._retry_at(attempts) if attempts < OUTBOX_MAX_ATTEMPTS and handler else None
+            print(f"Outbox {entry.get('kind')} {entry_id} attempt {attempts} failed: {e}")
+            await FirestoreDB.retry_outbox_entry(entry_id, str(e), retry_at)
+            return False
+
+        await FirestoreDB.complete_outbox_entry(entry_id)
+        return True
+
+    @staticmethod
+    async def process(entry_ids: List[str]) -> int:
+        """Run these entries in order (e.g. a request's own, as a background task)."""
+        succeeded = 0
+        for entry_id in entry_ids:
+            try:
+                succeeded += await OutboxService.process_entry(entry_id)
+            except Exception as e:
+                print(f"Outbox processing error for {entry_id}: {e}")
+        return succeeded
+
+    @staticmethod
+    async def drain(limit: int = 100) -> Dict[str, int]:
+        """Run every due entry (up to limit) - retries, and anything never picked up."""
+        entry_ids = await FirestoreDB.get_due_outbox_ids(limit)
+        succeeded = await OutboxService.process(entry_ids)
+        return {"due": len(entry_ids), "succeeded": succeeded}
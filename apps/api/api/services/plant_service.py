@@ -2,11 +2,12 @@ import asyncio
 import re
 import httpx
 from typing import Any, Dict, List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from ..core.config import settings
 from ..db.firestore import FirestoreDB
 from ..models.plant import Plant
 from .perenual_service import PerenualService
+from .recurring_task_service import RecurringTaskService
 
 class PlantService:
     @staticmethod
@@ -59,57 +60,65 @@ class PlantService:
         types: Optional[List[str]] = None
     ) -> List[dict]:
         """
-        Persist a real forward-looking care schedule (several upcoming watering/
-        fertilizing occurrences, not just a single "due now" task) so the Calendar has
-        actual future dates to render as soon as a plant is added. Called by both the
-        agentic autonomous-create flow and the manual "generate tasks" endpoint.
+        Give a plant its recurring watering/fertilizing schedule: one care rule per task
+        type, first due now and repeating every watering_frequency_days /
+        fertilizer_frequency_days, expanded into occurrences on read (see
+        RecurringTaskService) - so the Calendar has real future dates to render as soon
+        as a plant is added, without a stored task per date. Called by both the agentic
+        autonomous-create flow and the manual "generate tasks" endpoint. Returns the
+        upcoming occurrences: ~30 days of watering, ~90 of fertilizing.
         """
         types = types or ["watering", "fertilizing"]
-        now = datetime.now()
+        now = datetime.now(timezone.utc)
         plant_id = plant["id"]
         plant_name = plant.get("name", "your plant")
-        to_create = []
+        rules = []
+        horizons = {}
 
         if "watering" in types:
-            watering_days = plant.get("watering_frequency_days") or 7
-            occurrences = max(1, min(6, -(-30 // watering_days)))  # cover ~30 days ahead, capped
-            for i in range(occurrences):
-                due = now + timedelta(days=i * watering_days)
-                to_create.append({
-                    "user_id": user_id,
-                    "plant_id": plant_id,
-                    "task_type": "watering",
-                    "title": f"Water {plant_name}",
-                    "description": plant.get("watering_amount") or "Water thoroughly",
-                    "due_date": due.isoformat(),
-                    "priority": "high" if i == 0 else "medium",
-                    "completed": False,
-                    "points": 10,
-                    "recurring": True,
-                    "recurring_days": watering_days
-                })
+            rules.append({
+                "id": f"{plant_id}_watering",
+                "user_id": user_id,
+                "plant_id": plant_id,
+                "task_type": "watering",
+                "title": f"Water {plant_name}",
+                "description": plant.get("watering_amount") or "Water thoroughly",
+                "priority": "medium",
+                "first_priority": "high",
+                "points": 10,
+                "interval_days": plant.get("watering_frequency_days") or 7,
+                "anchor": now,
+                "exceptions": []
+            })
+            horizons["watering"] = 30
 
         if "fertilizing" in types:
-            fertilizer_days = plant.get("fertilizer_frequency_days") or 30
-            occurrences = max(1, min(4, -(-90 // fertilizer_days)))  # cover ~90 days ahead, capped
-            for i in range(occurrences):
-                due = now + timedelta(days=i * fertilizer_days)
-                to_create.append({
-                    "user_id": user_id,
-                    "plant_id": plant_id,
-                    "task_type": "fertilizing",
-                    "title": f"Fertilize {plant_name}",
-                    "description": plant.get("fertilizer_type") or "Apply fertilizer",
-                    "due_date": due.isoformat(),
-                    "priority": "low",
-                    "completed": False,
-                    "points": 15,
-                    "recurring": True,
-                    "recurring_days": fertilizer_days
-                })
+            rules.append({
+                "id": f"{plant_id}_fertilizing",
+                "user_id": user_id,
+                "plant_id": plant_id,
+                "task_type": "fertilizing",
+                "title": f"Fertilize {plant_name}",
+                "description": plant.get("fertilizer_type") or "Apply fertilizer",
+                "priority": "low",
+                "points": 15,
+                "interval_days": plant.get("fertilizer_frequency_days") or 30,
+                "anchor": now,
+                "exceptions": []
+            })
+            horizons["fertilizing"] = 90
 
-        # Independent writes - create them concurrently rather than one-at-a-time.
-        return list(await asyncio.gather(*[FirestoreDB.create_task(t) for t in to_create]))
+        if not rules:
+            return []
+        # One batched commit for every rule, however far ahead its occurrences run.
+        await FirestoreDB.save_care_rules(rules)
+        return [
+            occurrence
+            for rule in rules
+            for occurrence in RecurringTaskService.expand(
+                rule, None, now + timedelta(days=horizons[rule["task_type"]]), now
+            )
+        ]
 
     @staticmethod
     def _parse_frequency_days(frequency: Optional[str]) -> Optional[int]:
@@ -0,0 +1,224 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..db.firestore import FirestoreDB, to_timestamp
+
+# Joins a care rule's id and an occurrence's UTC due day into the occurrence's task id
+OCCURRENCE_SEPARATOR = "@"
+
+# Rule fields every occurrence it expands to carries over as-is
+RULE_TASK_FIELDS = ("user_id", "plant_id", "task_type", "title", "description", "priority", "points")
+
+# Fields that tie a persisted occurrence to its rule, day and owner - never taken from updates
+OCCURRENCE_KEY_FIELDS = ("id", "user_id", "rule_id", "occurrence")
+
+
+class RecurringTaskService:
+    """
+    Recurring care (watering, fertilizing) stored as one `care_rules` document per
+    plant and task type - an anchor due date and an interval in days - and expanded
+    into occurrences on read, instead of a care_tasks document per future date.
+
+    An occurrence's task id is "{rule_id}@{YYYY-MM-DD}" (its UTC due day), so the task
+    routes address it like any stored task. Only what happens to an occurrence is
+    persisted: completing, snoozing, rescheduling or editing one writes a care_tasks
+    document under that id, deleting one just skips it - either way its day joins the
+    rule's `exceptions`, which expansion leaves out.
+
+    Only the latest occurrence due by now (the "current" one) can be overdue: earlier
+    ones nobody acted on have lapsed, superseded by it.
+    """
+
+    @staticmethod
+    def occurrence_id(rule_id: str, day: str) -> str:
+        return f"{rule_id}{OCCURRENCE_SEPARATOR}{day}"
+
+    @staticmethod
+    def parse_occurrence_id(task_id: str) -> Optional[Tuple[str, str]]:
+        """(rule_id, day) for an occurrence id, None for any other task id."""
+        rule_id, separator, day = task_id.rpartition(OCCURRENCE_SEPARATOR)
+        if not separator or not rule_id:
+            return None
+        try:
+            date.fromisoformat(day)
+        except ValueError:
+            return None
+        return rule_id, day
+
+    @staticmethod
+    def _anchor(rule: Dict) -> datetime:
+        return to_timestamp(rule["anchor"]).astimezone(timezone.utc)
+
+    @staticmethod
+    def _interval(rule: Dict) -> timedelta:
+        return timedelta(days=max(1, int(rule.get("interval_days") or 1)))
+
+    @staticmethod
+    def _current_index(rule: Dict, now: datetime) -> int:
+        return max(0, (now - RecurringTaskService._anchor(rule)) // RecurringTaskService._interval(rule))
+
+    @staticmethod
+    def _occurrence(rule: Dict, index: int) -> Dict:
+        due = RecurringTaskService._anchor(rule) + index * RecurringTaskService._interval(rule)
+        day = due.date().isoformat()
+        occurrence = {field: rule.get(field) for field in RULE_TASK_FIELDS}
+        occurrence.update({
+            "id": RecurringTaskService.occurrence_id(rule["id"], day),
+            "due_date": due,
+            "completed": False,
+            "recurring": True,
+            "recurring_days": RecurringTaskService._interval(rule).days,
+            "rule_id": rule["id"],
+            "occurrence": day,
+            "virtual": True,
+        })
+        if index == 0 and rule.get("first_priority"):
+            occurrence["priority"] = rule["first_priority"]
+        return occurrence
+
+    @staticmethod
+    def expand(rule: Dict, start: Optional[datetime], end: datetime, now: datetime) -> List[Dict]:
+        """
+        The rule's occurrences with start <= due_date < end (start None: from the
+        current one on), excluding its exceptions and any that have lapsed by now.
+        """
+        anchor = RecurringTaskService._anchor(rule)
+        interval = RecurringTaskService._interval(rule)
+        exceptions = set(rule.get("exceptions") or [])
+        index = RecurringTaskService._current_index(rule, now)
+        if start is not None:
+            index = max(index, -((anchor - start) // interval))  # first index due at/after start
+        occurrences = []
+        while anchor + index * interval < end:
+            occurrence = RecurringTaskService._occurrence(rule, index)
+            if occurrence["occurrence"] not in exceptions:
+                occurrences.append(occurrence)
+            index += 1
+        return occurrences
+
+    @staticmethod
+    def occurrence_on(rule: Dict, day: str, now: datetime) -> Optional[Dict]:
+        """
+        The rule's not-yet-persisted occurrence due on this UTC day, if expansion would
+        list it: not lapsed by now, and due within RECURRING_TASKS_HORIZON_DAYS.
+        """
+        index, remainder = divmod(
+            (date.fromisoformat(day) - RecurringTaskService._anchor(rule).date()).days,
+            RecurringTaskService._interval(rule).days
+        )
+        if remainder or index < RecurringTaskService._current_index(rule, now) \
+                or day in (rule.get("exceptions") or []):
+            return None
+        occurrence = RecurringTaskService._occurrence(rule, index)
+        if occurrence["due_date"] >= now + timedelta(days=settings.RECURRING_TASKS_HORIZON_DAYS):
+            return None
+        return occurrence
+
+    @staticmethod
+    def _stale_exceptions(rule: Dict, now: datetime) -> List[str]:
+        """Exceptions before the current occurrence - expansion never reaches them again."""
+        current = RecurringTaskService._occurrence(rule, RecurringTaskService._current_index(rule, now))
+        return [day for day in rule.get("exceptions") or [] if day < current["occurrence"]]
+
+    @staticmethod
+    def _with_occurrences(
+        tasks: List[Dict],
+        rules: List[Dict],
+        start: Optional[datetime],
+        end: datetime
+    ) -> List[Dict]:
+        now = datetime.now(timezone.utc)
+        stored_ids = {task["id"] for task in tasks}
+        occurrences = [
+            occurrence
+            for rule in rules
+            for occurrence in RecurringTaskService.expand(rule, start, end, now)
+            if occurrence["id"] not in stored_ids
+        ]
+        return tasks + occurrences
+
+    @staticmethod
+    async def tasks_in_range(
+        user_id: str,
+        start: Optional[datetime],
+        end: datetime,
+        completed: Optional[bool] = None
+    ) -> List[Dict]:
+        """
+        get_user_tasks_in_range, plus the user's recurring occurrences due in the range
+        - ordered by due_date. Occurrences are never completed (a completed one is a
+        stored task), so completed=True reads no rules.
+        """
+        tasks = await FirestoreDB.get_user_tasks_in_range(user_id, start, end, completed=completed)
+        if completed:
+            return tasks
+        rules = await FirestoreDB.get_user_care_rules(user_id)
+        tasks = RecurringTaskService._with_occurrences(tasks, rules, start, end)
+        tasks.sort(key=lambda task: task["due_date"])
+        return tasks
+
+    @staticmethod
+    async def user_tasks(user_id: str, completed: Optional[bool] = None) -> List[Dict]:
+        """get_user_tasks, plus recurring occurrences up to RECURRING_TASKS_HORIZON_DAYS ahead."""
+        tasks = await FirestoreDB.get_user_tasks(user_id, completed=completed)
+        if completed:
+            return tasks
+        rules = await FirestoreDB.get_user_care_rules(user_id)
+        horizon = datetime.now(timezone.utc) + timedelta(days=settings.RECURRING_TASKS_HORIZON_DAYS)
+        return RecurringTaskService._with_occurrences(tasks, rules, None, horizon)
+
+    @staticmethod
+    async def plant_tasks(plant_id: str) -> List[Dict]:
+        """get_plant_tasks, plus recurring occurrences up to RECURRING_TASKS_HORIZON_DAYS ahead."""
+        tasks = await FirestoreDB.get_plant_tasks(plant_id)
+        rules = await FirestoreDB.get_plant_care_rules(plant_id)
+        horizon = datetime.now(timezone.utc) + timedelta(days=settings.RECURRING_TASKS_HORIZON_DAYS)
+        return RecurringTaskService._with_occurrences(tasks, rules, None, horizon)
+
+    @staticmethod
+    async def get_task(task_id: str) -> Optional[Dict]:
+        """A stored task, or else the recurring occurrence this id names (if it is current)."""
+        task = await FirestoreDB.get_task(task_id)
+        if task is not None:
+            return task
+        parsed = RecurringTaskService.parse_occurrence_id(task_id)
+        if parsed is None:
+            return None
+        rule = await FirestoreDB.get_care_rule(parsed[0])
+        return RecurringTaskService.occurrence_on(rule, parsed[1], datetime.now(timezone.utc)) if rule else None
+
+    @staticmethod
+    async def update_task(task: Dict, updates: Dict, effects: Optional[List[Dict]] = None) -> List[str]:
+        """
+        Apply updates to a task from get_task - along with its outbox effects, if any.
+        An occurrence not yet stored is written out as a care_tasks document with the
+        updates applied, apart from its OCCURRENCE_KEY_FIELDS. Returns the outbox entry ids.
+        """
+        if not task.get("virtual"):
+            if effects:
+                return await FirestoreDB.update_task_with_outbox(task["id"], updates, effects)
+            await FirestoreDB.update_task(task["id"], updates)
+            return []
+        task_data = {key: value for key, value in task.items() if key != "virtual"}
+        task_data.update(updates)
+        task_data.update({field: task[field] for field in OCCURRENCE_KEY_FIELDS})
+        return await RecurringTaskService._write_occurrence(task, task_data, effects or [])
+
+    @staticmethod
+    async def delete_task(task: Dict) -> None:
+        """Delete a task from get_task; for an occurrence, skip it instead."""
+        if task.get("virtual"):
+            await RecurringTaskService._write_occurrence(task, None, [])
+        else:
+            await FirestoreDB.delete_task(task["id"])
+
+    @staticmethod
+    async def _write_occurrence(task: Dict, task_data: Optional[Dict], effects: List[Dict]) -> List[str]:
+        # Re-read the rule for its current exceptions, so ones that can't matter any
+        # more are pruned in the same commit rather than piling up.
+        rule = await FirestoreDB.get_care_rule(task["rule_id"])
+        stale = RecurringTaskService._stale_exceptions(rule, datetime.now(timezone.utc)) if rule else []
+        return await FirestoreDB.write_occurrence(
+            task["id"], task["rule_id"], task["occurrence"], task_data, stale, effects
+        )
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import socket
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from ..core.config import settings
+from ..db.firestore import FirestoreDB
+
+
+# Share of the lease a leader that can't renew keeps its scheduler running for. The
+# remaining third is margin for heartbeat delays, so it has stopped before the lease
+# expires and another process can take over.
+LEADER_SAFE_FRACTION = 2 / 3
+
+
+class SchedulerLease(ABC):
+    """
+    A lock held by at most one process at a time, which must keep renewing it. Whoever
+    holds it runs the in-process APScheduler (see SchedulerLeader).
+    """
+
+    @abstractmethod
+    async def acquire(self) -> bool:
+        """Take or renew the lease. True while this process holds it."""
+
+    @abstractmethod
+    async def release(self) -> None:
+        """Give the lease up, if held."""
+
+
+class FirestoreSchedulerLease(SchedulerLease):
+    """
+    A `leases/scheduler` document holding the leader's id and an expiry, so every
+    instance of every host takes part in one election. A leader that stops renewing
+    (crashed, frozen, partitioned) is replaced once its expiry passes.
+    """
+
+    NAME = "scheduler"
+
+    def __init__(self, lease_seconds: int):
+        self.lease_seconds = lease_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire(self) -> bool:
+        return await FirestoreDB.acquire_lease(self.NAME, self.holder, self.lease_seconds)
+
+    async def release(self) -> None:
+        await FirestoreDB.release_lease(self.NAME, self.holder)
+
+
+class LocalSchedulerLease(SchedulerLease):
+    """
+    Single-host stand-in: an exclusive flock on a lock file, electing one of the uvicorn
+    workers on this machine without touching Firestore. The OS drops the lock when its
+    holder exits, so failover is immediate.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(tempfile.gettempdir(), "flourish-scheduler.lock")
+        self._fd: Optional[int] = None
+
+    async def acquire(self) -> bool:
+        # Imported here: fcntl is POSIX-only, and only needed with SCHEDULER_LEASE_BACKEND=local
+        import fcntl
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)  # closing the descriptor releases the flock
+            self._fd = None
+
+
+class SchedulerLeader:
+    """
+    Runs the in-process scheduler only while holding the lease - so N web workers or
+    instances run each hourly/daily job once, not N times. Every process heartbeats
+    every third of the lease: the leader renews it, the rest try to take it over.
+    A leader that can't confirm its lease (e.g. Firestore unreachable) stops its
+    scheduler LEADER_SAFE_FRACTION of the lease after its last renewal - before the
+    lease expires and another process may take over, so two never run at once.
+    """
+
+    def __init__(self, lease: SchedulerLease, lease_seconds: int):
+        self.lease = lease
+        self.lease_seconds = lease_seconds
+        self.is_leader = False
+        self._held_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self.heartbeat()
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def heartbeat(self) -> None:
+        # Local import: scheduler_service imports FirestoreDB and every job's services
+        from .scheduler_service import start_scheduler, stop_scheduler
+        # Measured from before the call: the store sets the expiry no earlier than this
+        renewed_at = time.monotonic()
+        try:
+            # A hung call counts as a failed renewal, so the check below still runs in time
+            held = await asyncio.wait_for(self.lease.acquire(), timeout=self.lease_seconds / 3)
+            if held:
+                self._held_until = renewed_at + self.lease_seconds * LEADER_SAFE_FRACTION
+        except Exception as e:
+            print(f"Scheduler lease error: {e}")
+            held = self.is_leader and time.monotonic() < self._held_until
+
+        if held and not self.is_leader:
+            print("Acquired scheduler lease - starting in-process scheduler")
+            start_scheduler()
+        elif not held and self.is_leader:
+            print("Lost scheduler lease - stopping in-process scheduler")
+            stop_scheduler()
+        self.is_leader = held
+
+    async def stop(self) -> None:
+        from .scheduler_service import stop_scheduler
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader:
+            stop_scheduler()
+            self.is_leader = False
+            try:
+                await self.lease.release()
+            except Exception as e:
+                print(f"Scheduler lease release error: {e}")
+
+
+_leader: Optional[SchedulerLeader] = None
+
+def get_scheduler_leader() -> SchedulerLeader:
+    """The process-wide scheduler leader, backed by SCHEDULER_LEASE_BACKEND. Built lazily."""
+    global _leader
+    if _leader is None:
+        if settings.SCHEDULER_LEASE_BACKEND == "local":
+            lease: SchedulerLease = LocalSchedulerLease()
+        else:
+            lease = FirestoreSchedulerLease(settings.SCHEDULER_LEASE_SECONDS)
+        _leader = SchedulerLeader(lease, settings.SCHEDULER_LEASE_SECONDS)
+    return _leader
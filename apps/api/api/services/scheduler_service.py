@@ -1,82 +1,463 @@
-from datetime import datetime, date
-from typing import Optional
+import asyncio
+import math
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, date, timedelta, timezone
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
-from ..db.firestore import FirestoreDB
+from ..core.config import settings
+from ..db.firestore import DEFAULT_TIMEZONE, MAX_IN_VALUES, FirestoreDB
 from .email_service import EmailService
 from .notification_service import NotificationService
+from .outbox_service import OutboxService
+from .recurring_task_service import RecurringTaskService
 
 _scheduler: Optional[AsyncIOScheduler] = None
 
-async def run_streak_risk_sweep() -> None:
-    """Every hour: warn users whose streak is 20-24h from lapsing."""
+# Trailing window, in days, of each materialized period leaderboard (see
+# run_period_leaderboard_rollup), and how many users each one keeps.
+PERIOD_WINDOW_DAYS = {"weekly": 7, "monthly": 30}
+PERIOD_LEADERBOARD_SIZE = 100
+# A streak is at risk once this long has passed since the last completion
+# (profiles.streak_expires_at), and warned about in the last STREAK_RISK_WINDOW_HOURS.
+STREAK_EXPIRY_HOURS = 24
+STREAK_RISK_WINDOW_HOURS = 4
+# Local time the digest and weekly summary reach each user. Both jobs run hourly, each
+# run covering the timezones where it's currently that hour (timezones_at_local_time).
+DIGEST_LOCAL_HOUR = 8
+WEEKLY_SUMMARY_LOCAL_HOUR = 9
+WEEKLY_SUMMARY_WEEKDAY = 0  # Monday
+# Sweep runs tied to an hour are keyed by it, and their cursors carry it (see run_hour)
+RUN_HOUR_FORMAT = "%Y-%m-%dT%HZ"
+# The care_rules fields the digest needs to expand a rule's occurrences
+RULE_DUE_FIELDS = ["user_id", "anchor", "interval_days", "exceptions"]
+# How late a job may still start after its fire time (e.g. while the previous run held
+# its only instance); later than that, the occurrence is skipped.
+JOB_MISFIRE_GRACE_SECONDS = 300
+# A running job shard holds the `leases/{job}:{shard}-of-{of}` lease (see run_job) for
+# its deadline plus this margin, so a run that dies without releasing it frees it soon.
+JOB_LEASE_MARGIN_SECONDS = 60
+
+async def sweep_users(job: str, profiles: AsyncIterator[Dict], handle_user: Callable[[Dict], Awaitable[bool]]) -> Dict:
+    """
+    Run handle_user for every streamed profile, up to SCHEDULER_CONCURRENCY users at a
+    time - the per-user Firestore/email round-trips overlap instead of running one
+    user after another. One user's failure is logged and counted, not fatal to the
+    sweep. handle_user returns whether it acted (notified/emailed) for that user.
+    Returns (and logs) the run's user count, duration and throughput.
+    """
+    semaphore = asyncio.Semaphore(settings.SCHEDULER_CONCURRENCY)
+    stats = {"job": job, "users": 0, "acted": 0, "errors": 0}
+    started = time.monotonic()
+
+    async def _run(profile: Dict) -> None:
+        try:
+            if await handle_user(profile):
+                stats["acted"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"{job} error for {profile.get('id')}: {e}")
+        finally:
+            semaphore.release()
+
+    pending = set()
+    async for profile in profiles:
+        await semaphore.acquire()
+        stats["users"] += 1
+        task = asyncio.create_task(_run(profile))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+
+    duration = time.monotonic() - started
+    stats["duration_seconds"] = round(duration, 3)
+    stats["users_per_second"] = round(stats["users"] / duration, 1) if duration > 0 else float(stats["users"])
+    print(f"{job}: {stats['users']} users ({stats['acted']} acted on, {stats['errors']} errors) "
+          f"in {stats['duration_seconds']}s - {stats['users_per_second']} users/s")
+    return stats
+
+@lru_cache(maxsize=1)
+def _known_timezones() -> Tuple[str, ...]:
+    return tuple(sorted(available_timezones()))
+
+def timezones_at_local_time(now: datetime, hour: int, weekday: Optional[int] = None) -> List[str]:
+    """Every IANA timezone whose local time at `now` is `hour` (on `weekday`, if given)."""
+    zones = []
+    for name in _known_timezones():
+        local = now.astimezone(ZoneInfo(name))
+        if local.hour == hour and (weekday is None or local.weekday() == weekday):
+            zones.append(name)
+    return zones
+
+def local_day_bounds(timezone_name: Optional[str], now: datetime) -> Tuple[datetime, datetime]:
+    """[start, end) of the user's local calendar day at `now`, as aware datetimes."""
     try:
-        profiles = await FirestoreDB.get_all_profiles()
-        now = datetime.now()
-        for profile in profiles:
-            user_id = profile.get("id")
-            streak_days = profile.get("streak_days", 0)
-            last_activity = profile.get("last_activity")
-            if not streak_days or not last_activity:
+        zone = ZoneInfo(timezone_name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = ZoneInfo(DEFAULT_TIMEZONE)
+    today = now.astimezone(zone).date()
+    start = datetime.combine(today, datetime.min.time(), tzinfo=zone)
+    end = datetime.combine(today + timedelta(days=1), datetime.min.time(), tzinfo=zone)
+    return start, end
+
+def run_hour(cursor: Optional[str]) -> datetime:
+    """
+    The UTC hour an hourly sweep call belongs to: the one its cursor was issued in -
+    so a run resumed after the hour turns still covers the same timezone bucket -
+    or else the current one.
+    """
+    if cursor and "/" in cursor:
+        return datetime.strptime(cursor.split("/", 1)[0], RUN_HOUR_FORMAT).replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+def in_shard(user_id: str, shard: int, of: int) -> bool:
+    """Stable hash partition of users into `of` shards (crc32, same in every process)."""
+    return of <= 1 or zlib.crc32(user_id.encode()) % of == shard
+
+class SweepSource(ABC):
+    """The users one sweep visits, in ascending user-id order, resumable after any id."""
+
+    @abstractmethod
+    def stream(self, after: Optional[str]) -> AsyncIterator[Dict]:
+        """Users with an id greater than `after` (all of them if None), by id."""
+
+    @abstractmethod
+    async def remaining(self, after: str, shard: int, of: int) -> int:
+        """Users left in this shard after `after` (may be an estimate)."""
+
+class LoadedSweepSource(SweepSource):
+    """
+    A small candidate set (users at risk, users with tasks due) produced by one query,
+    loaded whole and sorted by id so a cursor can resume partway through it.
+    """
+
+    def __init__(self, load: Callable[[], AsyncIterator[Dict]]):
+        self._load = load
+        self._users: Optional[List[Dict]] = None
+
+    async def _all(self) -> List[Dict]:
+        if self._users is None:
+            self._users = sorted([user async for user in self._load()], key=lambda user: user["id"])
+        return self._users
+
+    async def stream(self, after: Optional[str]) -> AsyncIterator[Dict]:
+        for user in await self._all():
+            if after is None or user["id"] > after:
+                yield user
+
+    async def remaining(self, after: str, shard: int, of: int) -> int:
+        return sum(1 for user in await self._all() if user["id"] > after and in_shard(user["id"], shard, of))
+
+class TimezoneBucketSource(SweepSource):
+    """The profiles in one local-time bucket (a set of timezones), in id order."""
+
+    def __init__(self, timezones: List[str], fields: List[str]):
+        self.timezones = timezones
+        self.fields = fields
+
+    def stream(self, after: Optional[str]) -> AsyncIterator[Dict]:
+        return FirestoreDB.stream_profiles_in_timezones(self.timezones, fields=self.fields, after=after)
+
+    async def remaining(self, after: str, shard: int, of: int) -> int:
+        # One COUNT() over the rest of the bucket, split evenly across shards -
+        # counting one shard exactly would mean reading every remaining profile.
+        return math.ceil(await FirestoreDB.count_profiles_in_timezones(self.timezones, after=after) / of)
+
+class TaskDueDigestSource(TimezoneBucketSource):
+    """
+    The bucket's users with incomplete tasks due on their local today, as
+    {"id": user_id, "due_count": n}. Profiles are read in pages of MAX_IN_VALUES and
+    each page's due tasks fetched with one `user_id in` query per local-day window,
+    its care rules with one more and expanded per user's window - so reads scale with
+    the bucket and its due tasks, not a query per user. Profiles outside this shard
+    are dropped before any task is read, so N shards don't each read the whole
+    bucket's tasks.
+    """
+
+    def __init__(self, timezones: List[str], now: datetime, shard: int = 0, of: int = 1):
+        super().__init__(timezones, ["timezone"])
+        self.now = now
+        self.shard = shard
+        self.of = of
+
+    async def stream(self, after: Optional[str]) -> AsyncIterator[Dict]:
+        page: List[Dict] = []
+        async for profile in super().stream(after):
+            if not in_shard(profile["id"], self.shard, self.of):
                 continue
-            try:
-                last_dt = datetime.fromisoformat(str(last_activity).replace('Z', '+00:00')).replace(tzinfo=None)
-            except (ValueError, TypeError):
+            page.append(profile)
+            if len(page) == MAX_IN_VALUES:
+                async for user in self._with_tasks_due(page):
+                    yield user
+                page = []
+        if page:
+            async for user in self._with_tasks_due(page):
+                yield user
+
+    async def _with_tasks_due(self, profiles: List[Dict]) -> AsyncIterator[Dict]:
+        user_windows = {profile["id"]: local_day_bounds(profile.get("timezone"), self.now) for profile in profiles}
+        windows: Dict[Tuple[datetime, datetime], List[str]] = {}
+        for user_id, window in user_windows.items():
+            windows.setdefault(window, []).append(user_id)
+        due_counts: Dict[str, int] = {}
+        for (start, end), user_ids in windows.items():
+            async for task in FirestoreDB.stream_tasks_due(start, end, user_ids, fields=["user_id"]):
+                due_counts[task["user_id"]] = due_counts.get(task["user_id"], 0) + 1
+        # Stored occurrences are counted above and listed in their rule's exceptions
+        async for rule in FirestoreDB.stream_care_rules(list(user_windows), fields=RULE_DUE_FIELDS):
+            start, end = user_windows[rule["user_id"]]
+            due = len(RecurringTaskService.expand(rule, start, end, self.now))
+            if due:
+                due_counts[rule["user_id"]] = due_counts.get(rule["user_id"], 0) + due
+        for profile in profiles:
+            if due_counts.get(profile["id"]):
+                yield {"id": profile["id"], "due_count": due_counts[profile["id"]]}
+
+async def run_sweep_batch(
+    job: str,
+    run: str,
+    source: SweepSource,
+    handle_user: Callable[[Dict], Awaitable[bool]],
+    shard: int = 0,
+    of: int = 1,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Dict:
+    """
+    Process the next `limit` users (all of them if None) of one shard of a sweep run,
+    through sweep_users. Users are partitioned across `of` shards by in_shard, so
+    parallel invocations split the work; within a shard they're visited in id order,
+    and the last id processed is checkpointed in Firestore under (job, run, shard) -
+    `run` names the occurrence, e.g. the day for a daily job. Without an explicit
+    cursor, a call resumes from that checkpoint, and a run already completed is not
+    repeated. A call that times out before checkpointing re-processes at most its
+    own batch.
+
+    Returns the sweep stats plus {processed, remaining, next_cursor}; next_cursor is
+    None once the shard is done, otherwise the value to pass back to continue -
+    "{run}/{user_id}", so the caller can tell which run it resumes (see run_hour).
+    """
+    key = f"{job}:{run}:{shard}-of-{of}"
+    checkpoint = await FirestoreDB.get_sweep_checkpoint(key) or {}
+    if cursor is not None and "/" in cursor:
+        cursor = cursor.split("/", 1)[1]  # "{run}/{user_id}", as returned below
+    if cursor is None:
+        if checkpoint.get("done"):
+            return {"job": job, "run": run, "shard": shard, "of": of,
+                    "processed": 0, "remaining": 0, "next_cursor": None}
+        cursor = checkpoint.get("cursor")
+
+    position = {"last": cursor, "more": False}
+
+    async def _batch() -> AsyncIterator[Dict]:
+        taken = 0
+        async for user in source.stream(cursor):
+            if not in_shard(user["id"], shard, of):
                 continue
+            if limit is not None and taken >= limit:
+                position["more"] = True
+                break
+            taken += 1
+            position["last"] = user["id"]
+            yield user
 
-            hours_since = (now - last_dt).total_seconds() / 3600
-            if 20 <= hours_since < 24:
-                title = "Your streak is at risk!"
-                message = f"Complete a care task today to keep your {streak_days}-day streak alive."
-                await NotificationService.notify(user_id, "streak_risk", title, message)
-                await EmailService.send_for_notification(user_id, "streak_risk", title, message, trigger="scheduled")
-    except Exception as e:
-        print(f"Streak-risk sweep error: {e}")
+    stats = await sweep_users(job, _batch(), handle_user)
+    next_cursor = position["last"] if position["more"] else None
+    remaining = await source.remaining(next_cursor, shard, of) if next_cursor is not None else 0
+    await FirestoreDB.save_sweep_checkpoint(key, {
+        "job": job,
+        "run": run,
+        "shard": shard,
+        "of": of,
+        "cursor": next_cursor,
+        "done": next_cursor is None,
+        "processed": (checkpoint.get("processed") or 0) + stats["users"],
+    })
+    return {**stats, "run": run, "shard": shard, "of": of, "processed": stats["users"],
+            "remaining": remaining, "next_cursor": f"{run}/{next_cursor}" if next_cursor is not None else None}
+
+async def _warn_streak_at_risk(profile: Dict, now: datetime) -> bool:
+    user_id = profile.get("id")
+    streak_days = profile.get("streak_days", 0)
+    if not streak_days:
+        return False
+    window_end = now + timedelta(hours=STREAK_RISK_WINDOW_HOURS)
+    if not await FirestoreDB.claim_streak_warning(user_id, now.date().isoformat(), window_end):
+        return False
+
+    title = "Your streak is at risk!"
+    message = f"Complete a care task today to keep your {streak_days}-day streak alive."
+    await NotificationService.notify(user_id, "streak_risk", title, message)
+    await EmailService.send_for_notification(user_id, "streak_risk", title, message, trigger="scheduled")
+    return True
+
+async def run_streak_risk_sweep(
+    shard: int = 0, of: int = 1, cursor: Optional[str] = None, limit: Optional[int] = None
+) -> Dict:
+    """
+    Every hour: warn users whose streak lapses within STREAK_RISK_WINDOW_HOURS. Reads
+    only profiles with streak_expires_at in that window, and warns each at most once
+    a day (claim_streak_warning), though they stay in the window for several runs.
+    The shard/cursor/limit arguments are run_sweep_batch's.
+    """
+    now = datetime.now().astimezone()
+    source = LoadedSweepSource(lambda: FirestoreDB.stream_profiles_streak_expiring(
+        now, now + timedelta(hours=STREAK_RISK_WINDOW_HOURS), fields=["streak_days"]
+    ))
+    return await run_sweep_batch(
+        "streak_risk_sweep", run_hour(cursor).strftime(RUN_HOUR_FORMAT), source,
+        lambda profile: _warn_streak_at_risk(profile, now),
+        shard=shard, of=of, cursor=cursor, limit=limit
+    )
 
-async def run_task_due_digest() -> None:
-    """Daily at 08:00: notify users who have tasks due today."""
+async def _send_task_due_digest(user: Dict) -> bool:
+    user_id = user["id"]
+    title = "Today's care tasks"
+    message = f"You have {user['due_count']} task(s) due today."
+    await NotificationService.notify(user_id, "task_due", title, message)
+    await EmailService.send_for_notification(user_id, "task_due", title, message, trigger="scheduled")
+    return True
+
+async def run_task_due_digest(
+    shard: int = 0, of: int = 1, cursor: Optional[str] = None, limit: Optional[int] = None
+) -> Dict:
+    """
+    Hourly: notify the users whose local time is DIGEST_LOCAL_HOUR about the tasks due
+    on their local today - each run covers only the timezones at that hour, spreading
+    the sends across the day (shardable, see run_sweep_batch).
+    """
+    hour = run_hour(cursor)
+    return await run_sweep_batch(
+        "task_due_digest", hour.strftime(RUN_HOUR_FORMAT),
+        TaskDueDigestSource(timezones_at_local_time(hour, DIGEST_LOCAL_HOUR), hour, shard, of),
+        _send_task_due_digest,
+        shard=shard, of=of, cursor=cursor, limit=limit
+    )
+
+async def _send_weekly_summary(profile: Dict) -> bool:
+    subject = "Your week in the garden"
+    html = (
+        f"<p>Level {profile.get('level', 1)} · {profile.get('total_score', 0)} points · "
+        f"{profile.get('streak_days', 0)}-day streak.</p>"
+        f"<p>{profile.get('tasks_completed', 0)} tasks completed all-time. Keep it up!</p>"
+    )
+    await EmailService.send_digest(profile.get("id"), subject, html)
+    return True
+
+async def run_weekly_summary(
+    shard: int = 0, of: int = 1, cursor: Optional[str] = None, limit: Optional[int] = None
+) -> Dict:
+    """
+    Hourly: send the engagement summary email to users for whom it's Monday
+    WEEKLY_SUMMARY_LOCAL_HOUR local time (shardable, see run_sweep_batch).
+    """
+    hour = run_hour(cursor)
+    timezones = timezones_at_local_time(hour, WEEKLY_SUMMARY_LOCAL_HOUR, weekday=WEEKLY_SUMMARY_WEEKDAY)
+    return await run_sweep_batch(
+        "weekly_summary", hour.strftime(RUN_HOUR_FORMAT),
+        TimezoneBucketSource(timezones, ["level", "total_score", "streak_days", "tasks_completed"]),
+        _send_weekly_summary,
+        shard=shard, of=of, cursor=cursor, limit=limit
+    )
+
+def rollup_period_scores(buckets: List[Dict], window_start: date) -> List[Dict]:
+    """Sum daily score buckets on/after window_start per user; top users by points first."""
+    totals: Dict[str, int] = {}
+    cutoff = window_start.isoformat()
+    for bucket in buckets:
+        if bucket.get("day", "") >= cutoff and bucket.get("user_id"):
+            totals[bucket["user_id"]] = totals.get(bucket["user_id"], 0) + int(bucket.get("points") or 0)
+    ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+    return [{"id": user_id, "points": points} for user_id, points in ranked[:PERIOD_LEADERBOARD_SIZE]]
+
+async def run_period_leaderboard_rollup() -> Dict:
+    """
+    Hourly: materialize the weekly/monthly leaderboards into `leaderboards/{period}`
+    from the per-user daily `score_events` buckets apply_score_update appends to. One
+    read over the longest window serves every period; GET /leaderboard?period=... then
+    reads one precomputed document instead of aggregating on request.
+    """
+    today = date.today()
+    longest = max(PERIOD_WINDOW_DAYS.values())
+    buckets = await FirestoreDB.get_score_buckets_since(today - timedelta(days=longest - 1))
+    for period, days in PERIOD_WINDOW_DAYS.items():
+        window_start = today - timedelta(days=days - 1)
+        await FirestoreDB.save_period_leaderboard(period, window_start, rollup_period_scores(buckets, window_start))
+    return {"buckets": len(buckets), "users": len({bucket.get("user_id") for bucket in buckets})}
+
+async def run_outbox_drain() -> Dict:
+    """Every minute: retry failed outbox entries (and any never picked up)."""
+    result = await OutboxService.drain()
+    if result["due"]:
+        print(f"Outbox drain: {result['succeeded']}/{result['due']} entries succeeded")
+    return {**result, "errors": result["due"] - result["succeeded"]}
+
+async def run_job(job: str, run: Callable[..., Awaitable[Dict]], trigger: str = "scheduler", **kwargs) -> Dict:
+    """
+    Run one job invocation under instrumentation, for both the in-process scheduler
+    and /api/cron/*: skipped outright if the same shard of the same job is still
+    running - in any process, since the guard is a Firestore lease (other shards run
+    alongside it) - cancelled after SCHEDULER_JOB_DEADLINE_SECONDS, and recorded to
+    `job_runs` (see GET /api/cron/runs) with its duration, users processed, error
+    count and the job's own stats. Returns that record; never raises.
+    """
+    record: Dict = {
+        "job": job,
+        "trigger": trigger,
+        "started_at": datetime.now(timezone.utc),
+        "status": "ok",
+        "users_processed": None,
+        "errors": 0,
+        "error": None,
+        "stats": None,
+    }
+    started = time.monotonic()
+    lease_name = f"{job}:{kwargs.get('shard', 0)}-of-{kwargs.get('of', 1)}"
+    holder = uuid.uuid4().hex
     try:
-        profiles = await FirestoreDB.get_all_profiles()
-        today = date.today()
-        for profile in profiles:
-            user_id = profile.get("id")
-            tasks = await FirestoreDB.get_user_tasks(user_id, completed=False)
-            due_today = []
-            for task in tasks:
-                due_date = task.get("due_date")
-                if not due_date:
-                    continue
-                try:
-                    task_date = datetime.fromisoformat(str(due_date).replace('Z', '+00:00')).date()
-                except (ValueError, TypeError):
-                    continue
-                if task_date == today:
-                    due_today.append(task)
-
-            if due_today:
-                title = "Today's care tasks"
-                message = f"You have {len(due_today)} task(s) due today."
-                await NotificationService.notify(user_id, "task_due", title, message)
-                await EmailService.send_for_notification(user_id, "task_due", title, message, trigger="scheduled")
+        acquired = await FirestoreDB.acquire_lease(
+            lease_name, holder, settings.SCHEDULER_JOB_DEADLINE_SECONDS + JOB_LEASE_MARGIN_SECONDS
+        )
     except Exception as e:
-        print(f"Task-due digest error: {e}")
+        acquired = None
+        record.update(status="error", errors=1, error=f"could not take job lease: {e}")
+        print(f"{job} error: {record['error']}")
+    if acquired is False:
+        record["status"] = "skipped"
+        print(f"{lease_name}: previous run still in progress - skipping")
+    elif acquired:
+        try:
+            stats = await asyncio.wait_for(run(**kwargs), timeout=settings.SCHEDULER_JOB_DEADLINE_SECONDS)
+            record["stats"] = stats
+            record["users_processed"] = stats.get("processed", stats.get("users"))
+            record["errors"] = stats.get("errors", 0)
+        except asyncio.TimeoutError:
+            record.update(status="timeout", errors=1,
+                          error=f"exceeded {settings.SCHEDULER_JOB_DEADLINE_SECONDS}s deadline")
+            print(f"{job} error: {record['error']}")
+        except Exception as e:
+            record.update(status="error", errors=1, error=str(e))
+            print(f"{job} error: {e}")
+        finally:
+            try:
+                await FirestoreDB.release_lease(lease_name, holder)
+            except Exception as e:
+                print(f"Job lease release error for {lease_name}: {e}")
 
-async def run_weekly_summary() -> None:
-    """Weekly on Monday 09:00: send an engagement summary email."""
+    record["duration_seconds"] = round(time.monotonic() - started, 3)
     try:
-        profiles = await FirestoreDB.get_all_profiles()
-        for profile in profiles:
-            user_id = profile.get("id")
-            subject = "Your week in the garden"
-            html = (
-                f"<p>Level {profile.get('level', 1)} · {profile.get('total_score', 0)} points · "
-                f"{profile.get('streak_days', 0)}-day streak.</p>"
-                f"<p>{profile.get('tasks_completed', 0)} tasks completed all-time. Keep it up!</p>"
-            )
-            await EmailService.send_digest(user_id, subject, html)
+        await FirestoreDB.record_job_run(record)
     except Exception as e:
-        print(f"Weekly summary error: {e}")
+        print(f"Job run record error for {job}: {e}")
+    return record
 
 def start_scheduler() -> AsyncIOScheduler:
     """
@@ -84,17 +465,27 @@ def start_scheduler() -> AsyncIOScheduler:
     continuously-running process (e.g. Render, kept warm by the keep-alive CI ping -
     see docs/02-Tech-Stack-Architecture.md §2). Serverless hosts (Vercel) freeze/kill
     the process between requests, so main.py skips calling this there and the same
-    three jobs run instead via /api/cron/* (api/routes/cron.py), triggered by an
-    external scheduler (GitHub Actions cron).
+    jobs run instead via /api/cron/* (api/routes/cron.py), triggered by an
+    external scheduler (GitHub Actions cron). With several workers or instances, only
+    the scheduler lease holder calls this (services/scheduler_lease.py).
     """
     global _scheduler
     if _scheduler is not None:
         return _scheduler
 
     scheduler = AsyncIOScheduler()
-    scheduler.add_job(run_streak_risk_sweep, CronTrigger(minute=0), id="streak_risk_sweep", replace_existing=True)
-    scheduler.add_job(run_task_due_digest, CronTrigger(hour=8, minute=0), id="task_due_digest", replace_existing=True)
-    scheduler.add_job(run_weekly_summary, CronTrigger(day_of_week="mon", hour=9, minute=0), id="weekly_summary", replace_existing=True)
+    jobs = [
+        ("streak_risk_sweep", run_streak_risk_sweep, CronTrigger(minute=0)),
+        ("task_due_digest", run_task_due_digest, CronTrigger(minute=0)),
+        ("weekly_summary", run_weekly_summary, CronTrigger(minute=0)),
+        ("period_leaderboard_rollup", run_period_leaderboard_rollup, CronTrigger(minute=5)),
+        ("outbox_drain", run_outbox_drain, IntervalTrigger(minutes=1)),
+    ]
+    for job_id, run, trigger in jobs:
+        # One instance at a time, and a backlog of missed fire times (e.g. after the
+        # event loop was blocked) collapses into a single run instead of a burst.
+        scheduler.add_job(run_job, trigger, args=[job_id, run], id=job_id, replace_existing=True,
+                          max_instances=1, coalesce=True, misfire_grace_time=JOB_MISFIRE_GRACE_SECONDS)
     scheduler.start()
     _scheduler = scheduler
     return scheduler
@@ -0,0 +1,169 @@
+"""
+Backfill profiles.timezone on profiles created before it existed
+
+The task-due digest and weekly summary go out per local-time bucket, selected with a
+`timezone in [...]` query (FirestoreDB.stream_profiles_in_timezones). Firestore never
+matches a missing field, so a profile without `timezone` gets neither email until the
+web app syncs the browser's zone on their next visit - and the users who've stopped
+visiting are the ones the weekly summary is for. This sets DEFAULT_TIMEZONE ("UTC") on
+every profile that has no timezone, which keeps them in the buckets; the web app
+still replaces it with their real zone next time they sign in.
+
+Run it once when deploying the timezone-bucketed digest. Like migrate_task_dates.py it
+pages through the collection in document-id order through a parallel BulkWriter, and
+checkpoints after each page so it can be stopped and resumed. Each write is
+conditional on the profile being unchanged since it was read, so a timezone the
+browser syncs mid-run is never overwritten.
+
+Usage:
+    python backfill_profile_timezones.py --dry-run     # count profiles without a timezone
+    python backfill_profile_timezones.py               # backfill, resuming from the checkpoint
+    python backfill_profile_timezones.py --reset       # ignore the checkpoint, start over
+"""
+import argparse
+import json
+import os
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from api.db.firestore import DEFAULT_TIMEZONE, PROFILES_COLLECTION
+
+DEFAULT_CHECKPOINT_FILE = ".backfill_profile_timezones.checkpoint.json"
+DEFAULT_PAGE_SIZE = 500
+MAX_WRITE_ATTEMPTS = 5
+# gRPC status of a write whose last_update_time precondition no longer holds
+FAILED_PRECONDITION = 9
+
+def timezone_update(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The update for one profile: DEFAULT_TIMEZONE if it has no timezone, else nothing."""
+    return {} if data.get("timezone") else {"timezone": DEFAULT_TIMEZONE}
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"last_doc_id": None, "scanned": 0, "backfilled": 0, "changed": 0, "failed_ids": []}
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    # Write-then-rename so an interrupted run never leaves a half-written checkpoint.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def write_error_handler(checkpoint: Dict[str, Any]):
+    """
+    BulkWriter on_write_error callback. A failed precondition means the profile
+    changed after it was read (e.g. the browser synced its timezone) - counted as
+    changed, never retried. Anything else is retried up to MAX_WRITE_ATTEMPTS, then
+    recorded in failed_ids; re-run with --reset to pick those up.
+    """
+    def _on_error(failure, _writer) -> bool:
+        if failure.code == FAILED_PRECONDITION:
+            checkpoint["changed"] += 1
+            checkpoint["backfilled"] -= 1
+            return False
+        if failure.attempts < MAX_WRITE_ATTEMPTS:
+            return True  # retry
+        doc_id = failure.operation.reference.id
+        checkpoint["backfilled"] -= 1
+        checkpoint["failed_ids"].append(doc_id)
+        print(f"   Failed to backfill {doc_id}: {failure.message}")
+        return False
+    return _on_error
+
+def _get_client():
+    from firebase_admin import firestore
+    from api.core.auth import ensure_firebase_initialized
+    from api.core.config import settings
+
+    # Same lazy, env-var-based init the API uses
+    ensure_firebase_initialized()
+    return firestore.client(database_id=settings.FIRESTORE_DATABASE_ID)
+
+def backfill(dry_run: bool, checkpoint_path: str, page_size: int, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Page through profiles in document-id order, starting after the checkpoint's
+    last_doc_id, reading only the timezone field. Each page's writes are flushed
+    before the checkpoint advances past it.
+    """
+    from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions, SendMode
+
+    db = _get_client()
+    collection = db.collection(PROFILES_COLLECTION)
+    checkpoint = {"last_doc_id": None, "scanned": 0, "backfilled": 0, "changed": 0, "failed_ids": []}
+    bulk_writer = None
+    if not dry_run:
+        checkpoint = load_checkpoint(checkpoint_path)
+        if checkpoint["last_doc_id"]:
+            print(f"Resuming after {checkpoint['last_doc_id']} ({checkpoint['scanned']} already scanned)")
+        bulk_writer = db.bulk_writer(options=BulkWriterOptions(mode=SendMode.parallel))
+        bulk_writer.on_write_error(write_error_handler(checkpoint))
+
+    scanned_this_run = 0
+    try:
+        while limit is None or scanned_this_run < limit:
+            query = collection.select(["timezone"]).order_by("__name__").limit(page_size)
+            if checkpoint["last_doc_id"]:
+                query = query.start_after(collection.document(checkpoint["last_doc_id"]))
+
+            last_doc_id = None
+            for doc in query.stream():
+                last_doc_id = doc.id
+                scanned_this_run += 1
+                checkpoint["scanned"] += 1
+                updates = timezone_update(doc.to_dict() or {})
+                if updates:
+                    checkpoint["backfilled"] += 1
+                    if bulk_writer is not None:
+                        option = db.write_option(last_update_time=doc.update_time)
+                        bulk_writer.update(doc.reference, updates, option=option)
+
+            if last_doc_id is None:
+                break
+            checkpoint["last_doc_id"] = last_doc_id
+            if bulk_writer is not None:
+                bulk_writer.flush()
+                save_checkpoint(checkpoint_path, checkpoint)
+            print(f"   {checkpoint['scanned']} scanned, {checkpoint['backfilled']} "
+                  f"{'to backfill' if dry_run else 'backfilled'}")
+    finally:
+        if bulk_writer is not None:
+            bulk_writer.close()
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Set timezone={DEFAULT_TIMEZONE} on profiles that have none")
+    parser.add_argument("--dry-run", action="store_true", help="only count profiles without a timezone; write nothing")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_FILE, help="resume-checkpoint file path")
+    parser.add_argument("--reset", action="store_true", help="discard any existing checkpoint and start from the beginning")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="profiles read per page")
+    parser.add_argument("--limit", type=int, default=None, help="stop after scanning roughly this many profiles")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    print("\n" + "=" * 70)
+    print("PROFILE TIMEZONE BACKFILL" + (" (DRY RUN)" if args.dry_run else ""))
+    print("=" * 70)
+
+    result = backfill(args.dry_run, args.checkpoint, args.page_size, args.limit)
+
+    print("\n" + "=" * 70)
+    print(f"Scanned:     {result['scanned']}")
+    print(f"{'To backfill' if args.dry_run else 'Backfilled'}: {result['backfilled']}")
+    if not args.dry_run:
+        print(f"Changed:     {result['changed']} (timezone set meanwhile - left as-is)")
+        print(f"Failed:      {len(result['failed_ids'])} (re-run with --reset to retry)")
+        print(f"Checkpoint:  {args.checkpoint}")
+    print("=" * 70 + "\n")
+
+if __name__ == "__main__":
+    main()
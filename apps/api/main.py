@@ -5,13 +5,14 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from api.routes import plants, dashboard, chat, tasks, images, mcp, notifications, leaderboard, storage, auth, recommendations, cron
 from api.core.config import settings
-from api.core.auth import verify_firebase_token
-from api.services.scheduler_service import start_scheduler, stop_scheduler
+from api.core.auth import verify_firebase_token, signing_keys
+from api.services.scheduler_lease import get_scheduler_leader
+from api.services.notification_bus import get_notification_bus
 
 # Vercel sets this in every function invocation. On a serverless host the process is
-# frozen/killed between requests, so an in-process APScheduler (start_scheduler below)
-# can't fire reliably - those three jobs run instead via /api/cron/*, called by an
-# external scheduler. See scheduler_service.start_scheduler's docstring.
+# frozen/killed between requests, so an in-process APScheduler (started below, via the
+# scheduler lease) can't fire reliably - those jobs run instead via /api/cron/*, called
+# by an external scheduler. See scheduler_service.start_scheduler's docstring.
 IS_SERVERLESS = bool(os.getenv("VERCEL"))
 
 # Initialize FastAPI
@@ -57,15 +58,22 @@ async def startup_event():
     print("Starting Flourish API...")
     print("Firebase Firestore ready!")
     print("No database setup needed - using Firebase!")
+    # Token verification runs against local signing keys - prefetch them now and keep
+    # them refreshed in the background, so no request waits on Google's cert endpoint.
+    await signing_keys.start()
+    await get_notification_bus().start()
     if IS_SERVERLESS:
         print("Running on Vercel - skipping in-process scheduler, using /api/cron/* instead")
     else:
-        start_scheduler()
+        # Runs the scheduler only in whichever worker/instance holds the lease
+        await get_scheduler_leader().start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await signing_keys.stop()
+    await get_notification_bus().stop()
     if not IS_SERVERLESS:
-        stop_scheduler()
+        await get_scheduler_leader().stop()
 
 # Include routers with authentication dependency
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])  # No auth required for profile creation
@@ -0,0 +1,184 @@
+"""
+Continue legacy stored recurring schedules as care rules
+
+Before care_rules, PlantService.create_projected_schedule stored a care_tasks document
+per upcoming date - ~30 days of watering, ~90 of fertilizing - with `recurring: true`,
+and nothing scheduled past them. Those plants still have no care rule, so once their
+stored dates run out they get no more tasks. This gives each such plant and task type
+the rule it would have had, anchored one interval after its last stored date: the
+stored tasks stay as they are (with whatever the user did to them), and the rule's
+occurrences pick up where they end - nothing is listed twice.
+
+Rules are created, never overwritten - a plant that already has a rule for that type
+(rescheduled since, or migrated by an earlier run) keeps it - so it's safe to re-run.
+Tasks of deleted plants are ignored. Run it once when deploying care rules, after
+migrate_task_dates.py.
+
+Usage:
+    python migrate_recurring_tasks.py --dry-run     # count the rules it would create
+    python migrate_recurring_tasks.py               # create them
+"""
+import argparse
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from api.db.firestore import CARE_RULES_COLLECTION, PLANTS_COLLECTION, TASKS_COLLECTION, to_timestamp
+
+DEFAULT_PAGE_SIZE = 500
+MAX_WRITE_ATTEMPTS = 5
+# gRPC status of a create whose document already exists
+ALREADY_EXISTS = 6
+# The interval and priority create_projected_schedule gives each task type's rule
+DEFAULT_INTERVAL_DAYS = {"watering": 7, "fertilizing": 30}
+RULE_PRIORITY = {"watering": "medium", "fertilizing": "low"}
+# Legacy task fields copied onto the rule as-is
+LEGACY_RULE_FIELDS = ("user_id", "plant_id", "task_type", "title", "description", "points")
+
+def legacy_schedule_key(data: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """(plant_id, task_type) for a legacy stored recurring task, None for any other task."""
+    if not data.get("recurring") or data.get("rule_id") or not data.get("plant_id"):
+        return None
+    if data.get("task_type") not in DEFAULT_INTERVAL_DAYS:
+        return None
+    try:
+        if to_timestamp(data.get("due_date")) is None:
+            return None
+    except (TypeError, ValueError):
+        return None
+    return data["plant_id"], data["task_type"]
+
+def later_task(current: Optional[Dict[str, Any]], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Whichever of two tasks of one schedule is due last."""
+    if current is None or to_timestamp(data["due_date"]) > to_timestamp(current["due_date"]):
+        return data
+    return current
+
+def rule_from_legacy(last_task: Dict[str, Any]) -> Dict[str, Any]:
+    """The care rule continuing a legacy schedule from its last stored task."""
+    task_type = last_task["task_type"]
+    interval_days = max(1, int(last_task.get("recurring_days") or DEFAULT_INTERVAL_DAYS[task_type]))
+    rule = {field: last_task.get(field) for field in LEGACY_RULE_FIELDS}
+    rule.update({
+        "id": f"{last_task['plant_id']}_{task_type}",
+        "priority": RULE_PRIORITY[task_type],
+        "interval_days": interval_days,
+        "anchor": to_timestamp(last_task["due_date"]) + timedelta(days=interval_days),
+        "exceptions": [],
+    })
+    return rule
+
+def write_error_handler(counts: Dict[str, int]):
+    """
+    BulkWriter on_write_error callback. A rule that already exists is left alone and
+    counted as existing, never retried. Anything else is retried up to
+    MAX_WRITE_ATTEMPTS, then counted as failed; re-running picks those up.
+    """
+    def _on_error(failure, _writer) -> bool:
+        if failure.code == ALREADY_EXISTS:
+            counts["created"] -= 1
+            counts["existing"] += 1
+            return False
+        if failure.attempts < MAX_WRITE_ATTEMPTS:
+            return True  # retry
+        counts["created"] -= 1
+        counts["failed"] += 1
+        print(f"   Failed to create {failure.operation.reference.id}: {failure.message}")
+        return False
+    return _on_error
+
+def _get_client():
+    from firebase_admin import firestore
+    from api.core.auth import ensure_firebase_initialized
+    from api.core.config import settings
+
+    # Same lazy, env-var-based init the API uses
+    ensure_firebase_initialized()
+    return firestore.client(database_id=settings.FIRESTORE_DATABASE_ID)
+
+def migrate(dry_run: bool, page_size: int) -> Dict[str, int]:
+    """
+    Scan care_tasks page by page for the last stored task of each legacy schedule,
+    then create a rule for each whose plant still exists.
+    """
+    from firebase_admin import firestore
+    from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions, SendMode
+
+    db = _get_client()
+    tasks = db.collection(TASKS_COLLECTION)
+    fields = ["recurring", "rule_id", "due_date", "recurring_days", *LEGACY_RULE_FIELDS]
+    counts = {"scanned": 0, "schedules": 0, "created": 0, "existing": 0, "orphaned": 0, "failed": 0}
+    last_tasks: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    last_doc = None
+    while True:
+        query = tasks.select(fields).order_by("__name__").limit(page_size)
+        if last_doc is not None:
+            query = query.start_after(last_doc)
+        last_doc = None
+        for doc in query.stream():
+            last_doc = doc
+            counts["scanned"] += 1
+            data = doc.to_dict() or {}
+            key = legacy_schedule_key(data)
+            if key is not None:
+                last_tasks[key] = later_task(last_tasks.get(key), data)
+        if last_doc is None:
+            break
+        print(f"   {counts['scanned']} tasks scanned, {len(last_tasks)} legacy schedules found")
+    counts["schedules"] = len(last_tasks)
+
+    plants = db.collection(PLANTS_COLLECTION)
+    plant_ids = sorted({plant_id for plant_id, _ in last_tasks})
+    existing_plants = set()
+    for start in range(0, len(plant_ids), page_size):
+        refs = [plants.document(plant_id) for plant_id in plant_ids[start:start + page_size]]
+        existing_plants.update(doc.id for doc in db.get_all(refs, field_paths=["user_id"]) if doc.exists)
+
+    bulk_writer = None
+    if not dry_run:
+        bulk_writer = db.bulk_writer(options=BulkWriterOptions(mode=SendMode.parallel))
+        bulk_writer.on_write_error(write_error_handler(counts))
+    try:
+        rules = db.collection(CARE_RULES_COLLECTION)
+        for (plant_id, _), last_task in sorted(last_tasks.items()):
+            if plant_id not in existing_plants:
+                counts["orphaned"] += 1
+                continue
+            rule = rule_from_legacy(last_task)
+            counts["created"] += 1
+            if bulk_writer is not None:
+                bulk_writer.create(rules.document(rule["id"]), {**rule, "created_at": firestore.SERVER_TIMESTAMP})
+    finally:
+        if bulk_writer is not None:
+            bulk_writer.close()
+
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Create care rules continuing legacy stored recurring schedules")
+    parser.add_argument("--dry-run", action="store_true", help="only count the rules to create; write nothing")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="documents read per page")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("RECURRING TASKS -> CARE RULES MIGRATION" + (" (DRY RUN)" if args.dry_run else ""))
+    print("=" * 70)
+
+    result = migrate(args.dry_run, args.page_size)
+
+    print("\n" + "=" * 70)
+    print(f"Scanned:     {result['scanned']} tasks, {result['schedules']} legacy schedules")
+    print(f"{'To create' if args.dry_run else 'Created'}:   {result['created']} rules")
+    print(f"Orphaned:    {result['orphaned']} (plant deleted - skipped)")
+    if not args.dry_run:
+        print(f"Existing:    {result['existing']} (plant already has a rule - left as-is)")
+        print(f"Failed:      {result['failed']} (re-run to retry)")
+    print("=" * 70 + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Migrate legacy care_tasks date fields to native Firestore Timestamps
+
+Older care_tasks documents store `due_date` / `completed_at` as ISO strings (written
+by PlantService.create_projected_schedule, snooze_task and reschedule_task before
+FirestoreDB started coercing them). FirestoreDB.get_user_tasks_in_range filters on
+Timestamps server-side, so those documents are invisible to /tasks/today and the
+dashboard until converted. This streams the whole collection page by page and
+rewrites just those two fields through a parallel BulkWriter - no downtime window
+needed, since the API already reads and writes both shapes. Each write is
+conditional on the task being unchanged since it was read, so a due date a user
+snoozes or reschedules mid-run is never overwritten with the stale converted one.
+
+Naive legacy strings are interpreted in this host's local time (see to_timestamp in
+api/db/firestore.py) - run it with TZ set to the API server's zone, e.g. `TZ=UTC`.
+
+Usage:
+    python migrate_task_dates.py --dry-run     # count documents that need converting
+    python migrate_task_dates.py               # migrate, resuming from the checkpoint
+                                               # (and retrying any writes that failed)
+    python migrate_task_dates.py --reset       # ignore the checkpoint, start over
+"""
+import argparse
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from api.db.firestore import TASKS_COLLECTION, TASK_TIMESTAMP_FIELDS, to_timestamp
+
+DEFAULT_CHECKPOINT_FILE = ".migrate_task_dates.checkpoint.json"
+DEFAULT_PAGE_SIZE = 500
+MAX_WRITE_ATTEMPTS = 5
+# gRPC status of a write whose last_update_time precondition no longer holds
+FAILED_PRECONDITION = 9
+
+def convert_task_dates(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    Timestamp updates for one care_tasks document's legacy string date fields, plus
+    the number of fields that couldn't be parsed (left untouched). Fields that are
+    already Timestamps - or missing/null - produce no update.
+    """
+    updates = {}
+    unparseable = 0
+    for field in TASK_TIMESTAMP_FIELDS:
+        value = data.get(field)
+        if not isinstance(value, str) or not value:
+            continue
+        try:
+            updates[field] = to_timestamp(value)
+        except ValueError:
+            unparseable += 1
+    return updates, unparseable
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"last_doc_id": None, "scanned": 0, "migrated": 0, "unparseable": 0, "changed": 0, "failed_ids": []}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    checkpoint.setdefault("changed", 0)
+    checkpoint.setdefault("failed_ids", [])
+    return checkpoint
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    # Write-then-rename so an interrupted run never leaves a half-written checkpoint.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def _get_client():
+    from firebase_admin import firestore
+    from api.core.auth import ensure_firebase_initialized
+    from api.core.config import settings
+
+    # Same lazy, env-var-based init the API uses
+    ensure_firebase_initialized()
+    return firestore.client(database_id=settings.FIRESTORE_DATABASE_ID)
+
+def write_error_handler(checkpoint: Dict[str, Any]):
+    """
+    BulkWriter on_write_error callback. A failed precondition means the task changed
+    after it was read (and was written as a Timestamp then) - counted as changed,
+    never retried. Anything else is retried up to MAX_WRITE_ATTEMPTS, then recorded
+    in the checkpoint's failed_ids, to be retried next run.
+    """
+    def _on_error(failure, _writer) -> bool:
+        if failure.code == FAILED_PRECONDITION:
+            checkpoint["changed"] += 1
+            checkpoint["migrated"] -= 1
+            return False
+        if failure.attempts < MAX_WRITE_ATTEMPTS:
+            return True  # retry
+        doc_id = failure.operation.reference.id
+        checkpoint["migrated"] -= 1
+        checkpoint["failed_ids"].append(doc_id)
+        print(f"   Failed to migrate {doc_id}: {failure.message}")
+        return False
+    return _on_error
+
+def _new_bulk_writer(db, checkpoint: Dict[str, Any]):
+    from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions, SendMode
+
+    bulk_writer = db.bulk_writer(options=BulkWriterOptions(mode=SendMode.parallel))
+    bulk_writer.on_write_error(write_error_handler(checkpoint))
+    return bulk_writer
+
+def _update_if_unchanged(db, bulk_writer, doc, updates: Dict[str, Any]) -> None:
+    bulk_writer.update(doc.reference, updates, option=db.write_option(last_update_time=doc.update_time))
+
+def _retry_failed(db, bulk_writer, checkpoint: Dict[str, Any], checkpoint_path: str) -> None:
+    """Re-attempt the documents earlier runs gave up on, before scanning any further."""
+    failed_ids, checkpoint["failed_ids"] = checkpoint["failed_ids"], []
+    if not failed_ids:
+        return
+    print(f"Retrying {len(failed_ids)} document(s) that failed previously")
+    collection = db.collection(TASKS_COLLECTION)
+    for doc in db.get_all([collection.document(doc_id) for doc_id in failed_ids]):
+        if doc.exists:
+            updates, _ = convert_task_dates(doc.to_dict() or {})
+            if updates:
+                checkpoint["migrated"] += 1
+                _update_if_unchanged(db, bulk_writer, doc, updates)
+    bulk_writer.flush()  # anything failing again is back in failed_ids
+    save_checkpoint(checkpoint_path, checkpoint)
+
+def migrate(dry_run: bool, checkpoint_path: str, page_size: int, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Page through care_tasks in document-id order, starting after the checkpoint's
+    last_doc_id. Each page's writes are flushed before the checkpoint advances past
+    it, so a crash or Ctrl-C resumes without skipping anything - at worst a page is
+    re-scanned, and already-converted documents produce no update on the second pass.
+    Writes that still fail after MAX_WRITE_ATTEMPTS are kept in the checkpoint's
+    failed_ids and retried at the start of the next run.
+    """
+    db = _get_client()
+    collection = db.collection(TASKS_COLLECTION)
+    checkpoint = {"last_doc_id": None, "scanned": 0, "migrated": 0, "unparseable": 0, "changed": 0, "failed_ids": []}
+    if not dry_run:
+        checkpoint = load_checkpoint(checkpoint_path)
+        if checkpoint["last_doc_id"]:
+            print(f"Resuming after {checkpoint['last_doc_id']} ({checkpoint['scanned']} already scanned)")
+    bulk_writer = None if dry_run else _new_bulk_writer(db, checkpoint)
+    if bulk_writer is not None:
+        _retry_failed(db, bulk_writer, checkpoint, checkpoint_path)
+
+    scanned_this_run = 0
+    try:
+        while limit is None or scanned_this_run < limit:
+            query = collection.order_by("__name__").limit(page_size)
+            if checkpoint["last_doc_id"]:
+                query = query.start_after(collection.document(checkpoint["last_doc_id"]))
+
+            last_doc_id = None
+            for doc in query.stream():
+                last_doc_id = doc.id
+                scanned_this_run += 1
+                checkpoint["scanned"] += 1
+                updates, unparseable = convert_task_dates(doc.to_dict() or {})
+                checkpoint["unparseable"] += unparseable
+                if updates:
+                    checkpoint["migrated"] += 1
+                    if bulk_writer is not None:
+                        _update_if_unchanged(db, bulk_writer, doc, updates)
+
+            if last_doc_id is None:
+                break
+            checkpoint["last_doc_id"] = last_doc_id
+            if bulk_writer is not None:
+                bulk_writer.flush()
+                save_checkpoint(checkpoint_path, checkpoint)
+            print(f"   {checkpoint['scanned']} scanned, {checkpoint['migrated']} "
+                  f"{'to migrate' if dry_run else 'migrated'}")
+    finally:
+        if bulk_writer is not None:
+            bulk_writer.close()
+            save_checkpoint(checkpoint_path, checkpoint)  # keep failures from a partial last page
+
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert legacy ISO-string care_tasks dates to Firestore Timestamps")
+    parser.add_argument("--dry-run", action="store_true", help="only count documents that need converting; write nothing")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_FILE, help="resume-checkpoint file path")
+    parser.add_argument("--reset", action="store_true", help="discard any existing checkpoint and start from the beginning")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="documents read per page")
+    parser.add_argument("--limit", type=int, default=None, help="stop after scanning roughly this many documents")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    print("\n" + "=" * 70)
+    print("CARE_TASKS DATE MIGRATION" + (" (DRY RUN)" if args.dry_run else ""))
+    print("=" * 70)
+
+    result = migrate(args.dry_run, args.checkpoint, args.page_size, args.limit)
+
+    print("\n" + "=" * 70)
+    print(f"Scanned:     {result['scanned']}")
+    print(f"{'To migrate' if args.dry_run else 'Migrated'}:  {result['migrated']}")
+    print(f"Unparseable: {result['unparseable']} field(s) left as-is")
+    if not args.dry_run:
+        print(f"Changed:     {result['changed']} (task edited meanwhile - left as-is)")
+        print(f"Failed:      {len(result['failed_ids'])} (retried on the next run)")
+        print(f"Checkpoint:  {args.checkpoint}")
+    print("=" * 70 + "\n")
+
+if __name__ == "__main__":
+    main()
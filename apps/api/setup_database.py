@@ -48,6 +48,13 @@ def setup_firestore_collections():
                 "completed", "completed_at", "points", "priority", "created_at"
             ]
         },
+        "care_rules": {
+            "description": "Recurring care, one rule per plant and task type (occurrences are expanded on read)",
+            "fields": [
+                "user_id", "plant_id", "task_type", "title", "description",
+                "priority", "points", "interval_days", "anchor", "exceptions", "created_at"
+            ]
+        },
         "notifications": {
             "description": "User notifications",
             "fields": [
@@ -146,6 +153,13 @@ service cloud.firestore {
       allow update, delete: if isAuthenticated() && resource.data.user_id == request.auth.uid;
     }
 
+    // Care Rules - users can only access their own recurring care rules
+    match /care_rules/{ruleId} {
+      allow read: if isAuthenticated() && resource.data.user_id == request.auth.uid;
+      allow create: if isAuthenticated() && request.resource.data.user_id == request.auth.uid;
+      allow update, delete: if isAuthenticated() && resource.data.user_id == request.auth.uid;
+    }
+
     // Notifications - users can only access their own notifications
     match /notifications/{notificationId} {
       allow read: if isAuthenticated() && resource.data.user_id == request.auth.uid;
@@ -179,12 +193,25 @@ def print_indexes():
 
     print("\n2. Collection: care_tasks")
     print("   - user_id (Ascending), due_date (Ascending)")
-    print("   - Used for: User's tasks sorted by due date")
+    print("   - user_id (Ascending), completed (Ascending), due_date (Ascending)")
+    print("   - Used for: /tasks/today and dashboard due_date range queries, and the")
+    print("     task-due digest's per-page `user_id in` queries")
+    print("   - Declared in firestore.indexes.json: firebase deploy --only firestore:indexes")
 
     print("\n3. Collection: notifications")
     print("   - user_id (Ascending), created_at (Descending)")
     print("   - Used for: User's notifications sorted by date")
 
+    print("\n4. Collection: outbox")
+    print("   - status (Ascending), next_attempt_at (Ascending)")
+    print("   - Used for: OutboxService.drain picking up due side effects")
+    print("   - Declared in firestore.indexes.json: firebase deploy --only firestore:indexes")
+
+    print("\n5. Collection: job_runs")
+    print("   - job (Ascending), started_at (Descending)")
+    print("   - Used for: GET /api/cron/runs?job=... (recent runs of one scheduled job)")
+    print("   - Declared in firestore.indexes.json: firebase deploy --only firestore:indexes")
+
     print("\n" + "=" * 70)
 
 def verify_connection():
@@ -35,3 +35,25 @@ def test_root_endpoint():
     data = response.json()
     assert "message" in data
     assert data["version"] == "1.0.0"
+
+
+def test_cron_sweep_returns_resume_cursor():
+    """A sharded cron sweep call reports progress the external scheduler can loop on"""
+    from unittest.mock import AsyncMock
+    from api.core.config import settings
+    stats = {"job": "weekly_summary", "processed": 200, "remaining": 350, "next_cursor": "user-200"}
+    with patch.object(settings, "CRON_SECRET", "s3cret"), \
+         patch("api.routes.cron.run_weekly_summary", AsyncMock(return_value=stats)) as run, \
+         patch("api.services.scheduler_service.FirestoreDB.acquire_lease", AsyncMock(return_value=True)), \
+         patch("api.services.scheduler_service.FirestoreDB.release_lease", AsyncMock()), \
+         patch("api.services.scheduler_service.FirestoreDB.record_job_run", AsyncMock()):
+        response = client.post("/api/cron/weekly-summary?shard=1&of=4",
+                               headers={"Authorization": "Bearer s3cret"})
+        bad_shard = client.post("/api/cron/weekly-summary?shard=4&of=4",
+                                headers={"Authorization": "Bearer s3cret"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["processed"], data["remaining"], data["next_cursor"]) == (200, 350, "user-200")
+    assert run.await_args.kwargs == {"shard": 1, "of": 4, "cursor": None, "limit": settings.CRON_SWEEP_BATCH_SIZE}
+    assert bad_shard.status_code == 400
@@ -4,6 +4,8 @@ normalization that makes it robust to loaders that don't parse .env quoting the
 pydantic-settings/python-dotenv does (e.g. `docker run --env-file`, which passes
 values through verbatim: no surrounding-quote stripping, no `\n` escape expansion).
 """
+import pytest
+from unittest.mock import AsyncMock, MagicMock
 from api.core.auth import _clean_env_value, _normalize_private_key, build_service_account_dict
 
 
@@ -56,3 +58,141 @@ def test_build_service_account_dict_shape(monkeypatch):
     assert result["project_id"] == "test-project"
     assert "\n" in result["private_key"]
     assert result["client_email"] == "test@test-project.iam.gserviceaccount.com"
+
+
+class TestVerifiedTokenCache:
+    def _cache(self, max_entries=10):
+        from api.core.auth import VerifiedTokenCache
+        return VerifiedTokenCache(max_entries)
+
+    def test_hit_returns_cached_claims(self):
+        import time
+        cache = self._cache()
+        cache.put("tok", {"uid": "u1", "exp": time.time() + 60})
+        assert cache.get("tok")["uid"] == "u1"
+        assert "tok" not in cache._entries
+
+    def test_expired_token_is_evicted(self):
+        import time
+        cache = self._cache()
+        cache.put("tok", {"uid": "u1", "exp": time.time() - 1})
+        assert cache.get("tok") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_is_evicted_first(self):
+        import time
+        cache = self._cache(max_entries=2)
+        exp = time.time() + 60
+        cache.put("a", {"uid": "a", "exp": exp})
+        cache.put("b", {"uid": "b", "exp": exp})
+        cache.get("a")
+        cache.put("c", {"uid": "c", "exp": exp})
+        assert cache.get("b") is None
+        assert cache.get("a") and cache.get("c")
+
+
+async def test_verify_firebase_token_verifies_once(monkeypatch):
+    import time
+    from unittest.mock import MagicMock
+    from starlette.datastructures import State
+    from fastapi.security import HTTPAuthorizationCredentials
+    from api.core import auth as core_auth
+
+    verify = AsyncMock(return_value={"uid": "u1", "exp": time.time() + 60})
+    monkeypatch.setattr(core_auth, "_verify_id_token_locally", verify)
+    monkeypatch.setattr(core_auth, "verified_tokens", core_auth.VerifiedTokenCache(10))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="tok-1")
+
+    first_request, second_request = MagicMock(state=State()), MagicMock(state=State())
+    assert await core_auth.verify_firebase_token(first_request, credentials) == "u1"
+    assert await core_auth.verify_firebase_token(first_request, credentials) == "u1"
+    assert await core_auth.verify_firebase_token(second_request, credentials) == "u1"
+    verify.assert_awaited_once_with("tok-1")
+
+
+def _signed_token_and_certs(claims):
+    """An RS256 ID token signed by a throwaway key, plus the cert set that verifies it."""
+    import datetime
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    from google.auth import crypt, jwt
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+            .public_key(key.public_key()).serial_number(1)
+            .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    token = jwt.encode(crypt.RSASigner.from_string(pem, key_id="kid-1"), claims).decode()
+    return token, {"kid-1": cert.public_bytes(serialization.Encoding.PEM).decode()}
+
+
+def _firebase_claims(project_id, **overrides):
+    import time
+    now = int(time.time())
+    claims = {"iss": f"https://securetoken.google.com/{project_id}", "aud": project_id,
+              "sub": "u1", "iat": now, "exp": now + 3600}
+    claims.update(overrides)
+    return claims
+
+
+class TestLocalVerification:
+    @staticmethod
+    def _use_keys(monkeypatch, certs):
+        from api.core import auth as core_auth
+        manager = core_auth.SigningKeyManager("https://example.com/certs")
+        manager._certs = certs
+        manager.fetch = AsyncMock()
+        monkeypatch.setattr(core_auth, "signing_keys", manager)
+        monkeypatch.setattr(core_auth, "ensure_firebase_initialized", lambda: None)
+        monkeypatch.setattr(core_auth.settings, "FIREBASE_PROJECT_ID", "test-project")
+        return manager
+
+    async def test_valid_token_verifies_without_fetching(self, monkeypatch):
+        from api.core.auth import _verify_id_token_locally
+        token, certs = _signed_token_and_certs(_firebase_claims("test-project"))
+        manager = self._use_keys(monkeypatch, certs)
+
+        claims = await _verify_id_token_locally(token)
+
+        assert claims["uid"] == "u1"
+        manager.fetch.assert_not_awaited()
+
+    async def test_wrong_issuer_is_rejected(self, monkeypatch):
+        from api.core.auth import _verify_id_token_locally
+        token, certs = _signed_token_and_certs(
+            _firebase_claims("test-project", iss="https://securetoken.google.com/other"))
+        self._use_keys(monkeypatch, certs)
+
+        with pytest.raises(ValueError):
+            await _verify_id_token_locally(token)
+
+    async def test_emulator_tokens_go_to_the_admin_sdk(self, monkeypatch):
+        from api.core import auth as core_auth
+        manager = self._use_keys(monkeypatch, {})
+        monkeypatch.setenv("FIREBASE_AUTH_EMULATOR_HOST", "localhost:9099")
+        verify = MagicMock(return_value={"uid": "u1"})
+        monkeypatch.setattr(core_auth.auth, "verify_id_token", verify)
+
+        assert await core_auth._verify_id_token_locally("unsigned-token") == {"uid": "u1"}
+        verify.assert_called_once_with("unsigned-token")
+        manager.fetch.assert_not_awaited()
+
+    async def test_unknown_kid_fetches_inline_at_most_once(self, monkeypatch):
+        manager = self._use_keys(monkeypatch, {"kid-1": "cert"})
+
+        await manager.certs_for("kid-2")
+        await manager.certs_for("kid-2")
+
+        manager.fetch.assert_awaited_once()
+
+
+def test_max_age_parsed_from_cache_control():
+    from api.core.auth import SigningKeyManager
+    assert SigningKeyManager._max_age("public, max-age=19826, must-revalidate") == 19826
+    assert SigningKeyManager._max_age("") == SigningKeyManager.DEFAULT_MAX_AGE_SECONDS
@@ -0,0 +1,42 @@
+"""
+Tests for the profiles.timezone backfill (backfill_profile_timezones.py) - the pure
+update and error-handling logic only; the Firestore BulkWriter itself isn't exercised.
+"""
+from unittest.mock import MagicMock
+from backfill_profile_timezones import (
+    FAILED_PRECONDITION, MAX_WRITE_ATTEMPTS, load_checkpoint, save_checkpoint, timezone_update, write_error_handler
+)
+
+
+def test_profile_without_timezone_gets_utc():
+    assert timezone_update({}) == {"timezone": "UTC"}
+    assert timezone_update({"timezone": None}) == {"timezone": "UTC"}
+
+
+def test_profile_with_timezone_is_left_alone():
+    assert timezone_update({"timezone": "Asia/Kolkata"}) == {}
+
+
+def test_profile_changed_since_read_is_not_retried():
+    checkpoint = {"backfilled": 1, "changed": 0, "failed_ids": []}
+    failure = MagicMock(code=FAILED_PRECONDITION, attempts=1)
+
+    assert write_error_handler(checkpoint)(failure, None) is False
+    assert checkpoint == {"backfilled": 0, "changed": 1, "failed_ids": []}
+
+
+def test_final_write_failure_is_recorded():
+    checkpoint = {"backfilled": 1, "changed": 0, "failed_ids": []}
+    failure = MagicMock(code=14, attempts=MAX_WRITE_ATTEMPTS, message="unavailable")
+    failure.operation.reference.id = "u1"
+
+    assert write_error_handler(checkpoint)(failure, None) is False
+    assert checkpoint["failed_ids"] == ["u1"]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    assert load_checkpoint(path)["last_doc_id"] is None
+
+    save_checkpoint(path, {"last_doc_id": "u9", "scanned": 10, "backfilled": 4, "changed": 0, "failed_ids": []})
+    assert load_checkpoint(path)["last_doc_id"] == "u9"
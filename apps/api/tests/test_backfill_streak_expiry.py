@@ -0,0 +1,34 @@
+"""
+Tests for the profiles.streak_expires_at backfill (backfill_streak_expiry.py) - the pure
+update and error-handling logic only; the Firestore BulkWriter itself isn't exercised.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from backfill_streak_expiry import FAILED_PRECONDITION, streak_expiry_update, write_error_handler
+
+NOW = datetime(2026, 3, 5, 12, 0, tzinfo=timezone.utc)
+
+
+def test_active_streak_gets_expiry_from_last_activity():
+    updates = streak_expiry_update({"streak_days": 3, "last_activity": "2026-03-05T08:00:00+00:00"}, NOW)
+    assert updates == {"streak_expires_at": datetime(2026, 3, 6, 8, 0, tzinfo=timezone.utc)}
+
+
+def test_lapsed_streak_is_left_alone():
+    last_activity = (NOW - timedelta(days=2)).isoformat()
+    assert streak_expiry_update({"streak_days": 3, "last_activity": last_activity}, NOW) == {}
+
+
+def test_profile_with_expiry_or_no_streak_is_left_alone():
+    assert streak_expiry_update({"streak_days": 3, "last_activity": NOW.isoformat(),
+                                 "streak_expires_at": NOW}, NOW) == {}
+    assert streak_expiry_update({"streak_days": 0, "last_activity": NOW.isoformat()}, NOW) == {}
+    assert streak_expiry_update({"streak_days": 3, "last_activity": "yesterday"}, NOW) == {}
+
+
+def test_profile_changed_since_read_is_not_retried():
+    checkpoint = {"backfilled": 1, "changed": 0, "failed_ids": []}
+    failure = MagicMock(code=FAILED_PRECONDITION, attempts=1)
+
+    assert write_error_handler(checkpoint)(failure, None) is False
+    assert checkpoint == {"backfilled": 0, "changed": 1, "failed_ids": []}
@@ -0,0 +1,363 @@
+"""
+Tests for FirestoreDB - the Firestore client is mocked via get_db, so these exercise
+the write/read shaping logic without a real database.
+"""
+import pytest
+from datetime import date, datetime, timezone
+from unittest.mock import patch, MagicMock, AsyncMock
+from firebase_admin import firestore
+from api.db.firestore import FirestoreDB, to_timestamp, day_bounds
+
+
+COMMIT_TIME = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _mock_db_with_batch(write_count: int):
+    batch = MagicMock()
+    batch.commit = AsyncMock(return_value=[MagicMock(update_time=COMMIT_TIME) for _ in range(write_count)])
+    db = MagicMock()
+    db.batch.return_value = batch
+    return db, batch
+
+
+class TestAwardPoints:
+    @pytest.mark.asyncio
+    async def test_increments_without_reading_profile(self):
+        from google.cloud.firestore_v1.types import document
+        db, batch = _mock_db_with_batch(2)
+        # Transform results arrive in field-path order: tasks_completed, total_score, updated_at
+        batch.commit.return_value[0].transform_results = [
+            document.Value(integer_value=8),
+            document.Value(integer_value=1240),
+            document.Value(timestamp_value={"seconds": 1}),
+        ]
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            result = await FirestoreDB.award_points("u1", 40, "2026-03-05T10:00:00")
+
+        db.collection.return_value.document.return_value.get.assert_not_called()
+        profile_updates = batch.update.call_args.args[1]
+        assert isinstance(profile_updates["total_score"], firestore.Increment)
+        assert isinstance(profile_updates["tasks_completed"], firestore.Increment)
+        bucket_data = batch.set.call_args.args[1]
+        assert isinstance(bucket_data["points"], firestore.Increment)
+        batch.commit.assert_awaited_once()
+        assert result == {"total_score": 1240, "tasks_completed": 8}
+
+    @pytest.mark.asyncio
+    async def test_award_already_applied_returns_none(self):
+        from google.api_core.exceptions import AlreadyExists
+        db, batch = _mock_db_with_batch(3)
+        batch.commit.side_effect = AlreadyExists("score_awards/e1")
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            assert await FirestoreDB.award_points("u1", 10, "2026-03-05T10:00:00", award_id="e1") is None
+
+        db.collection.assert_any_call("score_awards")
+        assert batch.create.call_args.args[1]["points"] == 10
+
+    @pytest.mark.asyncio
+    async def test_missing_profile_returns_none(self):
+        from google.api_core.exceptions import NotFound
+        db, batch = _mock_db_with_batch(2)
+        batch.commit.side_effect = NotFound("no profile")
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            assert await FirestoreDB.award_points("ghost", 10, "2026-03-05T10:00:00") is None
+
+
+class TestOutbox:
+    @pytest.mark.asyncio
+    async def test_task_update_and_effects_commit_together(self):
+        db, batch = _mock_db_with_batch(3)
+        effects = [{"kind": "award_points", "payload": {"user_id": "u1", "points": 10}},
+                   {"kind": "notify", "payload": {"user_id": "u1"}}]
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            entry_ids = await FirestoreDB.update_task_with_outbox("t1", {"completed": True}, effects)
+
+        batch.update.assert_called_once()
+        assert [c.args[1]["kind"] for c in batch.set.call_args_list] == ["award_points", "notify"]
+        assert all(c.args[1]["status"] == "pending" for c in batch.set.call_args_list)
+        batch.commit.assert_awaited_once()
+        assert len(set(entry_ids)) == 2
+
+
+class TestCareRules:
+    @pytest.mark.asyncio
+    async def test_write_occurrence_is_one_commit(self):
+        db, batch = _mock_db_with_batch(4)
+        task = {"id": "someone-elses-task", "due_date": "2026-03-08T09:00:00+00:00", "completed": True}
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            entry_ids = await FirestoreDB.write_occurrence(
+                "p1_watering@2026-03-08", "p1_watering", "2026-03-08", task, ["2026-02-22"], [{"kind": "notify", "payload": {}}]
+            )
+
+        # The task doc is keyed by the occurrence id, whatever id task_data carries
+        db.collection.return_value.document.assert_any_call("p1_watering@2026-03-08")
+        assert batch.set.call_args_list[0].args[1]["id"] == "p1_watering@2026-03-08"
+        assert batch.set.call_args_list[0].args[1]["due_date"] == to_timestamp("2026-03-08T09:00:00+00:00")
+        rule_updates = [c.args[1]["exceptions"] for c in batch.update.call_args_list]
+        assert isinstance(rule_updates[0], firestore.ArrayRemove)
+        assert isinstance(rule_updates[1], firestore.ArrayUnion)
+        assert batch.set.call_args_list[1].args[1]["kind"] == "notify"
+        batch.commit.assert_awaited_once()
+        assert len(entry_ids) == 1
+
+    @pytest.mark.asyncio
+    async def test_skipping_an_occurrence_writes_no_task(self):
+        db, batch = _mock_db_with_batch(1)
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            await FirestoreDB.write_occurrence("p1_watering@2026-03-08", "p1_watering", "2026-03-08", None, [], [])
+
+        batch.set.assert_not_called()
+        batch.update.assert_called_once()
+        batch.commit.assert_awaited_once()
+
+
+class TestCreateWithoutReadBack:
+    @pytest.mark.asyncio
+    async def test_create_notification_resolves_sentinel_from_write_result(self):
+        from google.cloud.firestore_v1.types import document
+        db, batch = _mock_db_with_batch(2)
+        batch.commit.return_value[1].transform_results = [document.Value(integer_value=4)]
+        db.collection.return_value.document.return_value.get = AsyncMock()
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            notification, unread_count = await FirestoreDB.create_notification({"user_id": "u1", "title": "Hi", "read": False})
+
+        db.collection.return_value.document.return_value.get.assert_not_called()
+        assert notification["created_at"] == COMMIT_TIME
+        assert notification["id"]
+        assert notification["title"] == "Hi"
+        assert isinstance(batch.update.call_args.args[1]["unread_count"], firestore.Increment)
+        assert unread_count == 4
+
+    @pytest.mark.asyncio
+    async def test_create_notification_without_profile_still_writes(self):
+        from google.api_core.exceptions import NotFound
+        db, batch = _mock_db_with_batch(2)
+        batch.commit.side_effect = NotFound("no profile")
+        doc_ref = db.collection.return_value.document.return_value
+        doc_ref.set = AsyncMock(return_value=MagicMock(update_time=COMMIT_TIME))
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            notification, unread_count = await FirestoreDB.create_notification({"user_id": "u1", "title": "Hi", "read": False})
+
+        doc_ref.set.assert_awaited_once()
+        assert unread_count is None
+        assert notification["created_at"] == COMMIT_TIME
+
+    @pytest.mark.asyncio
+    async def test_create_notification_with_existing_id_is_not_counted_twice(self):
+        from google.api_core.exceptions import AlreadyExists
+        db, batch = _mock_db_with_batch(2)
+        batch.commit.side_effect = AlreadyExists("outbox-e1")
+        doc_ref = db.collection.return_value.document.return_value
+        doc_ref.get = AsyncMock(return_value=MagicMock(to_dict=MagicMock(return_value={"title": "Hi"})))
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            notification, unread_count = await FirestoreDB.create_notification(
+                {"user_id": "u1", "title": "Hi", "read": False}, notif_id="outbox-e1"
+            )
+
+        batch.create.assert_called_once()
+        assert notification == {"title": "Hi", "id": "outbox-e1"}
+        assert unread_count is None
+
+    def test_nested_sentinels_are_resolved(self):
+        data = {"a": firestore.SERVER_TIMESTAMP, "nested": {"b": firestore.SERVER_TIMESTAMP, "c": 1}}
+        resolved = FirestoreDB._resolve_server_timestamps(data, COMMIT_TIME)
+        assert resolved == {"a": COMMIT_TIME, "nested": {"b": COMMIT_TIME, "c": 1}}
+
+    @pytest.mark.asyncio
+    async def test_enqueue_email_writes_mail_and_log_in_one_commit(self):
+        db, batch = _mock_db_with_batch(2)
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            log = await FirestoreDB.enqueue_email("u1", "a@b.com", "Subj", "<p>x</p>", "achievement", "event")
+
+        assert batch.set.call_count == 2
+        batch.commit.assert_awaited_once()
+        assert log["sent_at"] == COMMIT_TIME
+        assert log["mail_ref"]
+
+
+class _AsyncDocs:
+    """Stand-in for an AsyncQuery.stream() result."""
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class TestTaskTimestamps:
+    def test_to_timestamp_parses_iso_z_string(self):
+        assert to_timestamp("2026-01-01T12:00:00Z") == COMMIT_TIME
+
+    def test_to_timestamp_makes_naive_values_aware(self):
+        assert to_timestamp(datetime(2026, 1, 1, 12, 0)).tzinfo is not None
+        assert to_timestamp(date(2026, 1, 1)).tzinfo is not None
+
+    def test_to_timestamp_rejects_garbage(self):
+        with pytest.raises(ValueError):
+            to_timestamp("next tuesday")
+
+    def test_day_bounds_span_one_day(self):
+        start, end = day_bounds(date(2026, 3, 10))
+        assert start.date() == date(2026, 3, 10)
+        assert end.date() == date(2026, 3, 11)
+
+    @pytest.mark.asyncio
+    async def test_create_task_stores_due_date_as_timestamp(self):
+        db = MagicMock()
+        doc_ref = db.collection.return_value.document.return_value
+        doc_ref.set = AsyncMock(return_value=MagicMock(update_time=COMMIT_TIME))
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            task = await FirestoreDB.create_task({"title": "Water", "due_date": "2026-01-01T12:00:00Z"})
+
+        assert doc_ref.set.call_args.args[0]["due_date"] == COMMIT_TIME
+        assert task["due_date"] == COMMIT_TIME
+
+    @pytest.mark.asyncio
+    async def test_range_query_filters_server_side(self):
+        db = MagicMock()
+        query = MagicMock()
+        db.collection.return_value.where.return_value = query
+        query.where.return_value = query
+        doc = MagicMock(id="t1")
+        doc.to_dict.return_value = {"title": "Water"}
+        query.order_by.return_value.stream.return_value = _AsyncDocs([doc])
+        start, end = day_bounds(date(2026, 1, 1))
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            tasks = await FirestoreDB.get_user_tasks_in_range("u1", start, end, completed=False)
+
+        filters = [c.args for c in query.where.call_args_list]
+        assert ('completed', '==', False) in filters
+        assert ('due_date', '>=', start) in filters
+        assert ('due_date', '<', end) in filters
+        query.order_by.assert_called_once_with('due_date')
+        assert tasks == [{"title": "Water", "id": "t1"}]
+
+
+def _run_in_transaction(fn):
+    """Stand-in for firestore.async_transactional: call the function once, as-is."""
+    return fn
+
+
+def _mock_count_query(value: int):
+    query = MagicMock()
+    query.where.return_value = query
+    query.count.return_value.get = AsyncMock(return_value=[[MagicMock(value=value)]])
+    return query
+
+
+class TestCountAggregations:
+    @pytest.mark.asyncio
+    async def test_user_rank_is_one_aggregation_read(self):
+        db = MagicMock()
+        query = _mock_count_query(41)
+        db.collection.return_value.where.return_value = query
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            rank = await FirestoreDB.get_user_rank("u1", score=1200)
+
+        db.collection.return_value.where.assert_called_once_with('total_score', '>', 1200)
+        query.stream.assert_not_called()
+        assert rank == 42
+
+    @pytest.mark.asyncio
+    async def test_user_rank_without_profile_is_zero(self):
+        with patch.object(FirestoreDB, "get_profile", AsyncMock(return_value=None)):
+            assert await FirestoreDB.get_user_rank("ghost") == 0
+
+    @pytest.mark.asyncio
+    async def test_unread_count_uses_count_aggregation(self):
+        db = MagicMock()
+        query = _mock_count_query(7)
+        db.collection.return_value.where.return_value = query
+
+        with patch("api.db.firestore.get_db", return_value=db):
+            count = await FirestoreDB.count_unread_notifications("u1")
+
+        query.where.assert_called_once_with('read', '==', False)
+        query.stream.assert_not_called()
+        assert count == 7
+
+
+class TestUnreadCounter:
+    @staticmethod
+    def _db_with_profile(data):
+        db = MagicMock()
+        profile_ref = db.collection.return_value.document.return_value
+        profile_ref.get = AsyncMock(return_value=MagicMock(exists=True, to_dict=MagicMock(return_value=data)))
+        profile_ref.update = AsyncMock()
+        return db, profile_ref
+
+    @pytest.mark.asyncio
+    async def test_synced_counter_is_one_read(self):
+        db, profile_ref = self._db_with_profile({"unread_count": 3, "unread_count_synced": True})
+
+        with patch("api.db.firestore.get_db", return_value=db), \
+             patch.object(FirestoreDB, "count_unread_notifications", AsyncMock()) as count:
+            assert await FirestoreDB.get_unread_count("u1") == 3
+
+        count.assert_not_called()
+        profile_ref.update.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_legacy_profile_is_seeded_once(self):
+        db, profile_ref = self._db_with_profile({})
+        transaction = db.transaction.return_value
+
+        with patch("api.db.firestore.get_db", return_value=db), \
+             patch("api.db.firestore.firestore.async_transactional", _run_in_transaction), \
+             patch.object(FirestoreDB, "count_unread_notifications", AsyncMock(return_value=5)) as count:
+            assert await FirestoreDB.get_unread_count("u1") == 5
+
+        # Counted and written in the same transaction, so no increment lands in between
+        assert count.await_args.kwargs["transaction"] is transaction
+        transaction.update.assert_called_once_with(profile_ref, {"unread_count": 5, "unread_count_synced": True})
+        profile_ref.update.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_mark_all_read_decrements_by_what_it_marked(self):
+        db, profile_ref = self._db_with_profile({"unread_count": 5, "unread_count_synced": True})
+        transaction = db.transaction.return_value
+        query = db.collection.return_value.where.return_value.where.return_value.select.return_value
+        query.stream.return_value = _AsyncDocs([MagicMock(reference=f"ref{i}") for i in range(3)])
+        # ref2 was marked read by another request after the query ran
+        snapshots = [MagicMock(reference=f"ref{i}", exists=True, to_dict=MagicMock(return_value={"read": i == 2}))
+                     for i in range(3)]
+        db.get_all = MagicMock(return_value=_AsyncDocs(snapshots))
+
+        with patch("api.db.firestore.get_db", return_value=db), \
+             patch("api.db.firestore.firestore.async_transactional", _run_in_transaction):
+            marked = await FirestoreDB.mark_all_notifications_read("u1")
+
+        assert marked == 2
+        updates = [c.args for c in transaction.update.call_args_list]
+        assert updates == [("ref0", {"read": True}), ("ref1", {"read": True}), (profile_ref, {"unread_count": 3})]
+        profile_ref.update.assert_not_called()
+
+
+class TestTimezoneBuckets:
+    @pytest.mark.asyncio
+    async def test_chunked_in_queries_merge_in_id_order(self):
+        async def stream(ids):
+            for doc_id in ids:
+                yield {"id": doc_id}
+
+        merged = FirestoreDB._merge_by_id([stream(["a", "d", "e"]), stream(["b", "c", "f"]), stream([])])
+        assert [item["id"] async for item in merged] == ["a", "b", "c", "d", "e", "f"]
@@ -0,0 +1,53 @@
+"""
+Tests for the legacy recurring-task -> care rule migration (migrate_recurring_tasks.py) -
+the pure selection and rule-building logic only; the Firestore BulkWriter itself isn't
+exercised.
+"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from migrate_recurring_tasks import (
+    ALREADY_EXISTS, later_task, legacy_schedule_key, rule_from_legacy, write_error_handler
+)
+
+
+def _legacy(**overrides):
+    task = {"user_id": "u1", "plant_id": "p1", "task_type": "watering", "title": "Water Fern",
+            "description": "Water thoroughly", "priority": "medium", "points": 10, "recurring": True,
+            "recurring_days": 3, "due_date": datetime(2026, 3, 10, 9, 0, tzinfo=timezone.utc)}
+    task.update(overrides)
+    return task
+
+
+def test_only_legacy_stored_schedules_are_picked_up():
+    assert legacy_schedule_key(_legacy()) == ("p1", "watering")
+    assert legacy_schedule_key(_legacy(due_date="2026-03-10T09:00:00+00:00")) == ("p1", "watering")
+    assert legacy_schedule_key(_legacy(recurring=False)) is None
+    assert legacy_schedule_key(_legacy(rule_id="p1_watering")) is None  # a stored occurrence
+    assert legacy_schedule_key(_legacy(plant_id=None)) is None
+    assert legacy_schedule_key(_legacy(task_type="repotting")) is None
+    assert legacy_schedule_key(_legacy(due_date="someday")) is None
+
+
+def test_rule_continues_one_interval_after_the_last_stored_task():
+    first = _legacy(priority="high", due_date="2026-03-04T09:00:00+00:00")
+    last = _legacy()
+    assert later_task(later_task(None, last), first) is last
+
+    rule = rule_from_legacy(last)
+
+    assert rule["id"] == "p1_watering"
+    assert rule["anchor"] == datetime(2026, 3, 13, 9, 0, tzinfo=timezone.utc)
+    assert (rule["interval_days"], rule["priority"], rule["points"]) == (3, "medium", 10)
+    assert rule["exceptions"] == [] and "first_priority" not in rule
+
+
+def test_missing_interval_falls_back_to_the_type_default():
+    assert rule_from_legacy(_legacy(task_type="fertilizing", recurring_days=None))["interval_days"] == 30
+
+
+def test_existing_rule_is_counted_not_retried():
+    counts = {"created": 1, "existing": 0, "failed": 0}
+    failure = MagicMock(code=ALREADY_EXISTS, attempts=1)
+
+    assert write_error_handler(counts)(failure, None) is False
+    assert counts == {"created": 0, "existing": 1, "failed": 0}
@@ -0,0 +1,78 @@
+"""
+Tests for the legacy care_tasks date migration (migrate_task_dates.py) - the pure
+conversion and checkpoint logic only; the Firestore BulkWriter itself isn't exercised.
+"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from migrate_task_dates import (
+    FAILED_PRECONDITION, MAX_WRITE_ATTEMPTS, convert_task_dates, load_checkpoint, save_checkpoint, write_error_handler
+)
+
+
+def test_converts_legacy_iso_strings():
+    updates, unparseable = convert_task_dates({
+        "due_date": "2026-01-01T12:00:00Z",
+        "completed_at": "2026-01-02T08:30:00+00:00",
+    })
+    assert updates == {
+        "due_date": datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc),
+        "completed_at": datetime(2026, 1, 2, 8, 30, tzinfo=timezone.utc),
+    }
+    assert unparseable == 0
+
+
+def test_already_migrated_document_needs_no_update():
+    updates, unparseable = convert_task_dates({
+        "due_date": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "completed_at": None,
+    })
+    assert updates == {}
+    assert unparseable == 0
+
+
+def test_unparseable_string_is_counted_and_left_alone():
+    updates, unparseable = convert_task_dates({"due_date": "tomorrow-ish"})
+    assert updates == {}
+    assert unparseable == 1
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    assert load_checkpoint(path)["last_doc_id"] is None
+
+    save_checkpoint(path, {"last_doc_id": "abc", "scanned": 10, "migrated": 4, "unparseable": 0, "failed_ids": ["t9"]})
+    assert load_checkpoint(path)["last_doc_id"] == "abc"
+    assert load_checkpoint(path)["scanned"] == 10
+    assert load_checkpoint(path)["failed_ids"] == ["t9"]
+
+
+def test_checkpoint_from_before_failed_ids_loads(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    save_checkpoint(path, {"last_doc_id": "abc", "scanned": 10, "migrated": 4, "unparseable": 0, "failed": 0})
+    assert load_checkpoint(path)["failed_ids"] == []
+
+
+def test_checkpoint_from_before_changed_loads(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    save_checkpoint(path, {"last_doc_id": "abc", "scanned": 10, "migrated": 4, "unparseable": 0, "failed_ids": []})
+    assert load_checkpoint(path)["changed"] == 0
+
+
+def test_final_write_failure_is_recorded_for_retry():
+    checkpoint = {"migrated": 1, "failed_ids": []}
+    on_error = write_error_handler(checkpoint)
+    failure = MagicMock(code=14, attempts=1, message="unavailable")
+    failure.operation.reference.id = "t1"
+
+    assert on_error(failure, None) is True  # retried in place
+    failure.attempts = MAX_WRITE_ATTEMPTS
+    assert on_error(failure, None) is False
+    assert checkpoint == {"migrated": 0, "failed_ids": ["t1"]}
+
+
+def test_task_changed_since_read_is_not_retried():
+    checkpoint = {"migrated": 1, "changed": 0, "failed_ids": []}
+    failure = MagicMock(code=FAILED_PRECONDITION, attempts=1)
+
+    assert write_error_handler(checkpoint)(failure, None) is False
+    assert checkpoint == {"migrated": 0, "changed": 1, "failed_ids": []}
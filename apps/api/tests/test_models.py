@@ -251,3 +251,15 @@ class TestCareSchedule:
         assert sched.completed is False
         assert sched.completed_at is None
         assert sched.notes is None
+
+
+class TestProfileTimezone:
+    def test_accepts_iana_timezone(self):
+        from api.routes.auth import ProfileUpdate
+        assert ProfileUpdate(timezone="America/Sao_Paulo").timezone == "America/Sao_Paulo"
+
+    def test_rejects_unknown_timezone(self):
+        from pydantic import ValidationError
+        from api.routes.auth import ProfileCreate
+        with pytest.raises(ValidationError):
+            ProfileCreate(email="a@b.co", timezone="Mars/Olympus_Mons")
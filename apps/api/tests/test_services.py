@@ -1,10 +1,11 @@
 """
 Tests for service layer - mocks external dependencies (httpx, groq, firebase)
 """
+import asyncio
 import httpx
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from api.models.plant import Plant, PlantSize, PlantType, ToxicityLevel
 from api.models.task import CareTask
 from api.services.weather_service import WeatherService
@@ -100,18 +101,11 @@ class TestWeatherService:
 
 
 class TestPlantService:
-    @staticmethod
-    def _mock_create_task():
-        """FirestoreDB.create_task echoes the task dict back with a fake id, like real Firestore writes."""
-        async def _create(task_data):
-            return {**task_data, "id": f"task-{len(task_data)}-{task_data['task_type']}-{task_data['due_date']}"}
-        return _create
-
     @pytest.mark.asyncio
     async def test_projected_schedule_watering_only(self):
         plant = {"id": "plant-1", "name": "Test Plant", "watering_frequency_days": 7}
 
-        with patch("api.services.plant_service.FirestoreDB.create_task", side_effect=self._mock_create_task()):
+        with patch("api.services.plant_service.FirestoreDB.save_care_rules", AsyncMock()) as save:
             tasks = await PlantService.create_projected_schedule("user-1", plant, types=["watering"])
 
         # ceil(30 / 7) = 5 occurrences, covering ~30 days ahead
@@ -119,6 +113,7 @@ class TestPlantService:
         assert all(t["task_type"] == "watering" for t in tasks)
         assert all(t["plant_id"] == "plant-1" for t in tasks)
         assert all(t["user_id"] == "user-1" for t in tasks)
+        assert [r["id"] for r in save.call_args.args[0]] == ["plant-1_watering"]
 
     @pytest.mark.asyncio
     async def test_projected_schedule_includes_fertilizing(self):
@@ -127,7 +122,7 @@ class TestPlantService:
             "watering_frequency_days": 3, "fertilizer_frequency_days": 30
         }
 
-        with patch("api.services.plant_service.FirestoreDB.create_task", side_effect=self._mock_create_task()):
+        with patch("api.services.plant_service.FirestoreDB.save_care_rules", AsyncMock()):
             tasks = await PlantService.create_projected_schedule("user-1", plant)
 
         task_types = {t["task_type"] for t in tasks}
@@ -137,24 +132,20 @@ class TestPlantService:
             assert task["plant_id"] == "plant-2"
 
     @pytest.mark.asyncio
-    async def test_watering_task_first_priority_high(self):
-        plant = {"id": "p1", "name": "Aloe", "watering_frequency_days": 7}
-
-        with patch("api.services.plant_service.FirestoreDB.create_task", side_effect=self._mock_create_task()):
-            tasks = await PlantService.create_projected_schedule("user-1", plant, types=["watering"])
-
-        assert tasks[0]["priority"] == "high"
-        assert all(t["priority"] == "medium" for t in tasks[1:])
-
-    @pytest.mark.asyncio
-    async def test_projected_schedule_occurrence_count_is_capped(self):
-        # Daily watering (1-day interval) would naively be 30 occurrences - must be capped at 6.
-        plant = {"id": "p1", "name": "Fern", "watering_frequency_days": 1}
+    async def test_projected_schedule_is_one_rule_per_type_not_a_task_per_date(self):
+        plant = {"id": "p1", "name": "Fern", "watering_frequency_days": 1, "fertilizer_frequency_days": 30}
 
-        with patch("api.services.plant_service.FirestoreDB.create_task", side_effect=self._mock_create_task()):
-            tasks = await PlantService.create_projected_schedule("user-1", plant, types=["watering"])
+        with patch("api.services.plant_service.FirestoreDB.save_care_rules", AsyncMock()) as save:
+            tasks = await PlantService.create_projected_schedule("user-1", plant)
 
-        assert len(tasks) == 6
+        save.assert_awaited_once()
+        rules = save.call_args.args[0]
+        assert [(r["task_type"], r["interval_days"]) for r in rules] == [("watering", 1), ("fertilizing", 30)]
+        assert all(t["virtual"] and t["rule_id"] in {"p1_watering", "p1_fertilizing"} for t in tasks)
+        # Only the first watering is high priority, as when each date was stored
+        watering = [t["priority"] for t in tasks if t["task_type"] == "watering"]
+        assert watering[0] == "high" and set(watering[1:]) == {"medium"}
+        assert {t["priority"] for t in tasks if t["task_type"] == "fertilizing"} == {"low"}
 
     @pytest.mark.asyncio
     async def test_fetch_plant_image_success(self):
@@ -192,3 +183,917 @@ class TestPlantService:
         with patch("httpx.AsyncClient", return_value=mock_client):
             url = await PlantService.fetch_plant_image("Aloe", "Aloe vera")
             assert "images.unsplash.com" in url
+
+
+class TestRecurringTasks:
+    ANCHOR = datetime(2026, 3, 1, 9, 0, tzinfo=timezone.utc)
+
+    def _rule(self, **overrides):
+        rule = {"id": "p1_watering", "user_id": "u1", "plant_id": "p1", "task_type": "watering",
+                "title": "Water Fern", "priority": "high", "points": 10,
+                "interval_days": 7, "anchor": self.ANCHOR, "exceptions": []}
+        rule.update(overrides)
+        return rule
+
+    def test_expand_starts_at_current_occurrence_and_skips_exceptions(self):
+        from api.services.recurring_task_service import RecurringTaskService
+        now = datetime(2026, 3, 16, 12, 0, tzinfo=timezone.utc)  # 3/1 and 3/8 have lapsed
+        rule = self._rule(exceptions=["2026-03-22"])
+
+        occurrences = RecurringTaskService.expand(rule, None, now + timedelta(days=14), now)
+
+        assert [o["id"] for o in occurrences] == ["p1_watering@2026-03-15", "p1_watering@2026-03-29"]
+        assert all(o["virtual"] and not o["completed"] and o["recurring_days"] == 7 for o in occurrences)
+        # A range starting later begins at its first occurrence, not the current one
+        later = RecurringTaskService.expand(rule, datetime(2026, 3, 28, tzinfo=timezone.utc),
+                                            datetime(2026, 4, 6, tzinfo=timezone.utc), now)
+        assert [o["occurrence"] for o in later] == ["2026-03-29", "2026-04-05"]
+
+    def test_occurrence_ids_round_trip(self):
+        from api.services.recurring_task_service import RecurringTaskService
+        rule = self._rule()
+        now = datetime(2026, 3, 8, 12, 0, tzinfo=timezone.utc)  # 3/8 is the current occurrence
+        assert RecurringTaskService.parse_occurrence_id("p1_watering@2026-03-08") == ("p1_watering", "2026-03-08")
+        assert RecurringTaskService.parse_occurrence_id("3f2b-uuid") is None
+        assert RecurringTaskService.occurrence_on(rule, "2026-03-08", now)["due_date"] == self.ANCHOR + timedelta(days=7)
+        assert RecurringTaskService.occurrence_on(rule, "2026-03-09", now) is None
+        assert RecurringTaskService.occurrence_on(self._rule(exceptions=["2026-03-08"]), "2026-03-08", now) is None
+
+    def test_lapsed_and_out_of_horizon_occurrences_do_not_resolve(self):
+        from api.services.recurring_task_service import RecurringTaskService
+        rule = self._rule()
+        now = datetime(2026, 3, 8, 12, 0, tzinfo=timezone.utc)
+        with patch("api.services.recurring_task_service.settings.RECURRING_TASKS_HORIZON_DAYS", 14):
+            assert RecurringTaskService.occurrence_on(rule, "2026-03-01", now) is None  # lapsed
+            assert RecurringTaskService.occurrence_on(rule, "2026-03-15", now) is not None
+            assert RecurringTaskService.occurrence_on(rule, "2026-03-29", now) is None  # beyond the horizon
+            assert RecurringTaskService.occurrence_on(rule, "2029-03-04", now) is None
+
+    @pytest.mark.asyncio
+    async def test_range_merges_stored_tasks_with_occurrences(self):
+        from api.services import recurring_task_service as module
+        now = datetime.now(timezone.utc)
+        rule = self._rule(anchor=now - timedelta(days=1), interval_days=1)
+        stored = {"id": "t1", "title": "Repot", "due_date": now + timedelta(hours=1), "completed": False}
+        start, end = now - timedelta(hours=1), now + timedelta(days=2)
+
+        with patch.object(module.FirestoreDB, "get_user_tasks_in_range", AsyncMock(return_value=[stored])), \
+             patch.object(module.FirestoreDB, "get_user_care_rules", AsyncMock(return_value=[rule])) as rules:
+            tasks = await module.RecurringTaskService.tasks_in_range("u1", start, end)
+            completed = await module.RecurringTaskService.tasks_in_range("u1", start, end, completed=True)
+
+        # The current occurrence (due now), the stored task, then tomorrow's - by due_date
+        days = [(now + timedelta(days=n)).date().isoformat() for n in (0, 1)]
+        assert [t["id"] for t in tasks] == [f"p1_watering@{days[0]}", "t1", f"p1_watering@{days[1]}"]
+        assert completed == [stored]
+        rules.assert_awaited_once()  # completed=True never reads rules
+
+    @pytest.mark.asyncio
+    async def test_completing_an_occurrence_persists_it_and_prunes_exceptions(self):
+        from api.services import recurring_task_service as module
+        rule = self._rule(anchor=datetime.now(timezone.utc) - timedelta(days=14), exceptions=["2000-01-01"])
+        day = module.RecurringTaskService.expand(rule, None, datetime.now(timezone.utc) + timedelta(days=1),
+                                                 datetime.now(timezone.utc))[0]["occurrence"]
+
+        with patch.object(module.FirestoreDB, "get_task", AsyncMock(return_value=None)), \
+             patch.object(module.FirestoreDB, "get_care_rule", AsyncMock(return_value=rule)), \
+             patch.object(module.FirestoreDB, "write_occurrence", AsyncMock(return_value=["e1"])) as write:
+            task = await module.RecurringTaskService.get_task(f"p1_watering@{day}")
+            entry_ids = await module.RecurringTaskService.update_task(task, {"completed": True}, [{"kind": "notify"}])
+            await module.RecurringTaskService.delete_task(task)
+
+        assert entry_ids == ["e1"]
+        task_id, rule_id, written_day, task_data, stale, effects = write.await_args_list[0].args
+        assert (task_id, rule_id, written_day, stale) == (f"p1_watering@{day}", "p1_watering", day, ["2000-01-01"])
+        assert task_data["id"] == f"p1_watering@{day}" and task_data["completed"] is True
+        assert "virtual" not in task_data and effects == [{"kind": "notify"}]
+        # Deleting an occurrence stores no task, only the exception
+        assert write.await_args_list[1].args[3] is None
+
+    @pytest.mark.asyncio
+    async def test_updates_cannot_rekey_an_occurrence(self):
+        from api.services import recurring_task_service as module
+        rule = self._rule(anchor=datetime.now(timezone.utc) - timedelta(days=14))
+        task = module.RecurringTaskService.expand(rule, None, datetime.now(timezone.utc) + timedelta(days=1),
+                                                  datetime.now(timezone.utc))[0]
+        updates = {"id": "victim-task", "user_id": "u2", "rule_id": "p2_watering", "occurrence": "2026-01-01",
+                   "title": "Water Fern twice"}
+
+        with patch.object(module.FirestoreDB, "get_care_rule", AsyncMock(return_value=rule)), \
+             patch.object(module.FirestoreDB, "write_occurrence", AsyncMock(return_value=[])) as write:
+            await module.RecurringTaskService.update_task(task, updates)
+
+        task_id, rule_id, day, task_data, _, _ = write.await_args.args
+        assert (task_id, rule_id, day) == (task["id"], "p1_watering", task["occurrence"])
+        assert {field: task_data[field] for field in module.OCCURRENCE_KEY_FIELDS} == \
+            {field: task[field] for field in module.OCCURRENCE_KEY_FIELDS}
+        assert task_data["title"] == "Water Fern twice"
+
+    @pytest.mark.asyncio
+    async def test_stored_tasks_update_in_place(self):
+        from api.services import recurring_task_service as module
+        with patch.object(module.FirestoreDB, "update_task", AsyncMock()) as update, \
+             patch.object(module.FirestoreDB, "write_occurrence", AsyncMock()) as write:
+            assert await module.RecurringTaskService.update_task({"id": "t1"}, {"due_date": None}) == []
+
+        update.assert_awaited_once_with("t1", {"due_date": None})
+        write.assert_not_awaited()
+
+
+class TestLeaderboardIndex:
+    @staticmethod
+    def _index(scores):
+        from api.services.leaderboard_index import LeaderboardIndex
+        index = LeaderboardIndex(max_staleness_seconds=300)
+        index.load([{"id": uid, "total_score": score, "email": f"{uid}@x.com"} for uid, score in scores.items()])
+        return index
+
+    def test_top_is_ordered_by_score(self):
+        index = self._index({"a": 10, "b": 30, "c": 20})
+        assert [e["id"] for e in index.top(2)] == ["b", "c"]
+
+    def test_rank_counts_strictly_higher_scores(self):
+        index = self._index({"a": 10, "b": 30, "c": 30, "d": 5})
+        assert index.rank("b") == 1
+        assert index.rank("c") == 1
+        assert index.rank("a") == 3
+        assert index.rank("d") == 4
+        assert index.rank("missing") is None
+
+    def test_upsert_repositions_user(self):
+        index = self._index({"a": 10, "b": 30, "c": 20})
+        index.upsert({"id": "a", "total_score": 50})
+        assert index.rank("a") == 1
+        assert [e["id"] for e in index.top(3)] == ["a", "b", "c"]
+        assert len(index) == 3
+
+    def test_upsert_adds_new_user(self):
+        index = self._index({"a": 10})
+        index.upsert({"id": "new", "total_score": 0})
+        assert index.rank("new") == 2
+
+    def test_around_returns_neighbours_with_positions(self):
+        index = self._index({uid: score for uid, score in zip("abcdefg", range(70, 0, -10))})
+        around = index.around("d", 1)
+        assert [(pos, e["id"]) for pos, e in around] == [(3, "c"), (4, "d"), (5, "e")]
+
+    def test_only_indexed_fields_are_kept(self):
+        index = self._index({})
+        index.upsert({"id": "a", "total_score": 1, "agent_profile": {"summary": "secret"}})
+        assert "agent_profile" not in index.get("a")
+
+    @pytest.mark.asyncio
+    async def test_first_read_seeds_from_firestore(self):
+        from api.services.leaderboard_index import LeaderboardIndex
+        index = LeaderboardIndex(max_staleness_seconds=300)
+        profiles = [{"id": "a", "total_score": 5}]
+
+        with patch("api.services.leaderboard_index.FirestoreDB.get_all_profiles", AsyncMock(return_value=profiles)) as get_all:
+            await index.ensure_fresh()
+            await index.ensure_fresh()
+
+        get_all.assert_awaited_once()
+        assert index.rank("a") == 1
+        assert not index.is_stale()
+
+    @pytest.mark.asyncio
+    async def test_failed_seed_backs_off_before_retrying(self):
+        from api.services import leaderboard_index as module
+        index = module.LeaderboardIndex(max_staleness_seconds=300)
+        get_all = AsyncMock(side_effect=[Exception("unavailable"), [{"id": "a", "total_score": 5}]])
+
+        with patch.object(module.FirestoreDB, "get_all_profiles", get_all):
+            await index.ensure_fresh()
+            await index.ensure_fresh()  # within the back-off: no second scan
+            assert get_all.await_count == 1 and len(index) == 0
+
+            index._failed_at -= module.RESEED_RETRY_SECONDS
+            await index.ensure_fresh()
+
+        assert get_all.await_count == 2
+        assert index.rank("a") == 1
+
+
+class TestPeriodLeaderboardRollup:
+    def test_sums_buckets_inside_window_only(self):
+        from datetime import date
+        from api.services.scheduler_service import rollup_period_scores
+        buckets = [
+            {"user_id": "a", "day": "2026-03-01", "points": 100},  # outside the window
+            {"user_id": "a", "day": "2026-03-05", "points": 10},
+            {"user_id": "a", "day": "2026-03-06", "points": 15},
+            {"user_id": "b", "day": "2026-03-06", "points": 20},
+        ]
+        entries = rollup_period_scores(buckets, date(2026, 3, 4))
+        assert entries == [{"id": "a", "points": 25}, {"id": "b", "points": 20}]
+
+    def test_keeps_only_the_top_users(self):
+        from datetime import date
+        from api.services.scheduler_service import rollup_period_scores, PERIOD_LEADERBOARD_SIZE
+        buckets = [{"user_id": f"u{i}", "day": "2026-03-05", "points": i} for i in range(PERIOD_LEADERBOARD_SIZE + 20)]
+        entries = rollup_period_scores(buckets, date(2026, 3, 1))
+        assert len(entries) == PERIOD_LEADERBOARD_SIZE
+        assert entries[0]["points"] == PERIOD_LEADERBOARD_SIZE + 19
+
+
+class TestSchedulerSweeps:
+    @pytest.fixture(autouse=True)
+    def checkpoints(self):
+        """In-memory stand-in for the sweep_checkpoints collection"""
+        from api.services import scheduler_service
+        stored = {}
+
+        async def save(key, checkpoint):
+            stored[key] = checkpoint
+
+        with patch.object(scheduler_service.FirestoreDB, "get_sweep_checkpoint", AsyncMock(side_effect=stored.get)), \
+             patch.object(scheduler_service.FirestoreDB, "save_sweep_checkpoint", AsyncMock(side_effect=save)):
+            yield stored
+
+    @staticmethod
+    async def _stream(profiles):
+        for profile in profiles:
+            yield profile
+
+    @pytest.mark.asyncio
+    async def test_sweep_bounds_concurrency_and_reports_throughput(self):
+        from api.services import scheduler_service
+        in_flight, peak = 0, 0
+
+        async def handle(profile):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return profile["id"] != "u0"
+
+        profiles = [{"id": f"u{i}"} for i in range(10)]
+        with patch.object(scheduler_service.settings, "SCHEDULER_CONCURRENCY", 3):
+            stats = await scheduler_service.sweep_users("test", self._stream(profiles), handle)
+
+        assert peak == 3
+        assert stats["users"] == 10 and stats["acted"] == 9 and stats["errors"] == 0
+        assert stats["duration_seconds"] > 0 and stats["users_per_second"] > 0
+
+    @pytest.mark.asyncio
+    async def test_one_users_failure_does_not_stop_the_sweep(self):
+        from api.services.scheduler_service import sweep_users
+
+        async def handle(profile):
+            if profile["id"] == "bad":
+                raise RuntimeError("boom")
+            return True
+
+        profiles = [{"id": "a"}, {"id": "bad"}, {"id": "b"}]
+        stats = await sweep_users("test", self._stream(profiles), handle)
+        assert stats["users"] == 3 and stats["acted"] == 2 and stats["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_streak_sweep_queries_the_risk_window_and_warns_once(self):
+        from api.services import scheduler_service
+        at_risk = [{"id": "a", "streak_days": 3}, {"id": "b", "streak_days": 5}]
+        stream = MagicMock(return_value=self._stream(at_risk))
+        claim = AsyncMock(side_effect=lambda user_id, day, expires_before: user_id == "a")
+
+        with patch.object(scheduler_service.FirestoreDB, "stream_profiles_streak_expiring", stream), \
+             patch.object(scheduler_service.FirestoreDB, "claim_streak_warning", claim), \
+             patch.object(scheduler_service.NotificationService, "notify", AsyncMock()) as notify, \
+             patch.object(scheduler_service.EmailService, "send_for_notification", AsyncMock()):
+            stats = await scheduler_service.run_streak_risk_sweep()
+
+        start, end = stream.call_args.args
+        assert end - start == timedelta(hours=scheduler_service.STREAK_RISK_WINDOW_HOURS)
+        assert claim.await_count == 2
+        assert stats["acted"] == 1
+        notify.assert_awaited_once()
+        assert notify.await_args.args[:2] == ("a", "streak_risk")
+
+    @pytest.mark.asyncio
+    async def test_task_digest_queries_due_tasks_per_page_and_local_day(self):
+        from api.services import scheduler_service
+        bucket = [{"id": "a", "timezone": "America/New_York"}, {"id": "b", "timezone": "Asia/Kolkata"},
+                  {"id": "c", "timezone": "America/New_York"}]
+        due = {"a": 2, "b": 1}
+        windows = []
+        now = datetime.now(timezone.utc)
+        # c's rule is due now; b's occurrence today is already stored, so it's an exception
+        rules = [{"id": "pc_watering", "user_id": "c", "anchor": now, "interval_days": 7, "exceptions": []},
+                 {"id": "pb_watering", "user_id": "b", "anchor": now, "interval_days": 7,
+                  "exceptions": [now.date().isoformat()]}]
+
+        def stream_tasks_due(start, end, user_ids, fields=None):
+            windows.append((start, end, sorted(user_ids)))
+            return self._stream([{"user_id": uid} for uid in user_ids for _ in range(due.get(uid, 0))])
+
+        with patch.object(scheduler_service.FirestoreDB, "stream_profiles_in_timezones",
+                          MagicMock(return_value=self._stream(bucket))), \
+             patch.object(scheduler_service.FirestoreDB, "stream_tasks_due", MagicMock(side_effect=stream_tasks_due)), \
+             patch.object(scheduler_service.FirestoreDB, "stream_care_rules",
+                          MagicMock(return_value=self._stream(rules))) as stream_rules, \
+             patch.object(scheduler_service.FirestoreDB, "get_user_tasks", AsyncMock()) as per_user, \
+             patch.object(scheduler_service.NotificationService, "notify", AsyncMock()) as notify, \
+             patch.object(scheduler_service.EmailService, "send_for_notification", AsyncMock()):
+            stats = await scheduler_service.run_task_due_digest()
+
+        # One due-task query per distinct local day in the page, never one per user
+        assert sorted(users for _, _, users in windows) == [["a", "c"], ["b"]]
+        assert all(end - start == timedelta(days=1) for start, end, _ in windows)
+        per_user.assert_not_awaited()
+        stream_rules.assert_called_once()
+        assert stats["users"] == 3
+        messages = {call.args[0]: call.args[3] for call in notify.await_args_list}
+        assert messages == {"a": "You have 2 task(s) due today.", "b": "You have 1 task(s) due today.",
+                            "c": "You have 1 task(s) due today."}
+
+    @pytest.mark.asyncio
+    async def test_task_digest_shard_reads_only_its_own_users_tasks(self):
+        from api.services import scheduler_service
+        bucket = [{"id": f"u{i}", "timezone": "UTC"} for i in range(20)]
+        queried = []
+
+        def stream_tasks_due(start, end, user_ids, fields=None):
+            queried.extend(user_ids)
+            return self._stream([])
+
+        source = scheduler_service.TaskDueDigestSource(["UTC"], datetime.now(timezone.utc), shard=1, of=3)
+        with patch.object(scheduler_service.FirestoreDB, "stream_profiles_in_timezones",
+                          MagicMock(return_value=self._stream(bucket))), \
+             patch.object(scheduler_service.FirestoreDB, "stream_tasks_due", MagicMock(side_effect=stream_tasks_due)), \
+             patch.object(scheduler_service.FirestoreDB, "stream_care_rules", MagicMock(return_value=self._stream([]))) as rules:
+            assert [user async for user in source.stream(None)] == []
+
+        expected = [p["id"] for p in bucket if scheduler_service.in_shard(p["id"], 1, 3)]
+        assert queried == expected
+        assert rules.call_args.args[0] == expected
+
+    def test_timezone_buckets_follow_local_time(self):
+        from api.services.scheduler_service import timezones_at_local_time, local_day_bounds
+        now = datetime(2026, 3, 2, 13, 0, tzinfo=timezone.utc)  # a Monday
+        eight_am = timezones_at_local_time(now, 8)
+        assert "America/New_York" in eight_am and "Europe/London" not in eight_am
+        assert "America/New_York" not in timezones_at_local_time(now, 8, weekday=1)
+
+        start, end = local_day_bounds("Asia/Tokyo", now)
+        assert start.isoformat() == "2026-03-02T00:00:00+09:00"
+        assert end - start == timedelta(days=1)
+        assert local_day_bounds("Not/AZone", now)[0].utcoffset() == timedelta(0)
+
+    def test_cursor_pins_a_resumed_run_to_its_hour(self):
+        from api.services.scheduler_service import run_hour
+        assert run_hour("2026-03-02T13Z/user-9") == datetime(2026, 3, 2, 13, tzinfo=timezone.utc)
+        assert run_hour(None).minute == 0
+
+    @pytest.mark.asyncio
+    async def test_shards_partition_users_and_batches_resume_from_checkpoint(self):
+        from api.services.scheduler_service import run_sweep_batch, LoadedSweepSource, in_shard
+        users = [{"id": f"u{i:02d}"} for i in range(30)]
+        seen = []
+
+        async def handle(user):
+            seen.append(user["id"])
+            return True
+
+        def source():
+            return LoadedSweepSource(lambda: self._stream(users))
+
+        for shard in range(3):
+            first = await run_sweep_batch("job", "2026-03-05", source(), handle, shard=shard, of=3, limit=4)
+            assert first["processed"] == 4 and first["next_cursor"] is not None
+            total = first["processed"]
+            # No cursor passed: each later call resumes from the persisted checkpoint
+            while True:
+                result = await run_sweep_batch("job", "2026-03-05", source(), handle, shard=shard, of=3, limit=4)
+                total += result["processed"]
+                if result["next_cursor"] is None:
+                    break
+                run, last_id = result["next_cursor"].split("/")
+                assert run == "2026-03-05"
+                assert result["remaining"] == sum(
+                    1 for u in users if u["id"] > last_id and in_shard(u["id"], shard, 3))
+            assert result["remaining"] == 0
+            assert total == sum(1 for u in users if in_shard(u["id"], shard, 3))
+
+        assert sorted(seen) == [u["id"] for u in users]
+        # The run is done: another trigger for it does nothing
+        again = await run_sweep_batch("job", "2026-03-05", source(), handle, shard=0, of=3, limit=4)
+        assert again["processed"] == 0 and len(seen) == 30
+
+
+class TestJobInstrumentation:
+    @pytest.fixture(autouse=True)
+    def leases(self):
+        """In-memory stand-in for the leases collection - name -> holder"""
+        from api.services import scheduler_service
+        held = {}
+
+        async def acquire(name, holder, lease_seconds):
+            if held.get(name, holder) != holder:
+                return False
+            held[name] = holder
+            return True
+
+        async def release(name, holder):
+            if held.get(name) == holder:
+                del held[name]
+
+        with patch.object(scheduler_service.FirestoreDB, "acquire_lease", AsyncMock(side_effect=acquire)), \
+             patch.object(scheduler_service.FirestoreDB, "release_lease", AsyncMock(side_effect=release)):
+            yield held
+
+    @pytest.mark.asyncio
+    async def test_records_duration_users_and_errors(self):
+        from api.services import scheduler_service
+        run = AsyncMock(return_value={"processed": 12, "errors": 2, "remaining": 0})
+        with patch.object(scheduler_service.FirestoreDB, "record_job_run", AsyncMock()) as record:
+            result = await scheduler_service.run_job("weekly_summary", run, shard=1, of=2)
+
+        run.assert_awaited_once_with(shard=1, of=2)
+        assert result["status"] == "ok"
+        assert (result["users_processed"], result["errors"]) == (12, 2)
+        assert result["duration_seconds"] >= 0
+        record.assert_awaited_once_with(result)
+
+    @pytest.mark.asyncio
+    async def test_overlapping_run_is_skipped(self, leases):
+        from api.services import scheduler_service
+        release = asyncio.Event()
+
+        async def slow_sweep():
+            await release.wait()
+            return {"users": 1}
+
+        with patch.object(scheduler_service.FirestoreDB, "record_job_run", AsyncMock()):
+            first = asyncio.create_task(scheduler_service.run_job("streak_risk_sweep", slow_sweep))
+            await asyncio.sleep(0)
+            second = await scheduler_service.run_job("streak_risk_sweep", slow_sweep)
+            release.set()
+            first_result = await first
+
+        assert second["status"] == "skipped"
+        assert first_result["status"] == "ok"
+        assert not leases
+
+    @pytest.mark.asyncio
+    async def test_parallel_shards_of_one_job_both_run(self, leases):
+        from api.services import scheduler_service
+        release = asyncio.Event()
+
+        async def slow_shard(shard, of):
+            await release.wait()
+            return {"processed": 1, "shard": shard}
+
+        with patch.object(scheduler_service.FirestoreDB, "record_job_run", AsyncMock()):
+            first = asyncio.create_task(scheduler_service.run_job("weekly_summary", slow_shard, shard=0, of=2))
+            second = asyncio.create_task(scheduler_service.run_job("weekly_summary", slow_shard, shard=1, of=2))
+            await asyncio.sleep(0)
+            same_shard = await scheduler_service.run_job("weekly_summary", slow_shard, shard=1, of=2)
+            release.set()
+            results = await asyncio.gather(first, second)
+
+        assert [r["status"] for r in results] == ["ok", "ok"]
+        assert same_shard["status"] == "skipped"
+        assert not leases
+
+    @pytest.mark.asyncio
+    async def test_run_in_another_process_is_skipped(self, leases):
+        from api.services import scheduler_service
+        leases["streak_risk_sweep:0-of-1"] = "another-instance"
+        run = AsyncMock(return_value={"users": 1})
+
+        with patch.object(scheduler_service.FirestoreDB, "record_job_run", AsyncMock()):
+            result = await scheduler_service.run_job("streak_risk_sweep", run)
+
+        assert result["status"] == "skipped"
+        run.assert_not_awaited()
+        assert leases == {"streak_risk_sweep:0-of-1": "another-instance"}
+
+    @pytest.mark.asyncio
+    async def test_lease_error_is_recorded_without_running(self):
+        from api.services import scheduler_service
+        run = AsyncMock(return_value={"users": 1})
+
+        with patch.object(scheduler_service.FirestoreDB, "acquire_lease", AsyncMock(side_effect=RuntimeError("down"))), \
+             patch.object(scheduler_service.FirestoreDB, "record_job_run", AsyncMock()):
+            result = await scheduler_service.run_job("streak_risk_sweep", run)
+
+        assert result["status"] == "error" and "down" in result["error"]
+        run.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_deadline_and_failures_are_recorded_not_raised(self):
+        from api.services import scheduler_service
+
+        async def hangs():
+            await asyncio.sleep(10)
+
+        with patch.object(scheduler_service.settings, "SCHEDULER_JOB_DEADLINE_SECONDS", 0.01), \
+             patch.object(scheduler_service.FirestoreDB, "record_job_run", AsyncMock()):
+            timed_out = await scheduler_service.run_job("task_due_digest", hangs)
+            failed = await scheduler_service.run_job("outbox_drain", AsyncMock(side_effect=RuntimeError("down")))
+
+        assert timed_out["status"] == "timeout" and timed_out["errors"] == 1
+        assert failed["status"] == "error" and failed["error"] == "down"
+
+
+class _FakeLease:
+    def __init__(self, grants):
+        self.grants = list(grants)
+        self.released = False
+
+    async def acquire(self):
+        result = self.grants.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def release(self):
+        self.released = True
+
+
+class TestSchedulerLeader:
+    @pytest.mark.asyncio
+    async def test_only_the_lease_holder_runs_the_scheduler(self):
+        from api.services.scheduler_lease import SchedulerLeader
+        leader = SchedulerLeader(_FakeLease([False, True, True, False]), lease_seconds=60)
+
+        with patch("api.services.scheduler_service.start_scheduler") as start, \
+             patch("api.services.scheduler_service.stop_scheduler") as stop:
+            await leader.heartbeat()
+            start.assert_not_called()
+            await leader.heartbeat()
+            await leader.heartbeat()  # renewal doesn't restart it
+            start.assert_called_once()
+            await leader.heartbeat()  # lease taken over elsewhere
+            stop.assert_called_once()
+        assert leader.is_leader is False
+
+    @pytest.mark.asyncio
+    async def test_leader_keeps_running_through_a_brief_lease_outage(self):
+        from api.services.scheduler_lease import SchedulerLeader
+        leader = SchedulerLeader(_FakeLease([True, RuntimeError("unavailable")]), lease_seconds=60)
+
+        with patch("api.services.scheduler_service.start_scheduler"), \
+             patch("api.services.scheduler_service.stop_scheduler") as stop:
+            await leader.heartbeat()
+            await leader.heartbeat()
+        stop.assert_not_called()
+        assert leader.is_leader is True
+
+    @pytest.mark.asyncio
+    async def test_leader_steps_down_before_its_lease_can_expire(self):
+        from api.services import scheduler_lease
+        leader = scheduler_lease.SchedulerLeader(
+            _FakeLease([True, RuntimeError("unavailable"), RuntimeError("unavailable")]), lease_seconds=60
+        )
+        clock = MagicMock(return_value=1000.0)
+
+        with patch.object(scheduler_lease.time, "monotonic", clock), \
+             patch("api.services.scheduler_service.start_scheduler"), \
+             patch("api.services.scheduler_service.stop_scheduler") as stop:
+            await leader.heartbeat()
+            clock.return_value = 1020.0  # one heartbeat later: still well inside the lease
+            await leader.heartbeat()
+            stop.assert_not_called()
+            clock.return_value = 1040.0  # two heartbeats later, 20s before the lease expires
+            await leader.heartbeat()
+
+        stop.assert_called_once()
+        assert leader.is_leader is False
+
+    def test_lease_backends_must_implement_acquire_and_release(self):
+        from api.services.scheduler_lease import SchedulerLease
+        with pytest.raises(TypeError):
+            SchedulerLease()
+
+    @pytest.mark.asyncio
+    async def test_stop_releases_the_lease(self):
+        from api.services.scheduler_lease import SchedulerLeader
+        lease = _FakeLease([True])
+        leader = SchedulerLeader(lease, lease_seconds=60)
+
+        with patch("api.services.scheduler_service.start_scheduler"), \
+             patch("api.services.scheduler_service.stop_scheduler") as stop:
+            await leader.heartbeat()
+            await leader.stop()
+        stop.assert_called_once()
+        assert lease.released
+
+    @pytest.mark.asyncio
+    async def test_local_lease_elects_one_holder(self, tmp_path):
+        from api.services.scheduler_lease import LocalSchedulerLease
+        path = str(tmp_path / "scheduler.lock")
+        first, second = LocalSchedulerLease(path), LocalSchedulerLease(path)
+
+        assert await first.acquire() is True
+        assert await second.acquire() is False
+        await first.release()
+        assert await second.acquire() is True
+        await second.release()
+
+
+class TestScoreUpdates:
+    def test_streak_updates_continue_streak_and_earn_achievements(self):
+        from datetime import date
+        from api.routes.leaderboard import _streak_updates
+        profile = {"total_score": 990, "level": 1, "tasks_completed": 4, "streak_days": 6,
+                   "last_activity": "2026-03-04T09:00:00", "achievements": ["first_task"]}
+        updates = _streak_updates(20, date(2026, 3, 5))(profile)
+        assert updates == {"level": 2, "streak_days": 7, "achievements": ["level_2", "streak_7"]}
+
+    def test_streak_resets_after_a_gap(self):
+        from datetime import date
+        from api.routes.leaderboard import _streak_updates
+        profile = {"total_score": 10, "level": 1, "tasks_completed": 1, "streak_days": 4,
+                   "last_activity": "2026-03-01T09:00:00", "achievements": ["first_task"]}
+        updates = _streak_updates(10, date(2026, 3, 5))(profile)
+        assert updates == {"level": 1, "streak_days": 1}
+
+    @pytest.mark.asyncio
+    async def test_repeat_completion_same_day_skips_profile_read(self):
+        from api.routes import leaderboard
+        award = AsyncMock(return_value={"total_score": 1005, "tasks_completed": 9})
+
+        # patch.dict restores the module-level memo afterwards, so no other test sees u1
+        with patch.dict(leaderboard._activity_credited, {"u1": datetime.now().date().isoformat()}), \
+             patch.object(leaderboard.FirestoreDB, "award_points", award), \
+             patch.object(leaderboard.FirestoreDB, "get_profile", AsyncMock()) as get_profile, \
+             patch.object(leaderboard.FirestoreDB, "grant_achievements", AsyncMock()) as grant, \
+             patch.object(leaderboard, "_announce_achievements", AsyncMock()) as announce:
+            await leaderboard.apply_score_update("u1", 10)
+
+        get_profile.assert_not_called()
+        assert award.call_args.kwargs.get("build_updates") is None
+        expires_at = award.call_args.kwargs["streak_expires_at"]
+        assert expires_at.tzinfo is not None
+        assert abs(expires_at - datetime.now(timezone.utc) - timedelta(hours=24)) < timedelta(minutes=1)
+        grant.assert_awaited_once_with("u1", ["level_2"], level=2)
+        announce.assert_awaited_once_with("u1", ["level_2"], None)
+
+    @pytest.mark.asyncio
+    async def test_award_already_applied_is_not_announced_again(self):
+        from api.routes import leaderboard
+        award = AsyncMock(return_value=None)  # the award's marker already exists
+
+        with patch.dict(leaderboard._activity_credited, {"u1": datetime.now().date().isoformat()}), \
+             patch.object(leaderboard.FirestoreDB, "award_points", award), \
+             patch.object(leaderboard, "_announce_achievements", AsyncMock()) as announce:
+            await leaderboard.apply_score_update("u1", 10, award_id="e1")
+
+        assert award.call_args.kwargs["award_id"] == "e1"
+        announce.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_achievement_notifications_are_keyed_by_award(self):
+        from api.routes import leaderboard
+        with patch.object(leaderboard.NotificationService, "notify", AsyncMock()) as notify, \
+             patch.object(leaderboard.EmailService, "send_for_notification", AsyncMock()):
+            await leaderboard._announce_achievements("u1", ["level_2", "streak_7"], "e1")
+
+        assert [c.kwargs["notification_id"] for c in notify.await_args_list] == \
+            ["outbox-e1-level_2", "outbox-e1-streak_7"]
+
+
+class _FakeSocket:
+    def __init__(self, block: bool = False):
+        self.sent = []
+        self.block = block
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if self.block:
+            await asyncio.Event().wait()
+        self.sent.append(message)
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+class TestConnectionManager:
+    @pytest.mark.asyncio
+    async def test_every_tab_receives_the_message(self):
+        from api.routes.notifications import ConnectionManager
+        manager = ConnectionManager(max_queue=10)
+        first, second = _FakeSocket(), _FakeSocket()
+        await manager.connect("u1", first)
+        await manager.connect("u1", second)
+
+        await manager.send_personal_message("u1", {"title": "Hi", "created_at": datetime(2026, 1, 1)})
+        await asyncio.sleep(0)
+
+        assert first.sent == second.sent == [{"title": "Hi", "created_at": "2026-01-01T00:00:00"}]
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_is_dropped_without_blocking_sender(self):
+        from api.routes.notifications import ConnectionManager
+        manager = ConnectionManager(max_queue=2)
+        slow, fast = _FakeSocket(block=True), _FakeSocket()
+        await manager.connect("u1", slow)
+        await manager.connect("u1", fast)
+
+        for i in range(5):
+            await manager.send_personal_message("u1", {"n": i})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        assert len(manager.active_connections["u1"]) == 1
+        assert slow.closed_with == 1013
+        assert [m["n"] for m in fast.sent] == [0, 1, 2, 3, 4]
+
+
+class TestNotificationBus:
+    @pytest.mark.asyncio
+    async def test_notify_publishes_json_safe_message(self):
+        from api.services.notification_service import NotificationService
+        bus = MagicMock(publish=AsyncMock())
+        created = {"id": "n1", "title": "Hi", "created_at": datetime(2026, 1, 1)}
+
+        with patch("api.services.notification_service.FirestoreDB.create_notification", AsyncMock(return_value=(created, 2))), \
+             patch("api.services.notification_service.get_notification_bus", return_value=bus):
+            await NotificationService.notify("u1", "achievement", "Hi", "There")
+
+        assert [c.args for c in bus.publish.await_args_list] == [
+            ("u1", {"id": "n1", "title": "Hi", "created_at": "2026-01-01T00:00:00"}),
+            ("u1", {"event": "unread_count", "count": 2}),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_publish_failure_after_write_is_logged_not_raised(self):
+        from api.services.notification_service import NotificationService
+        bus = MagicMock(publish=AsyncMock(side_effect=ConnectionError("redis down")))
+        created = {"id": "n1", "title": "Hi"}
+
+        with patch("api.services.notification_service.FirestoreDB.create_notification", AsyncMock(return_value=(created, 2))), \
+             patch("api.services.notification_service.get_notification_bus", return_value=bus):
+            assert await NotificationService.notify("u1", "achievement", "Hi", "There") == created
+
+        assert bus.publish.await_count == 2
+
+    def test_bus_without_publish_cannot_be_built(self):
+        from api.services.notification_bus import NotificationBus
+        with pytest.raises(TypeError):
+            NotificationBus()
+
+    @pytest.mark.asyncio
+    async def test_redis_bus_round_trips_through_channel(self):
+        from api.services.notification_bus import RedisNotificationBus
+        deliver = AsyncMock()
+        bus = RedisNotificationBus("redis://unused", deliver)
+        bus._client = MagicMock(publish=AsyncMock())
+
+        await bus.publish("u1", {"title": "Hi"})
+        channel, payload = bus._client.publish.call_args.args
+        await bus._handle(payload)
+
+        assert channel == RedisNotificationBus.CHANNEL
+        deliver.assert_awaited_once_with("u1", {"title": "Hi"})
+
+
+class TestNotificationReplay:
+    @staticmethod
+    def _notification(n, minute):
+        return {"id": f"n{n}", "created_at": datetime(2026, 1, 1, 12, minute, tzinfo=timezone.utc)}
+
+    @pytest.mark.asyncio
+    async def test_replays_from_memory_after_cursor(self):
+        from api.routes import notifications
+        manager = notifications.ConnectionManager(max_queue=10, replay_size=10)
+        manager._buffers_complete_from = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for n in range(3):
+            await manager.send_personal_message("u1", self._notification(n, n))
+
+        with patch.object(notifications, "manager", manager), \
+             patch.object(notifications.FirestoreDB, "get_notifications_since", AsyncMock()) as fallback:
+            by_id = await notifications._missed_notifications("u1", "n0")
+            by_time = await notifications._missed_notifications("u1", "2026-01-01T12:01:00+00:00")
+
+        fallback.assert_not_called()
+        assert [m["id"] for m in by_id] == ["n1", "n2"]
+        assert [m["id"] for m in by_time] == ["n2"]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_firestore_beyond_buffer(self):
+        from api.routes import notifications
+        manager = notifications.ConnectionManager(max_queue=10, replay_size=2)
+        manager._buffers_complete_from = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for n in range(4):
+            await manager.send_personal_message("u1", self._notification(n, n))
+        older = [self._notification(1, 1), self._notification(2, 2), self._notification(3, 3)]
+
+        with patch.object(notifications, "manager", manager), \
+             patch.object(notifications.FirestoreDB, "get_notifications_since", AsyncMock(return_value=older)) as fallback:
+            missed = await notifications._missed_notifications("u1", "2026-01-01T12:00:00+00:00")
+
+        fallback.assert_awaited_once()
+        assert [m["id"] for m in missed] == ["n1", "n2", "n3"]
+
+    def test_user_without_notifications_replays_nothing(self):
+        from api.routes.notifications import ConnectionManager
+        manager = ConnectionManager(max_queue=10, replay_size=10)
+        assert manager.replay("quiet-user", datetime.now(timezone.utc)) == []
+        assert manager.replay("quiet-user", datetime(2000, 1, 1, tzinfo=timezone.utc)) is None
+
+
+class TestNotificationStream:
+    @pytest.mark.asyncio
+    async def test_streams_fan_out_and_heartbeats(self):
+        from api.routes import notifications
+        manager = notifications.ConnectionManager(max_queue=10, replay_size=10)
+        request = MagicMock(headers={})
+
+        with patch.object(notifications, "manager", manager), \
+             patch.object(notifications, "SSE_HEARTBEAT_SECONDS", 0.01), \
+             patch.object(notifications.FirestoreDB, "get_unread_count", AsyncMock(return_value=1)), \
+             patch.object(notifications, "verify_id_token_cached", AsyncMock(return_value={"uid": "u1"})):
+            response = await notifications.notification_stream(request, token="tok", since=None)
+            stream = response.body_iterator
+            assert (await stream.__anext__()).startswith("retry:")
+            assert await stream.__anext__() == 'event: unread_count\ndata: {"event": "unread_count", "count": 1}\n\n'
+
+            await manager.send_personal_message("u1", {"id": "n1", "title": "Hi"})
+            event = await stream.__anext__()
+            heartbeat = await stream.__anext__()
+            await stream.aclose()
+
+        assert event == 'id: n1\nevent: notification\ndata: {"id": "n1", "title": "Hi"}\n\n'
+        assert heartbeat == ": keepalive\n\n"
+        assert "u1" not in manager.active_connections
+
+    @pytest.mark.asyncio
+    async def test_last_event_id_resumes(self):
+        from api.routes import notifications
+        request = MagicMock(headers={"last-event-id": "n1"})
+        missed = AsyncMock(return_value=[{"id": "n2"}])
+
+        with patch.object(notifications, "_missed_notifications", missed), \
+             patch.object(notifications, "verify_id_token_cached", AsyncMock(return_value={"uid": "u1"})):
+            response = await notifications.notification_stream(request, token="tok", since=None)
+            await response.body_iterator.__anext__()
+            replayed = await response.body_iterator.__anext__()
+            await response.body_iterator.aclose()
+
+        missed.assert_awaited_once_with("u1", "n1")
+        assert replayed.startswith("id: n2\n")
+
+
+class TestOutboxService:
+    @pytest.mark.asyncio
+    async def test_successful_entry_is_removed(self):
+        from api.services import outbox_service
+        handler = AsyncMock()
+        entry = {"id": "e1", "kind": "notify", "payload": {"user_id": "u1"}, "attempts": 1}
+
+        with patch.dict(outbox_service.HANDLERS, {"notify": handler}), \
+             patch.object(outbox_service.FirestoreDB, "claim_outbox_entry", AsyncMock(return_value=entry)), \
+             patch.object(outbox_service.FirestoreDB, "complete_outbox_entry", AsyncMock()) as complete:
+            assert await outbox_service.OutboxService.process_entry("e1") is True
+
+        handler.assert_awaited_once_with("e1", {"user_id": "u1"})
+        complete.assert_awaited_once_with("e1")
+
+    @pytest.mark.asyncio
+    async def test_failure_backs_off_then_parks(self):
+        from api.services import outbox_service
+        handler = AsyncMock(side_effect=RuntimeError("smtp down"))
+
+        for attempts, parked in [(1, False), (outbox_service.OUTBOX_MAX_ATTEMPTS, True)]:
+            entry = {"id": "e1", "kind": "notify", "payload": {}, "attempts": attempts}
+            with patch.dict(outbox_service.HANDLERS, {"notify": handler}), \
+                 patch.object(outbox_service.FirestoreDB, "claim_outbox_entry", AsyncMock(return_value=entry)), \
+                 patch.object(outbox_service.FirestoreDB, "retry_outbox_entry", AsyncMock()) as retry:
+                assert await outbox_service.OutboxService.process_entry("e1") is False
+
+            entry_id, error, retry_at = retry.await_args.args
+            assert error == "smtp down"
+            assert (retry_at is None) == parked
+
+    @pytest.mark.asyncio
+    async def test_notify_is_keyed_by_entry_so_retries_store_it_once(self):
+        from api.services import outbox_service
+        payload = {"user_id": "u1", "type": "task_completed", "title": "Done", "message": "+10"}
+
+        with patch.object(outbox_service.NotificationService, "notify", AsyncMock()) as notify:
+            await outbox_service.HANDLERS["notify"]("e1", payload)
+            await outbox_service.HANDLERS["notify"]("e1", payload)
+
+        ids = {call.kwargs["notification_id"] for call in notify.await_args_list}
+        assert ids == {"outbox-e1"}
+
+    @pytest.mark.asyncio
+    async def test_entry_held_elsewhere_is_skipped(self):
+        from api.services import outbox_service
+        with patch.object(outbox_service.FirestoreDB, "claim_outbox_entry", AsyncMock(return_value=None)):
+            assert await outbox_service.OutboxService.process(["e1", "e2"]) == 0
+
+    def test_task_completion_effects(self):
+        from api.services.outbox_service import OutboxService, HANDLERS
+        effects = OutboxService.task_completion_effects("u1", {"title": "Water", "points": 15})
+        assert [e["kind"] for e in effects] == ["award_points", "notify", "refresh_agent_profile"]
+        assert effects[0]["payload"] == {"user_id": "u1", "points": 15}
+        assert all(e["kind"] in HANDLERS for e in effects)
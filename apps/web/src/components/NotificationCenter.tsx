@@ -34,6 +34,10 @@ export default function NotificationCenter() {
   const [unreadCount, setUnreadCount] = useState(0);
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+  // Newest notification id received over the socket - sent as `since` on reconnect so
+  // the server replays whatever was missed while disconnected.
+  const lastSeenIdRef = useRef<string | null>(null);
+  const seenIdsRef = useRef<Set<string>>(new Set());
 
   useEffect(() => {
     if (user) {
@@ -63,7 +67,8 @@ export default function NotificationCenter() {
       const token = await auth.currentUser?.getIdToken().catch(() => null);
       if (!token || cancelled) return;
 
-      const ws = new WebSocket(`${wsBase}/api/notifications/ws?token=${encodeURIComponent(token)}`);
+      const since = lastSeenIdRef.current ? `&since=${encodeURIComponent(lastSeenIdRef.current)}` : '';
+      const ws = new WebSocket(`${wsBase}/api/notifications/ws?token=${encodeURIComponent(token)}${since}`);
       wsRef.current = ws;
 
       ws.onmessage = (event) => {
@@ -73,6 +78,16 @@ export default function NotificationCenter() {
         } catch {
           return; // e.g. a "pong" keepalive frame, not a notification payload
         }
+        // The server pushes the authoritative badge count whenever it changes
+        const message = notification as unknown as { event?: string; count?: number };
+        if (message.event === 'unread_count') {
+          setUnreadCount(message.count ?? 0);
+          return;
+        }
+        lastSeenIdRef.current = notification.id;
+        // A replay can overlap with a live push - only count each notification once
+        if (seenIdsRef.current.has(notification.id)) return;
+        seenIdsRef.current.add(notification.id);
         setNotifications(prev => [notification, ...prev.filter(n => n.id !== notification.id)]);
         if (!notification.read) {
           setUnreadCount(prev => prev + 1);
@@ -6,7 +6,7 @@ import {
   onAuthStateChanged,
   User as FirebaseUser
 } from "firebase/auth";
-import { getProfile, createProfile } from '@/integrations/api';
+import { getProfile, createProfile, updateProfile } from '@/integrations/api';
 
 interface User {
   uid: string;
@@ -24,6 +24,7 @@ export interface Profile {
   display_name?: string;
   photo_url?: string;
   bio?: string;
+  timezone?: string;
   total_score: number;
   level: number;
   tasks_completed: number;
@@ -51,6 +52,16 @@ interface AuthContextType {
 
 const AuthContext = createContext<AuthContextType | undefined>(undefined);
 
+// IANA zone of this device, e.g. "Europe/Berlin" - the backend sends the daily digest
+// and weekly summary at local 08:00 / Monday 09:00 in the profile's timezone.
+const deviceTimezone = (): string | undefined => {
+  try {
+    return Intl.DateTimeFormat().resolvedOptions().timeZone || undefined;
+  } catch {
+    return undefined;
+  }
+};
+
 export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
   const [user, setUser] = useState<User | null>(null);
   const [profile, setProfile] = useState<Profile | null>(null);
@@ -59,7 +70,16 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
 
   const loadProfile = async () => {
     try {
-      const existing = await getProfile();
+      let existing = await getProfile();
+      // Keep the profile's timezone in step with the device (older profiles have none)
+      const timezone = deviceTimezone();
+      if (timezone && existing.timezone !== timezone) {
+        try {
+          existing = await updateProfile({ timezone });
+        } catch (error) {
+          console.error('Failed to update profile timezone:', error);
+        }
+      }
       setProfile(existing);
       setNeedsOnboarding(false);
     } catch (error: any) {
@@ -142,7 +162,8 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
       display_name: user.displayName || '',
       photo_url: user.photoURL || '',
       full_name: fullName,
-      phone_number: phoneNumber
+      phone_number: phoneNumber,
+      timezone: deviceTimezone()
     });
     setProfile(created);
     setNeedsOnboarding(false);
@@ -70,6 +70,7 @@ export async function createProfile(payload: {
   photo_url?: string;
   full_name: string;
   phone_number: string;
+  timezone?: string;
 }) {
   const { data } = await api.post('/auth/profile', payload);
   return data;
@@ -81,6 +82,7 @@ export async function updateProfile(payload: Partial<{
   display_name: string;
   photo_url: string;
   bio: string;
+  timezone: string;
 }>) {
   const { data } = await api.patch('/auth/profile', payload);
   return data;
@@ -162,8 +164,8 @@ export async function getTodayProgress() {
 }
 
 // All pending (not-yet-completed) tasks across every plant, for the Calendar - watering/
-// fertilizing occurrences generated by PlantService.create_projected_schedule span
-// weeks/months ahead, not just today.
+// fertilizing occurrences expanded from each plant's care rules span weeks/months ahead
+// (RECURRING_TASKS_HORIZON_DAYS), not just today.
 export async function getAllUpcomingTasks() {
   const { data } = await api.get('/tasks/?completed=false');
   return data;